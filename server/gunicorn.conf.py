@@ -0,0 +1,52 @@
+"""
+Gunicorn settings of the production app server, used by the Docker image:
+
+    gunicorn --config gunicorn.conf.py server.asgi:application
+
+Each worker process serves the ASGI application with Uvicorn, so the async
+read views of the API wait on the database without holding a thread.
+The streamed responses, exports and proxied downloads, give Django async
+iterators under ASGI, which it sends as they are read instead of buffering.
+
+`kill -HUP <master pid>` reloads these settings and replaces the workers
+gracefully: new workers start before the old ones finish their requests.
+The application itself is loaded once in the master (preload_app), which
+makes forking workers cheap but means a HUP does not pick up new code;
+deploy that by replacing the container, one replica at a time behind the
+load balancer, which stops routing to it as soon as /ready/ fails.
+
+https://docs.gunicorn.org/en/stable/settings.html
+"""
+
+import os
+
+from environ import Env
+
+env = Env()
+
+bind = f"0.0.0.0:{env.int('PORT', default=8000)}"
+
+# Workers are sized from the CPUs the container may use. Every worker keeps
+# its own database connection pool, see DB_POOL_MAX_SIZE in settings.py
+workers = env.int("WEB_CONCURRENCY", default=os.process_cpu_count() * 2 + 1)
+worker_class = "uvicorn_worker.UvicornWorker"
+
+# Import Django and the app once in the master and fork the workers from it.
+# Nothing opens a database connection while loading, so none is shared
+preload_app = True
+
+# Workers silent for this long are killed and replaced
+timeout = env.int("GUNICORN_TIMEOUT", default=60)  # seconds
+# Time left to the requests in progress on shutdown and on HUP
+graceful_timeout = env.int("GUNICORN_GRACEFUL_TIMEOUT", default=30)  # seconds
+# Behind a load balancer, keep this above its idle timeout
+keepalive = env.int("GUNICORN_KEEPALIVE", default=5)  # seconds
+
+# Recycle workers after this many requests, at staggered times, to give back
+# the memory they grew into
+max_requests = env.int("GUNICORN_MAX_REQUESTS", default=1000)
+max_requests_jitter = env.int("GUNICORN_MAX_REQUESTS_JITTER", default=100)
+
+accesslog = "-"
+errorlog = "-"
+loglevel = env.str("GUNICORN_LOG_LEVEL", default="info")
@@ -96,9 +96,28 @@ DATABASES = {
         "PASSWORD": env.str("DB_PASSWORD", default="password"),
         "HOST": env.str("DB_HOST", default="localhost"),
         "PORT": env.str("DB_PORT", default="5432"),
+        # Seconds a connection stays open for the next requests of the same
+        # thread, 0 to close it after each request
+        "CONN_MAX_AGE": env.int("DB_CONN_MAX_AGE", default=0),
+        "CONN_HEALTH_CHECKS": env.bool("DB_CONN_HEALTH_CHECKS", default=True),
     }
 }
 
+# Postgres connection pool of each app server process (psycopg 3). Under ASGI
+# every request runs its queries on a thread of its own, whose connection no
+# later request reuses, so use the pool there rather than DB_CONN_MAX_AGE
+# (Django refuses both at once). Each worker process opens up to
+# DB_POOL_MAX_SIZE connections: keep workers * max size below max_connections
+if env.bool("DB_POOL", default=False):
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": env.int("DB_POOL_MIN_SIZE", default=2),
+            "max_size": env.int("DB_POOL_MAX_SIZE", default=10),
+            # Requests waiting longer than this for a connection fail
+            "timeout": env.int("DB_POOL_TIMEOUT", default=10),  # seconds
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -144,6 +163,10 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# Room for bulk test result ingests from CI runs
+DATA_UPLOAD_MAX_MEMORY_SIZE = env.int(
+    "DATA_UPLOAD_MAX_MEMORY_SIZE", default=50 * 1024 * 1024
+)  # 50MB
 
 # Storage
 STORAGES = {
@@ -168,6 +191,39 @@ AWS_S3_ENDPOINT_URL = env.str("MINIO_ENDPOINT_URL", default=None)
 AWS_S3_CUSTOM_DOMAIN = env.str("MINIO_EXTERNAL_ENDPOINT", default=None)
 AWS_S3_URL_PROTOCOL = env.str("MINIO_URL_PROTOCOL", default="https:")
 
+# Attachment downloads: "proxy" streams the file through Django, "redirect"
+# answers with a 302 to a short-lived presigned storage URL instead
+ATTACHMENT_DOWNLOAD_MODE = env.str("ATTACHMENT_DOWNLOAD_MODE", default="proxy")
+ATTACHMENT_URL_EXPIRES = env.int("ATTACHMENT_URL_EXPIRES", default=60)  # seconds
+
+# Direct uploads: browsers POST attachment files straight to the storage with
+# a presigned policy, limited to this size and valid for this long
+ATTACHMENT_UPLOAD_MAX_SIZE = env.int(
+    "ATTACHMENT_UPLOAD_MAX_SIZE", default=100 * 1024 * 1024
+)  # bytes
+ATTACHMENT_UPLOAD_EXPIRES = env.int("ATTACHMENT_UPLOAD_EXPIRES", default=600)  # seconds
+
+# Background jobs run by `manage.py run_worker`: a failed job is retried up to
+# JOB_MAX_ATTEMPTS times in all, waiting JOB_RETRY_DELAY seconds after the first
+# failure and twice as long after each of the next ones, up to JOB_RETRY_MAX_DELAY
+JOB_MAX_ATTEMPTS = env.int("JOB_MAX_ATTEMPTS", default=5)
+JOB_RETRY_DELAY = env.int("JOB_RETRY_DELAY", default=10)  # seconds
+JOB_RETRY_MAX_DELAY = env.int("JOB_RETRY_MAX_DELAY", default=3600)  # seconds
+# Running jobs whose lock was not refreshed for longer than this are assumed to
+# have lost their worker, which refreshes it every JOB_HEARTBEAT seconds
+JOB_TIMEOUT = env.int("JOB_TIMEOUT", default=3600)  # seconds
+JOB_HEARTBEAT = env.int("JOB_HEARTBEAT", default=60)  # seconds
+# Default pool of the worker: "thread" or "process", and its size
+JOB_WORKER_POOL = env.str("JOB_WORKER_POOL", default="thread")
+JOB_WORKER_CONCURRENCY = env.int("JOB_WORKER_CONCURRENCY", default=4)
+
+# Cache of the step and attachment lists of test cases. Several app servers
+# need a shared backend, e.g. CACHE_URL=rediscache://redis:6379/0, so writes
+# on one of them invalidate the lists cached by the others
+CACHES = {"default": env.cache_url("CACHE_URL", default="locmemcache://")}
+# Cached lists include presigned storage URLs, so keep this below their expiry
+CASE_CACHE_TIMEOUT = env.int("CASE_CACHE_TIMEOUT", default=300)  # seconds
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -196,6 +252,10 @@ SPECTACULAR_SETTINGS = {
     "CAMELIZE_NAMES": True,
     "OPERATION_ID_METHOD_POSITION": "PRE",
     "SCHEMA_PATH_PREFIX": "/api/v[0-9]",
+    "ENUM_NAME_OVERRIDES": {
+        "IngestStatusEnum": "testplan.constants.INGEST_STATUS",
+        "TestResultStepStatusEnum": "testplan.constants.TEST_RESULT_STEP_STATUS",
+    },
 }
 
 # CORS settings
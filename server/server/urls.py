@@ -6,6 +6,7 @@ from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from testplan import health
 from testplan.urls import urlpatterns as testplan_urls
 
 api_v1_patterns = [
@@ -14,6 +15,9 @@ api_v1_patterns = [
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    # Liveness and readiness probes of the load balancer or orchestrator
+    path("health/", health.live, name="health"),
+    path("ready/", health.ready, name="ready"),
     path("schema/", SpectacularAPIView.as_view(), name="schema"),
     path("schema/swagger-ui/", SpectacularSwaggerView.as_view(), name="swagger-ui"),
     path("api/v1/", include(api_v1_patterns)),
@@ -7,3 +7,4 @@ class TestplanConfig(AppConfig):
 
     def ready(self):
         import testplan.signals  # noqa: F401
+        import testplan.tasks  # noqa: F401
@@ -0,0 +1,170 @@
+from functools import update_wrapper
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404
+from django.urls import URLPattern, URLResolver
+from rest_framework.response import Response
+
+
+# Serves the list and retrieve actions of a viewset with async handlers that
+# read through Django's async ORM (aiterator(), acount(), aaggregate()), so
+# under ASGI a worker keeps taking requests while their queries are waiting.
+# The other actions of the same URL, writes and custom actions, run the sync
+# DRF view in a thread, as Django does for any sync view under ASGI.
+# Under WSGI, Django runs the async views in an event loop of their own;
+# as_view(asynchronous=False) gives the plain sync view instead.
+# Mixins overriding list() and retrieve() provide alist() and aretrieve()
+# as well, and come before this one in the bases of the view.
+class AsyncReadMixin:
+    asynchronous = True
+    # Async handler of each action
+    async_actions = {"list": "alist", "retrieve": "aretrieve"}
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not initkwargs.get("asynchronous", cls.asynchronous):
+            return view
+        if cls.async_actions.keys().isdisjoint(actions.values()):
+            return view
+
+        sync_view = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            method = request.method.lower()
+            action = actions.get(
+                method, actions.get("get") if method == "head" else None
+            )
+            if action not in cls.async_actions:
+                return await sync_view(request, *args, **kwargs)
+
+            # As set up by ViewSetMixin.as_view() for the sync views
+            self = cls(**initkwargs)
+            self.action_map = {**actions, method: action}
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+            return await self.adispatch(request, *args, **kwargs)
+
+        # Carries over the name and attributes of the view: cls, actions,
+        # initkwargs, csrf_exempt...
+        update_wrapper(async_view, view)
+        return async_view
+
+    async def adispatch(self, request, *args, **kwargs):
+        # APIView.dispatch() awaiting the async handler of the action
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            # Authentication looks the user up in the database
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, self.async_actions[self.action])
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aget_object(self):
+        # GenericAPIView.get_object() reading the row with the async ORM
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            )
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404(
+                f"No {queryset.model._meta.object_name} matches the given query."
+            )
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset, self.request, view=self
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(
+            [obj async for obj in queryset.aiterator()], many=True
+        )
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+
+def sync_urlpatterns(patterns):
+    """
+    Copy of the URL patterns with the sync views in place of the async views
+    of AsyncReadMixin, to serve the same routes without an event loop.
+    """
+    copies = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            copies.append(
+                URLResolver(
+                    pattern.pattern,
+                    sync_urlpatterns(pattern.url_patterns),
+                    pattern.default_kwargs,
+                    pattern.app_name,
+                    pattern.namespace,
+                )
+            )
+            continue
+
+        callback = pattern.callback
+        view_class = getattr(callback, "cls", None)
+        if view_class is not None and issubclass(view_class, AsyncReadMixin):
+            callback = view_class.as_view(
+                callback.actions, **{**callback.initkwargs, "asynchronous": False}
+            )
+        copies.append(
+            URLPattern(pattern.pattern, callback, pattern.default_args, pattern.name)
+        )
+    return copies
+
+
+def is_asgi(request):
+    """Whether the request is served by Django's ASGI handler."""
+    return isinstance(getattr(request, "_request", request), ASGIRequest)
+
+
+async def aiterate(iterator, batch_size=1):
+    """
+    Asynchronous iterator over a synchronous one, for the content of the
+    streaming responses served under ASGI: Django's ASGI handler reads
+    synchronous iterators to the end before sending anything. The items are
+    read batch_size at a time in the thread of the request, which holds its
+    database connection, and the iterator is closed there as well.
+    """
+    iterator = iter(iterator)
+    read_batch = sync_to_async(lambda: list(islice(iterator, batch_size)))
+    try:
+        while batch := await read_batch():
+            for item in batch:
+                yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close)()
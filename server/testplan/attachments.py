@@ -0,0 +1,278 @@
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import AttachmentBlob
+from .serializers import AttachmentUploadSerializer, AttachmentUploadConfirmSerializer
+from .uploads import issue_upload, confirm_uploads
+
+
+# Replaces, adds and directly uploads the attachments of the steps of a test
+# case or test result, for the attachment viewsets of both. The viewsets keep
+# their actions, which carry their own API schema, and hand over to the
+# replace_attachments(), add_attachment(), issue_uploads() and
+# confirm_direct_uploads() methods of this mixin.
+class StepAttachmentMixin:
+    # Model of the steps and name of their foreign key on the attachments
+    step_model = None
+    step_field = None
+    # Name of the parent of the steps, its URL keyword and its scope key in
+    # the upload tokens
+    parent_field = None
+    parent_kwarg = None
+    # Used in the error messages, e.g. "Test step" and "test case"
+    step_label = None
+    parent_label = None
+    create_serializer_class = None
+    upload_serializer_class = None
+
+    def attachments_changed(self):
+        # Hook for the views caching the attachment lists
+        pass
+
+    def step_ids(self, orders):
+        # Primary key of each step of the parent, by its order
+        return dict(
+            self.step_model.objects.filter(
+                **{self.parent_field: self.kwargs[self.parent_kwarg]},
+                order__in=orders,
+            ).values_list("order", "pk")
+        )
+
+    def error_response(self, error):
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+    def step_not_found(self, step_order):
+        return self.error_response(
+            f"{self.step_label} {step_order} not found or does not belong to {self.parent_label} {self.kwargs[self.parent_kwarg]}"
+        )
+
+    def replace_attachments(self, request):
+        parent_id = self.kwargs[self.parent_kwarg]
+        model = self.queryset.model
+
+        # Parse multipart form data
+        attachments_data = []
+        index = 0
+        while True:
+            step_key = f"{index}_{self.step_field}"
+            file_key = f"{index}_file"
+            attachment_key = f"{index}_attachment"
+
+            if step_key not in request.data or (
+                file_key not in request.data and attachment_key not in request.data
+            ):
+                break
+
+            data = {"file": request.data.get(file_key), "attachment": None}
+            for key, name in (
+                (step_key, "step"),
+                (attachment_key, "attachment"),
+            ):
+                if key not in request.data:
+                    continue
+                try:
+                    data[name] = int(request.data[key])
+                except (TypeError, ValueError):
+                    return Response(
+                        {key: ["A valid integer is required."]},
+                        status=status.HTTP_400_BAD_REQUEST,
+                    )
+            attachments_data.append(data)
+            index += 1
+
+        if not attachments_data:
+            return self.error_response("No attachment data provided")
+
+        # Look up the referenced steps and attachments with one query each
+        step_ids = self.step_ids({data["step"] for data in attachments_data})
+        existing_attachments = {
+            attachment.pk: attachment for attachment in self.get_queryset()
+        }
+
+        # Validate everything before touching the existing attachments
+        kept_ids = set()
+        create_serializers = []
+        for attachment_data in attachments_data:
+            # Check if the step with the order belongs to the parent
+            step_order = attachment_data["step"]
+            if step_order not in step_ids:
+                return self.step_not_found(step_order)
+
+            attachment_id = attachment_data["attachment"]
+            if attachment_id is not None:
+                if attachment_id not in existing_attachments:
+                    return self.error_response(
+                        f"{self.step_label} attachment {attachment_id} not found or does not belong to {self.parent_label} {parent_id}"
+                    )
+                if attachment_id in kept_ids:
+                    return self.error_response(
+                        f"{self.step_label} attachment {attachment_id} is referenced more than once"
+                    )
+                kept_ids.add(attachment_id)
+                create_serializers.append(None)
+                continue
+
+            # Validate the file type
+            file_obj = attachment_data["file"]
+            if file_obj and getattr(file_obj, "name", "").lower().endswith(".exe"):
+                return self.error_response("Executable files (.exe) are not allowed.")
+
+            serializer = self.create_serializer_class(
+                data={self.step_field: step_ids[step_order], "file": file_obj}
+            )
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            create_serializers.append(serializer)
+
+        # Replace all attachments in a single transaction
+        with transaction.atomic():
+            # Delete the existing attachments that are not kept
+            self.get_queryset().exclude(pk__in=kept_ids).delete()
+
+            attachments = []
+            moved_attachments = []
+            for attachment_data, serializer in zip(
+                attachments_data, create_serializers
+            ):
+                if serializer is not None:
+                    attachments.append(serializer.save())
+                    continue
+
+                # Kept attachments may move to another step
+                attachment = existing_attachments[attachment_data["attachment"]]
+                step_id = step_ids[attachment_data["step"]]
+                if getattr(attachment, f"{self.step_field}_id") != step_id:
+                    setattr(attachment, f"{self.step_field}_id", step_id)
+                    moved_attachments.append(attachment)
+                attachments.append(attachment)
+            model.objects.bulk_update(moved_attachments, [self.step_field])
+            self.attachments_changed()
+
+        # Return the attachments in the order they were sent
+        response_serializer = self.serializer_class(attachments, many=True)
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+    def add_attachment(self, request):
+        try:
+            step_order = int(request.data[self.step_field])
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {self.step_field: ["A valid integer is required."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        step_id = self.step_ids([step_order]).get(step_order)
+        if step_id is None:
+            return self.step_not_found(step_order)
+
+        # Validate the file type
+        file_obj = request.data.get("file")
+        if file_obj and getattr(file_obj, "name", "").lower().endswith(".exe"):
+            return self.error_response("Executable files (.exe) are not allowed.")
+
+        serializer = self.create_serializer_class(
+            data={self.step_field: step_id, "file": file_obj}
+        )
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        attachment = serializer.save()
+        self.attachments_changed()
+
+        response_serializer = self.serializer_class(attachment)
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+    def issue_uploads(self, request):
+        parent_id = self.kwargs[self.parent_kwarg]
+
+        serializer = self.upload_serializer_class(
+            data=request.data, many=True, allow_empty=False
+        )
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        uploads_data = serializer.validated_data
+
+        # Look up every referenced step with one query
+        orders = {data[self.step_field] for data in uploads_data}
+        step_ids = self.step_ids(orders)
+        missing = sorted(orders - step_ids.keys())
+        if missing:
+            return self.step_not_found(missing[0])
+
+        field = self.queryset.model._meta.get_field("file")
+        uploads = []
+        for data in uploads_data:
+            upload = issue_upload(
+                field,
+                data["filename"],
+                {
+                    self.parent_field: parent_id,
+                    self.step_field: step_ids[data[self.step_field]],
+                },
+                data.get("content_type"),
+            )
+            if upload is None:
+                return self.error_response(
+                    "The configured storage does not support direct uploads."
+                )
+            uploads.append(upload)
+
+        response_serializer = AttachmentUploadSerializer(uploads, many=True)
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+    def confirm_direct_uploads(self, request):
+        parent_id = self.kwargs[self.parent_kwarg]
+        model = self.queryset.model
+
+        serializer = AttachmentUploadConfirmSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        field = model._meta.get_field("file")
+        uploads, attachments, errors = confirm_uploads(
+            field,
+            serializer.validated_data["tokens"],
+            {self.parent_field: parent_id},
+            self.get_queryset(),
+        )
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # The steps may have been replaced since the policies were issued
+        existing_step_ids = set(
+            self.step_model.objects.filter(
+                **{self.parent_field: parent_id},
+                pk__in={upload[self.step_field] for upload in uploads},
+            ).values_list("pk", flat=True)
+        )
+        errors = [
+            {}
+            if upload[self.step_field] in existing_step_ids
+            or upload["name"] in attachments
+            else {"token": [f"{self.step_label} no longer exists."]}
+            for upload in uploads
+        ]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Uploads confirmed before already have their attachment
+            new_attachments = []
+            for upload in uploads:
+                if upload["name"] in attachments:
+                    continue
+                blob = AttachmentBlob.adopt(upload["name"])
+                attachment = model(
+                    **{f"{self.step_field}_id": upload[self.step_field]},
+                    blob=blob,
+                    file=blob.file.name,
+                    filename=upload["name"].rsplit("/", 1)[-1],
+                    upload_name=upload["name"],
+                )
+                attachments[upload["name"]] = attachment
+                new_attachments.append(attachment)
+            model.objects.bulk_create(new_attachments)
+            if new_attachments:
+                self.attachments_changed()
+
+        response_serializer = self.serializer_class(attachments.values(), many=True)
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
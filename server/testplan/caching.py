@@ -0,0 +1,134 @@
+import hashlib
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+KEY_PREFIX = "testplan"
+
+# Shared counters of the cached list lookups
+STAT_NAMES = ["hits", "misses"]
+
+
+def version_key(case_id):
+    return f"{KEY_PREFIX}:case:{case_id}:version"
+
+
+def case_version(case_id):
+    """
+    Current version of the cached payloads of a test case. Versions are
+    random tokens rather than counters, so a version key evicted from the
+    cache never brings back the payloads stored under its old value.
+    """
+    key = version_key(case_id)
+    version = cache.get(key)
+    if version is None:
+        # Another node may be doing the same, so keep whichever came first
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def acase_version(case_id):
+    key = version_key(case_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(case_id):
+    cache.set(version_key(case_id), uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_case(case_id):
+    """
+    Drop the cached payloads of a test case by moving it to a new version,
+    right away and again once the transaction commits, as readers that load
+    the old rows before the commit could store them under the first one.
+    """
+    bump_version(case_id)
+    transaction.on_commit(partial(bump_version, case_id))
+
+
+def payload_key(case_id, version, name, request):
+    # File URLs are made absolute from the host of the request
+    origin = hashlib.md5(
+        request.build_absolute_uri("/").encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"{KEY_PREFIX}:case:{case_id}:{version}:{name}:{origin}"
+
+
+def stat_key(name):
+    return f"{KEY_PREFIX}:cache:{name}"
+
+
+def record(name):
+    try:
+        cache.incr(stat_key(name))
+    except ValueError:
+        # First lookup since the counters were reset or evicted
+        if not cache.add(stat_key(name), 1, timeout=None):
+            cache.incr(stat_key(name))
+
+
+async def arecord(name):
+    try:
+        await cache.aincr(stat_key(name))
+    except ValueError:
+        if not await cache.aadd(stat_key(name), 1, timeout=None):
+            await cache.aincr(stat_key(name))
+
+
+def stats():
+    """Hit and miss counts of the cached lists across all app nodes."""
+    values = cache.get_many([stat_key(name) for name in STAT_NAMES])
+    counts = {name: values.get(stat_key(name), 0) for name in STAT_NAMES}
+    lookups = counts["hits"] + counts["misses"]
+    counts["hit_rate"] = counts["hits"] / lookups if lookups else None
+    return counts
+
+
+def reset_stats():
+    cache.delete_many([stat_key(name) for name in STAT_NAMES])
+
+
+# Serves the list action from the cache, under the version of the test case
+# of the URL. The version is read before the rows are, so a list rendered
+# from rows that changed meanwhile is stored under an outdated version.
+# (Not a docstring, which would end up in the API schema of every view.)
+class CaseCacheMixin:
+    cache_name = None
+
+    def list(self, request, *args, **kwargs):
+        case_id = self.kwargs["test_case_id"]
+        key = payload_key(case_id, case_version(case_id), self.cache_name, request)
+        data = cache.get(key)
+        if data is not None:
+            record("hits")
+            return Response(data, headers={"X-Cache": "HIT"})
+
+        record("misses")
+        response = super().list(request, *args, **kwargs)
+        cache.set(key, response.data, timeout=settings.CASE_CACHE_TIMEOUT)
+        response["X-Cache"] = "MISS"
+        return response
+
+    async def alist(self, request, *args, **kwargs):
+        case_id = self.kwargs["test_case_id"]
+        version = await acase_version(case_id)
+        key = payload_key(case_id, version, self.cache_name, request)
+        data = await cache.aget(key)
+        if data is not None:
+            await arecord("hits")
+            return Response(data, headers={"X-Cache": "HIT"})
+
+        await arecord("misses")
+        response = await super().alist(request, *args, **kwargs)
+        await cache.aset(key, response.data, timeout=settings.CASE_CACHE_TIMEOUT)
+        response["X-Cache"] = "MISS"
+        return response
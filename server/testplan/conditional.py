@@ -0,0 +1,190 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+# Responses may be stored but must be revalidated before every reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+# Answers conditional list and retrieve requests with 304 Not Modified
+# before anything is serialized. The validators are read with a single
+# aggregate over the filtered queryset: the row count and the latest value
+# of each of the view's `validator_fields`, timestamps that move whenever
+# a row or what its representation shows changes.
+# Lists only carry a weak ETag, as a deleted row lowers the count but moves
+# no timestamp. Details also carry Last-Modified.
+# Keyset pages are never counted, so they are read first and their
+# validators come from their own rows: their IDs and the latest values of
+# the `validator_fields` of those rows alone.
+class ConditionalGetMixin:
+    validator_fields = ["updated_at"]
+    row_count = None
+
+    def get_validator_aggregates(self):
+        return {
+            "count": Count("pk"),
+            **{f"{field}__max": Max(field) for field in self.validator_fields},
+        }
+
+    def get_validators(self, queryset):
+        return queryset.aggregate(**self.get_validator_aggregates())
+
+    async def aget_validators(self, queryset):
+        return await queryset.aaggregate(**self.get_validator_aggregates())
+
+    def uses_keyset(self, request):
+        use_keyset = getattr(self.paginator, "use_keyset", None)
+        return use_keyset is not None and use_keyset(request)
+
+    def get_page_validator_queryset(self):
+        # The rows of the keyset page just read, in their order
+        ids = [obj.pk for obj in self.paginator.keyset.page]
+        aggregates = self.get_validator_aggregates()
+        del aggregates["count"]
+        return ids, self.get_queryset().filter(pk__in=ids), aggregates
+
+    def get_page_validators(self):
+        ids, queryset, aggregates = self.get_page_validator_queryset()
+        return {"ids": ids, **queryset.aggregate(**aggregates)}
+
+    async def aget_page_validators(self):
+        ids, queryset, aggregates = self.get_page_validator_queryset()
+        return {"ids": ids, **await queryset.aaggregate(**aggregates)}
+
+    def make_etag(self, request, validators):
+        # The same validators stand for another page, filter or format
+        key = "|".join(
+            [
+                request.get_full_path(),
+                request.accepted_renderer.media_type,
+                *(str(value) for value in validators.values()),
+            ]
+        )
+        return f'W/"{hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()}"'
+
+    def conditional_response(self, request, queryset, detail):
+        """
+        The 304 (or 412 for a failed If-Match) answer to the request when its
+        preconditions say so, or None, along with the validator headers of
+        the response.
+        """
+        return self.evaluate_preconditions(
+            request, self.get_validators(queryset), detail
+        )
+
+    async def aconditional_response(self, request, queryset, detail):
+        return self.evaluate_preconditions(
+            request, await self.aget_validators(queryset), detail
+        )
+
+    def evaluate_preconditions(self, request, validators, detail):
+        if not detail:
+            # Spares the paginator its own COUNT(*)
+            self.row_count = validators.get("count")
+        elif not validators["count"]:
+            # Let the view answer 404
+            return None, {}
+
+        headers = {
+            "ETag": self.make_etag(request, validators),
+            "Cache-Control": CACHE_CONTROL,
+        }
+        last_modified = None
+        if detail:
+            last_modified = int(
+                max(
+                    value
+                    for key, value in validators.items()
+                    if key != "count" and value is not None
+                ).timestamp()
+            )
+            headers["Last-Modified"] = http_date(last_modified)
+
+        response = get_conditional_response(
+            request,
+            etag=headers["ETag"],
+            last_modified=last_modified,
+            response=HttpResponse(headers=headers),
+        )
+        if response.status_code != 200:
+            return response, headers
+        return None, headers
+
+    def get_detail_queryset(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+
+    def page_response(self, request, response, validators):
+        # The validator headers of a keyset page, or 304 instead of the page
+        not_modified, headers = self.evaluate_preconditions(request, validators, False)
+        if not_modified is not None:
+            return not_modified
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if self.uses_keyset(request):
+            response = super().list(request, *args, **kwargs)
+            return self.page_response(request, response, self.get_page_validators())
+
+        queryset = self.filter_queryset(self.get_queryset())
+        not_modified, headers = self.conditional_response(request, queryset, False)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().list(request, *args, **kwargs)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.get_detail_queryset()
+        not_modified, headers = self.conditional_response(request, queryset, True)
+        if not_modified is not None:
+            return not_modified
+
+        response = super().retrieve(request, *args, **kwargs)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    # Counterparts of list() and retrieve() for the async read handlers of
+    # AsyncReadMixin, which comes after this mixin in the bases of the views
+
+    async def alist(self, request, *args, **kwargs):
+        if self.uses_keyset(request):
+            response = await super().alist(request, *args, **kwargs)
+            return self.page_response(
+                request, response, await self.aget_page_validators()
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        not_modified, headers = await self.aconditional_response(
+            request, queryset, False
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = await super().alist(request, *args, **kwargs)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    async def aretrieve(self, request, *args, **kwargs):
+        queryset = self.get_detail_queryset()
+        not_modified, headers = await self.aconditional_response(
+            request, queryset, True
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = await super().aretrieve(request, *args, **kwargs)
+        for header, value in headers.items():
+            response[header] = value
+        return response
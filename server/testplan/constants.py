@@ -38,3 +38,22 @@ TEST_RESULT_STEP_STATUS = [
     ("fail", "Fail"),
     ("skip", "Skip"),
 ]
+
+SEARCH_DOCUMENT_KINDS = [
+    ("plan", "Test Plan"),
+    ("case", "Test Case"),
+    ("step", "Test Step"),
+    ("result_step", "Test Result Step"),
+]
+
+INGEST_STATUS = [
+    ("created", "Created"),
+    ("error", "Error"),
+]
+
+JOB_STATUS = [
+    ("queued", "Queued"),
+    ("running", "Running"),
+    ("succeeded", "Succeeded"),
+    ("failed", "Failed"),
+]
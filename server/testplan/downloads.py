@@ -0,0 +1,155 @@
+import re
+
+from django.conf import settings
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+from storages.backends.s3 import S3Storage
+
+from .asynchronous import aiterate, is_asgi
+from .storage import file_metadata, presigned_url, read_chunks
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Attachment files never change once uploaded, so clients may keep them for a year
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def parse_range(header, size):
+    """
+    Parse a single byte range of a Range header into inclusive (start, end)
+    offsets. Returns None when the header is to be ignored (missing, malformed
+    or asking for several ranges) and raises ValueError when the range cannot
+    be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if end < start:
+        return None
+    if start >= size:
+        raise ValueError("Unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+def stream(request, chunks):
+    """The chunks of a streamed file, read asynchronously under ASGI."""
+    return aiterate(chunks) if is_asgi(request) else chunks
+
+
+def download_response(request, file, filename=None):
+    """
+    Serve an attachment file through Django proxy or, in redirect mode, with a
+    redirect to a short-lived presigned storage URL so the file never passes
+    through the app server.
+    Proxied files carry a strong ETag and Last-Modified, answer conditional
+    requests with 304 and single byte-range requests with 206.
+    """
+    if not file:
+        raise Http404("File not found")
+
+    # Get file name for the response
+    file_name = filename or file.name.split("/")[-1] or "attachment"
+
+    if settings.ATTACHMENT_DOWNLOAD_MODE == "redirect":
+        response = HttpResponseRedirect(
+            presigned_url(file, settings.ATTACHMENT_URL_EXPIRES, filename=file_name)
+        )
+        # The URL expires, so it must not be reused from a cache
+        response["Cache-Control"] = "no-store"
+        return response
+
+    try:
+        metadata = file_metadata(file)
+    except (FileNotFoundError, OSError) as e:
+        raise Http404("File not accessible") from e
+
+    validators = {
+        "ETag": metadata.etag,
+        "Last-Modified": http_date(metadata.last_modified.timestamp()),
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    response = get_conditional_response(
+        request,
+        etag=metadata.etag,
+        last_modified=int(metadata.last_modified.timestamp()),
+    )
+    if response is not None:
+        for header, value in validators.items():
+            response.headers.setdefault(header, value)
+        return response
+
+    byte_range = None
+    if_range = request.headers.get("If-Range")
+    # Serve the whole file when it changed since the client got its part
+    if if_range is None or if_range in (metadata.etag, validators["Last-Modified"]):
+        try:
+            byte_range = parse_range(request.headers.get("Range"), metadata.size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{metadata.size}"
+            return response
+
+    headers = {
+        **validators,
+        # Quotes and non-ASCII names escaped as FileResponse does
+        "Content-Disposition": content_disposition_header(False, file_name),
+    }
+
+    if byte_range is not None:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            stream(request, read_chunks(file, start, end)),
+            status=206,
+            content_type="application/octet-stream",
+            headers=headers,
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{metadata.size}"
+        response["Content-Length"] = str(end - start + 1)
+        return response
+
+    if isinstance(file.storage, S3Storage):
+        # Stream the object instead of downloading it to a temporary file first
+        response = StreamingHttpResponse(
+            stream(request, read_chunks(file, 0, metadata.size - 1))
+            if metadata.size
+            else [],
+            content_type="application/octet-stream",
+            headers=headers,
+        )
+        response["Content-Length"] = str(metadata.size)
+        return response
+
+    try:
+        # Stream the file through Django
+        response = FileResponse(
+            file.open("rb"),
+            filename=file_name,
+            content_type="application/octet-stream",
+            headers=headers,
+        )
+    except (FileNotFoundError, OSError) as e:
+        raise Http404("File not accessible") from e
+    if is_asgi(request):
+        # The file is still closed along with the response
+        response.streaming_content = stream(request, response.streaming_content)
+    return response
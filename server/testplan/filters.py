@@ -1,49 +1,43 @@
 import django_filters
 
-from .models import TestPlan, TestCase, TestResult
-from .constants import TEST_PLAN_STATUS, TEST_CASE_STATUS, TEST_CASE_RESULTS
+from .models import TestPlan, TestCase, TestResult, SearchDocument, Job
+from .constants import (
+    TEST_PLAN_STATUS,
+    TEST_CASE_STATUS,
+    TEST_CASE_RESULTS,
+    SEARCH_DOCUMENT_KINDS,
+    JOB_STATUS,
+)
+from .search import search_queryset
 
 
 class TestPlanFilter(django_filters.FilterSet):
     title = django_filters.CharFilter(lookup_expr="icontains")
     status = django_filters.ChoiceFilter(choices=TEST_PLAN_STATUS)
+    search = django_filters.CharFilter(method="filter_search")
+
+    def filter_search(self, queryset, _, value):
+        """Full-text search over title and description ranked by relevance"""
+        return search_queryset(queryset, value)
 
     class Meta:
         model = TestPlan
-        fields = ["title", "status"]
+        fields = ["title", "status", "search"]
 
 
 class TestCaseFilter(django_filters.FilterSet):
     title = django_filters.CharFilter(lookup_expr="icontains")
     status = django_filters.ChoiceFilter(choices=TEST_CASE_STATUS)
-    latest_result = django_filters.ChoiceFilter(
-        choices=TEST_CASE_RESULTS, method="filter_latest_result"
-    )
-
-    def filter_latest_result(self, queryset, _, value):
-        """Custom filter for latest_result which is a computed property"""
-        if not value:
-            return queryset
-
-        # Get test cases that have results matching the filter value
-        # We need to filter by the latest result for each test case
-        from django.db.models import OuterRef, Subquery
+    latest_result = django_filters.ChoiceFilter(choices=TEST_CASE_RESULTS)
+    search = django_filters.CharFilter(method="filter_search")
 
-        # Subquery to get the latest result for each test case
-        latest_results = (
-            TestResult.objects.filter(case=OuterRef("pk"))
-            .order_by("-executed_at")
-            .values("result")[:1]
-        )
-
-        # Filter test cases where the latest result matches the value
-        return queryset.annotate(latest_result_value=Subquery(latest_results)).filter(
-            latest_result_value=value
-        )
+    def filter_search(self, queryset, _, value):
+        """Full-text search over title and description ranked by relevance"""
+        return search_queryset(queryset, value)
 
     class Meta:
         model = TestCase
-        fields = ["title", "status", "latest_result"]
+        fields = ["title", "status", "latest_result", "search"]
 
 
 class TestResultFilter(django_filters.FilterSet):
@@ -71,3 +65,23 @@ class TestResultFilter(django_filters.FilterSet):
     class Meta:
         model = TestResult
         fields = ["case", "result", "tester", "configuration"]
+
+
+class SearchDocumentFilter(django_filters.FilterSet):
+    type = django_filters.MultipleChoiceFilter(
+        field_name="kind", choices=SEARCH_DOCUMENT_KINDS
+    )
+    plan = django_filters.NumberFilter(field_name="plan_id")
+
+    class Meta:
+        model = SearchDocument
+        fields = ["type", "plan"]
+
+
+class JobFilter(django_filters.FilterSet):
+    kind = django_filters.CharFilter()
+    status = django_filters.ChoiceFilter(choices=JOB_STATUS)
+
+    class Meta:
+        model = Job
+        fields = ["kind", "status"]
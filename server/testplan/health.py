@@ -0,0 +1,67 @@
+import logging
+import uuid
+
+from django.core.cache import cache
+from django.db import connection
+from django.http import JsonResponse
+from django.views.decorators.cache import never_cache
+
+logger = logging.getLogger(__name__)
+
+
+def check_database():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+
+def check_cache():
+    # The step and attachment lists are invalidated through the cache, so an
+    # app server that can't write to it would serve outdated lists
+    key = f"testplan:ready:{uuid.uuid4().hex}"
+    cache.set(key, 1, timeout=10)
+    try:
+        if cache.get(key) != 1:
+            raise RuntimeError("The cache did not keep the value written to it")
+    finally:
+        cache.delete(key)
+
+
+CHECKS = {
+    "database": check_database,
+    "cache": check_cache,
+}
+
+
+@never_cache
+async def live(request):
+    """
+    Liveness probe: the process answers requests, whatever the state of the
+    database and the cache. Async, so it answers on the event loop even when
+    all the threads of the sync views are busy.
+    """
+    return JsonResponse({"status": "ok"})
+
+
+@never_cache
+def ready(request):
+    """
+    Readiness probe: the database and the cache are reachable, so the app
+    server can take its share of the traffic. Answers 503 otherwise, for the
+    load balancer to route requests to the other replicas in the meantime.
+    """
+    checks = {}
+    for name, check in CHECKS.items():
+        try:
+            check()
+        except Exception:
+            logger.exception("Readiness check %s failed", name)
+            checks[name] = "error"
+        else:
+            checks[name] = "ok"
+
+    ok = all(status == "ok" for status in checks.values())
+    return JsonResponse(
+        {"status": "ok" if ok else "error", "checks": checks},
+        status=200 if ok else 503,
+    )
@@ -0,0 +1,177 @@
+from .models import (
+    SearchDocument,
+    TestPlan,
+    TestCase,
+    TestStep,
+    TestResult,
+    TestResultStep,
+)
+
+DOCUMENT_FIELDS = ["plan", "case", "step", "result", "result_step", "title", "body"]
+
+
+def plan_documents(plans):
+    return [
+        SearchDocument(
+            kind="plan",
+            object_id=plan.pk,
+            plan_id=plan.pk,
+            title=plan.title,
+            body=plan.description,
+        )
+        for plan in plans
+    ]
+
+
+def case_documents(cases):
+    return [
+        SearchDocument(
+            kind="case",
+            object_id=case.pk,
+            plan_id=case.plan_id,
+            case_id=case.pk,
+            title=case.title,
+            body=case.description,
+        )
+        for case in cases
+    ]
+
+
+def step_documents(steps, plan_id):
+    return [
+        SearchDocument(
+            kind="step",
+            object_id=step.pk,
+            plan_id=plan_id,
+            case_id=step.case_id,
+            step_id=step.pk,
+            title=step.action,
+            body=step.expected_result,
+        )
+        for step in steps
+    ]
+
+
+def result_step_documents(result_steps, plan_id, case_id):
+    return [
+        SearchDocument(
+            kind="result_step",
+            object_id=result_step.pk,
+            plan_id=plan_id,
+            case_id=case_id,
+            result_id=result_step.result_id,
+            result_step_id=result_step.pk,
+            body=result_step.comment,
+        )
+        for result_step in result_steps
+    ]
+
+
+def index_documents(documents):
+    """Insert or refresh search documents with a single upsert."""
+    if not documents:
+        return
+    SearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=["kind", "object_id"],
+        update_fields=DOCUMENT_FIELDS,
+    )
+
+
+def index_plans(plans):
+    index_documents(plan_documents(plans))
+
+
+def index_cases(cases):
+    index_documents(case_documents(cases))
+
+
+def move_case_documents(case_id, plan_id):
+    """
+    Move the documents of a test case, its steps and its result comments to
+    the test plan the test case was moved to.
+    """
+    SearchDocument.objects.filter(case_id=case_id).update(plan_id=plan_id)
+
+
+def index_steps(steps, plan_id=None):
+    """Index test steps, which all belong to the same test case."""
+    if not steps:
+        return
+    if plan_id is None:
+        plan_id = TestCase.objects.values_list("plan_id", flat=True).get(
+            pk=steps[0].case_id
+        )
+    index_documents(step_documents(steps, plan_id))
+
+
+def index_result_steps(result_steps, plan_id=None, case_id=None):
+    """
+    Index the comments of test result steps, which all belong to the same
+    test result. Steps without a comment are left out of the index.
+    """
+    if not result_steps:
+        return
+    if plan_id is None or case_id is None:
+        case_id, plan_id = TestResult.objects.values_list(
+            "case_id", "case__plan_id"
+        ).get(pk=result_steps[0].result_id)
+
+    commented = [result_step for result_step in result_steps if result_step.comment]
+    uncommented = [
+        result_step.pk for result_step in result_steps if not result_step.comment
+    ]
+    index_documents(result_step_documents(commented, plan_id, case_id))
+    if uncommented:
+        SearchDocument.objects.filter(
+            kind="result_step", object_id__in=uncommented
+        ).delete()
+
+
+def batched(queryset, batch_size):
+    batch = []
+    for obj in queryset.iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def reindex_all(batch_size=1000):
+    """Drop every search document and rebuild them from the source rows."""
+    SearchDocument.objects.all().delete()
+
+    for plans in batched(TestPlan.objects.order_by("pk"), batch_size):
+        index_plans(plans)
+    for cases in batched(TestCase.objects.order_by("pk"), batch_size):
+        index_cases(cases)
+    for steps in batched(
+        TestStep.objects.select_related("case").order_by("pk"), batch_size
+    ):
+        index_documents(
+            [
+                document
+                for step in steps
+                for document in step_documents([step], step.case.plan_id)
+            ]
+        )
+    for result_steps in batched(
+        TestResultStep.objects.exclude(comment="")
+        .select_related("result__case")
+        .order_by("pk"),
+        batch_size,
+    ):
+        index_documents(
+            [
+                document
+                for result_step in result_steps
+                for document in result_step_documents(
+                    [result_step],
+                    result_step.result.case.plan_id,
+                    result_step.result.case_id,
+                )
+            ]
+        )
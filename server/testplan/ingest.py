@@ -0,0 +1,131 @@
+from django.db import DatabaseError, transaction
+
+from . import indexing
+from .models import TestCase, TestResult, TestResultStep, TestStep
+from .serializers import TestResultIngestSerializer
+
+# Number of test results written per transaction
+INGEST_CHUNK_SIZE = 500
+
+
+def created(index, result):
+    return {"index": index, "status": "created", "id": result.pk}
+
+
+def failed(index, errors):
+    return {"index": index, "status": "error", "errors": errors}
+
+
+def validate_results(plan_id, items):
+    """
+    Validate the items of a bulk ingest. Returns the validated data of the
+    valid items as (index, data) pairs and the status of the invalid ones.
+    The test case and test step references are checked with one query each.
+    """
+    case_ids = set(
+        TestCase.objects.filter(plan_id=plan_id).values_list("pk", flat=True)
+    )
+    step_cases = dict(
+        TestStep.objects.filter(case__plan_id=plan_id).values_list("pk", "case_id")
+    )
+
+    valid = []
+    statuses = []
+    for index, item in enumerate(items):
+        serializer = TestResultIngestSerializer(data=item)
+        if not serializer.is_valid():
+            statuses.append(failed(index, serializer.errors))
+            continue
+        data = serializer.validated_data
+
+        errors = {}
+        if data["case_id"] not in case_ids:
+            errors["case"] = [
+                f"Test case {data['case_id']} not found or does not belong to test plan {plan_id}"
+            ]
+        step_errors = [{} for _ in data["steps"]]
+        orders = set()
+        for step_index, step_data in enumerate(data["steps"]):
+            step_id = step_data.get("step_id")
+            if step_id is not None and step_cases.get(step_id) != data["case_id"]:
+                step_errors[step_index]["step"] = [
+                    f"Test step {step_id} not found or does not belong to test case {data['case_id']}"
+                ]
+            if step_data["order"] in orders:
+                step_errors[step_index]["order"] = ["Duplicate test result step order."]
+            orders.add(step_data["order"])
+        if any(step_errors):
+            errors["steps"] = step_errors
+
+        if errors:
+            statuses.append(failed(index, errors))
+        else:
+            valid.append((index, data))
+    return valid, statuses
+
+
+def save_results(plan_id, chunk, tester):
+    """Save one chunk of validated test results with their steps."""
+    with transaction.atomic():
+        results = TestResult.objects.bulk_create(
+            [
+                TestResult(
+                    tester=tester,
+                    **{
+                        field: value
+                        for field, value in data.items()
+                        if field != "steps"
+                    },
+                )
+                for _, data in chunk
+            ]
+        )
+        result_steps = TestResultStep.objects.bulk_create(
+            [
+                TestResultStep(result=result, **step_data)
+                for result, (_, data) in zip(results, chunk)
+                for step_data in data["steps"]
+            ]
+        )
+
+        # Bulk writes skip the post_save signals, so update the latest results,
+        # plan statistics and search index explicitly
+        TestCase.refresh_latest_results({result.case_id for result in results})
+        case_ids = {result.pk: result.case_id for result in results}
+        indexing.index_documents(
+            [
+                document
+                for result_step in result_steps
+                if result_step.comment
+                for document in indexing.result_step_documents(
+                    [result_step], plan_id, case_ids[result_step.result_id]
+                )
+            ]
+        )
+    return results
+
+
+def ingest_results(plan_id, items, tester, chunk_size=INGEST_CHUNK_SIZE):
+    """
+    Validate and save a batch of test results with their steps, as posted by
+    automated runs. Valid items are written with bulk_create in transactions
+    of chunk_size results; invalid ones are skipped.
+    Returns the status of every item in input order.
+    """
+    valid, statuses = validate_results(plan_id, items)
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start : start + chunk_size]
+        try:
+            results = save_results(plan_id, chunk, tester)
+        except DatabaseError:
+            statuses += [
+                failed(index, {"non_field_errors": ["Could not save the test result."]})
+                for index, _ in chunk
+            ]
+            continue
+        statuses += [
+            created(index, result) for result, (index, _) in zip(results, chunk)
+        ]
+
+    return sorted(statuses, key=lambda item_status: item_status["index"])
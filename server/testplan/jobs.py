@@ -0,0 +1,214 @@
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Functions run for each kind of job, registered with @task
+TASKS = {}
+# Attempts of the kinds of jobs not to retry as many times as JOB_MAX_ATTEMPTS
+MAX_ATTEMPTS = {}
+
+
+class JobError(Exception):
+    """Raised by a task to fail its job right away, without retrying it."""
+
+
+def task(kind, max_attempts=None):
+    """
+    Register the decorated function as the task run for jobs of this kind,
+    tried max_attempts times at most instead of JOB_MAX_ATTEMPTS if given.
+    """
+
+    def register(func):
+        TASKS[kind] = func
+        if max_attempts is not None:
+            MAX_ATTEMPTS[kind] = max_attempts
+        return func
+
+    return register
+
+
+def enqueue(kind, payload=None, user=None, delay=0):
+    """
+    Queue a job running the task of the given kind with the payload as its
+    keyword arguments. The job is inserted in the current transaction, so
+    workers only see it once the work it is about has been committed.
+    """
+    if kind not in TASKS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(
+        kind=kind,
+        payload=payload or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=MAX_ATTEMPTS.get(kind, settings.JOB_MAX_ATTEMPTS),
+    )
+
+
+def retry_delay(attempts):
+    """Seconds to wait before retrying a job that failed its nth attempt."""
+    return min(
+        settings.JOB_RETRY_DELAY * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_DELAY
+    )
+
+
+def claim(worker, limit=1):
+    """
+    Mark up to limit due jobs as running for the worker and return their IDs,
+    oldest first. SELECT ... FOR UPDATE SKIP LOCKED lets concurrent workers
+    pick different jobs without waiting on each other's locks. Databases
+    without row locks fall back to the conditional UPDATE, which only one
+    worker can win for a given job.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job_ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status="queued", run_at__lte=now)
+            .order_by("run_at", "id")
+            .values_list("pk", flat=True)[:limit]
+        )
+        return [
+            job_id
+            for job_id in job_ids
+            if Job.objects.filter(pk=job_id, status="queued").update(
+                status="running",
+                locked_by=worker,
+                locked_at=now,
+                attempts=F("attempts") + 1,
+            )
+        ]
+
+
+def heartbeat(job_id, worker, stop):
+    """
+    Refresh the lock of a job every JOB_HEARTBEAT seconds until stop is set,
+    for as long as the worker still holds it.
+    """
+    try:
+        while not stop.wait(settings.JOB_HEARTBEAT):
+            try:
+                if not Job.objects.filter(
+                    pk=job_id, status="running", locked_by=worker
+                ).update(locked_at=timezone.now()):
+                    return
+            except DatabaseError:
+                logger.warning("Refreshing the lock of job %s failed", job_id)
+    finally:
+        connections.close_all()
+
+
+@contextmanager
+def keep_locked(job_id, worker):
+    """
+    Keep refreshing the lock of a job in a thread of its own while the block
+    runs, so requeue_stale() does not take jobs running for longer than
+    JOB_TIMEOUT away from a live worker.
+    """
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=heartbeat,
+        args=(job_id, worker, stop),
+        name=f"job-{job_id}-heartbeat",
+        daemon=True,
+    )
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run(job_id, worker):
+    """
+    Run a job claimed by the worker and record its result, or its error.
+    Jobs that fail are queued again after retry_delay() until they run out
+    of attempts; those raising JobError or of an unknown kind fail at once.
+    Returns the final status of the job.
+    """
+    job = Job.objects.get(pk=job_id)
+    fields = {"locked_by": "", "locked_at": None}
+    try:
+        func = TASKS.get(job.kind)
+        if func is None:
+            raise JobError(f"Unknown job kind: {job.kind}")
+        with keep_locked(job.pk, worker):
+            fields["result"] = func(**job.payload)
+    except Exception as e:
+        retry = not isinstance(e, JobError) and job.attempts < job.max_attempts
+        logger.warning(
+            "Job %s failed on attempt %s of %s",
+            job,
+            job.attempts,
+            job.max_attempts,
+            exc_info=not isinstance(e, JobError),
+        )
+        fields["error"] = str(e) or type(e).__name__
+        if retry:
+            fields["status"] = "queued"
+            fields["run_at"] = timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts)
+            )
+        else:
+            fields["status"] = "failed"
+            fields["finished_at"] = timezone.now()
+    else:
+        fields["status"] = "succeeded"
+        fields["error"] = ""
+        fields["finished_at"] = timezone.now()
+
+    # The job may have been requeued as stale and claimed by another worker
+    Job.objects.filter(pk=job.pk, status="running", locked_by=worker).update(
+        updated_at=timezone.now(), **fields
+    )
+    return fields["status"]
+
+
+def execute(job_id, worker):
+    """run() for pool workers, which hold database connections of their own."""
+    try:
+        return run(job_id, worker)
+    except Exception:
+        logger.exception("Running job %s failed", job_id)
+    finally:
+        connections.close_all()
+
+
+def run_pending(worker="inline"):
+    """Run the due jobs one after another in this thread. Returns their count."""
+    count = 0
+    while job_ids := claim(worker):
+        run(job_ids[0], worker)
+        count += 1
+    return count
+
+
+def requeue_stale():
+    """
+    Release the running jobs whose lock was not refreshed for longer than
+    JOB_TIMEOUT, whose worker is assumed to have died: they are queued again
+    when they have attempts left and failed otherwise. Returns the number of
+    released jobs.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status="running", locked_at__lt=now - timedelta(seconds=settings.JOB_TIMEOUT)
+    )
+    released = {"locked_by": "", "locked_at": None, "updated_at": now}
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status="failed",
+        error="The worker running the job stopped.",
+        finished_at=now,
+        **released,
+    )
+    return failed + stale.update(status="queued", run_at=now, **released)
@@ -0,0 +1,197 @@
+import xml.etree.ElementTree as ET
+from contextlib import nullcontext
+
+from django.db import transaction
+
+from .constants import BROWSER_LIST, OS_LIST
+from .ingest import INGEST_CHUNK_SIZE, save_results
+from .models import TestCase
+
+# Number of unmatched test case names listed in the import summary
+UNMATCHED_NAMES_LIMIT = 100
+
+
+class JUnitImportError(Exception):
+    """
+    Raised when a report cannot be read to the end. Unless the import was
+    atomic, the test results of the test cases before the error are kept,
+    as told by the summary.
+    """
+
+    def __init__(self, message, summary):
+        super().__init__(message)
+        self.summary = summary
+
+
+def local_name(tag):
+    """Tag name without the XML namespace."""
+    return tag.rsplit("}", 1)[-1]
+
+
+def find_child(element, name):
+    for child in element:
+        if local_name(child.tag) == name:
+            return child
+    return None
+
+
+def testcase_data(element):
+    failure = find_child(element, "failure")
+    if failure is None:
+        failure = find_child(element, "error")
+
+    if failure is not None:
+        result = "fail"
+        message = failure.get("message") or (failure.text or "").strip()
+    elif find_child(element, "skipped") is not None:
+        result = None
+        message = ""
+    else:
+        result = "pass"
+        message = ""
+
+    return {
+        "name": element.get("name", ""),
+        "classname": element.get("classname", ""),
+        "result": result,
+        "message": message,
+    }
+
+
+def parse_junit(source):
+    """
+    Yield the test cases of a JUnit/xUnit XML report as dicts with their name,
+    classname, result (None when skipped) and failure message.
+    The report is parsed incrementally and processed elements are dropped,
+    so memory use does not grow with the size of the report.
+    """
+    parents = []
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+
+        parents.pop()
+        if local_name(element.tag) != "testcase":
+            continue
+
+        yield testcase_data(element)
+
+        # Drop the processed test case along with its earlier siblings
+        if parents:
+            del parents[-1][:]
+
+
+def title_index(plan_id):
+    """
+    Map the titles of the test cases of a test plan to their IDs.
+    The oldest test case wins when titles are duplicated.
+    """
+    index = {}
+    for pk, title in (
+        TestCase.objects.filter(plan_id=plan_id)
+        .order_by("-pk")
+        .values_list("pk", "title")
+        .iterator()
+    ):
+        index[title] = pk
+    return index
+
+
+def record_testcases(source, plan_id, tester, browser, os, batch_size, summary):
+    """
+    Record the test cases of the report in batches of batch_size results,
+    counting them in the summary. On a malformed report, the test cases read
+    before the error are recorded before the ParseError is raised.
+    """
+    titles = title_index(plan_id)
+    batch = []
+    try:
+        for index, testcase in enumerate(parse_junit(source)):
+            summary["total"] += 1
+            if testcase["result"] is None:
+                summary["skipped"] += 1
+                continue
+
+            full_name = f"{testcase['classname']}.{testcase['name']}"
+            case_id = titles.get(testcase["name"], titles.get(full_name))
+            if case_id is None:
+                summary["unmatched"] += 1
+                if len(summary["unmatched_names"]) < UNMATCHED_NAMES_LIMIT:
+                    summary["unmatched_names"].append(testcase["name"])
+                continue
+
+            steps = []
+            if testcase["message"]:
+                steps.append(
+                    {"order": 1, "status": "fail", "comment": testcase["message"]}
+                )
+            batch.append(
+                (
+                    index,
+                    {
+                        "case_id": case_id,
+                        "result": testcase["result"],
+                        "browser": browser,
+                        "os": os,
+                        "steps": steps,
+                    },
+                )
+            )
+
+            if len(batch) >= batch_size:
+                summary["created"] += len(save_results(plan_id, batch, tester))
+                batch = []
+    except ET.ParseError:
+        if batch:
+            summary["created"] += len(save_results(plan_id, batch, tester))
+        raise
+
+    if batch:
+        summary["created"] += len(save_results(plan_id, batch, tester))
+
+
+def import_junit(
+    source,
+    plan_id,
+    tester,
+    browser=BROWSER_LIST[0][0],
+    os=OS_LIST[0][0],
+    batch_size=INGEST_CHUNK_SIZE,
+    atomic=False,
+):
+    """
+    Record the test cases of a JUnit/xUnit XML report as test results of the
+    test cases with the same title in the test plan, matched by name or by
+    "classname.name". Failure messages are kept as the comment of a single
+    failed test result step. Skipped and unmatched test cases are not recorded.
+    Results are written in transactions of batch_size results, each one
+    updating the plan statistics once, so an import of any size holds the
+    row locks of the test plan only for the time of a batch. Raises
+    JUnitImportError for a malformed report, once the test cases before
+    the error are recorded.
+    With atomic=True the whole report is recorded in a single transaction
+    instead, and nothing is recorded from a malformed report.
+    """
+    summary = {
+        "total": 0,
+        "created": 0,
+        "skipped": 0,
+        "unmatched": 0,
+        "unmatched_names": [],
+    }
+
+    try:
+        with transaction.atomic() if atomic else nullcontext():
+            record_testcases(source, plan_id, tester, browser, os, batch_size, summary)
+    except ET.ParseError as e:
+        if atomic:
+            summary["created"] = 0
+            outcome = "no test results were recorded"
+        else:
+            outcome = f"{summary['created']} test results recorded before the error"
+        raise JUnitImportError(
+            f"Invalid JUnit XML report: {e} ({outcome})", summary
+        ) from e
+
+    return summary
@@ -0,0 +1,666 @@
+import json
+import math
+import random
+import re
+from xml.sax.saxutils import quoteattr
+
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from faker import Faker
+
+from . import indexing
+from .constants import (
+    BROWSER_LIST,
+    OS_LIST,
+    TEST_CASE_RESULTS,
+    TEST_CASE_STATUS,
+    TEST_PLAN_STATUS,
+    TEST_RESULT_STEP_STATUS,
+)
+from .ingest import ingest_results
+from .models import (
+    Job,
+    TestCase,
+    TestPlan,
+    TestResult,
+    TestResultStep,
+    TestResultStepAttachment,
+    TestStep,
+    TestStepAttachment,
+)
+from .storage import presigned_post
+from .uploads import UPLOAD_TOKEN_SALT, upload_name
+
+API = "/api/v1"
+
+# Title prefix of the test plans of load tests, by which they are deleted
+TITLE_PREFIX = "[loadtest]"
+
+# Content of every attachment file, stored once as a shared blob
+ATTACHMENT_CONTENT = b"Attached by manage.py loadtest\n"
+
+# Test results posted at once to the bulk and JUnit endpoints
+BATCH_SIZE = 10
+
+
+def percentile(values, p):
+    """The p-th percentile of sorted values, in the nearest-rank sense."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def summarize(latencies, errors, elapsed=None):
+    values = sorted(latencies)
+    summary = {
+        "requests": len(values),
+        "errors": errors,
+        **{
+            f"p{p}_ms": round(percentile(values, p) * 1000, 2) if values else None
+            for p in (50, 95, 99)
+        },
+    }
+    if elapsed is not None:
+        summary["seconds"] = round(elapsed, 3)
+        summary["requests_per_second"] = round(len(values) / elapsed, 1)
+    return summary
+
+
+def json_request(path, data):
+    return path, json.dumps(data).encode(), "application/json"
+
+
+def multipart_request(path, data):
+    return path, encode_multipart(BOUNDARY, data), MULTIPART_CONTENT
+
+
+def attachment_file():
+    return ContentFile(ATTACHMENT_CONTENT, name="notes.txt")
+
+
+def plan_url(plan_id):
+    return f"{API}/testplans/{plan_id}/"
+
+
+def case_url(plan_id, case_id):
+    return f"{plan_url(plan_id)}testcases/{case_id}/"
+
+
+def result_url(plan_id, case_id, result_id):
+    return f"{case_url(plan_id, case_id)}testresults/{result_id}/"
+
+
+class Dataset:
+    """
+    Test plans seeded for a load test, along with the IDs its requests are
+    made of. Requests replacing or deleting rows get rows of their own in a
+    scratch test plan, so they never take away what other requests read.
+    """
+
+    def __init__(self, user, seed=0):
+        self.user = user
+        self.rng = random.Random(seed)
+        self.fake = Faker()
+        self.fake.seed_instance(seed)
+
+        self.plans = []
+        # Test cases of each test plan, with their title and test steps as
+        # (id, order) pairs
+        self.cases = {}
+        self.titles = {}
+        self.steps = {}
+        # Test results as (plan id, case id, result id)
+        self.results = []
+        # Test results without attachments, whose steps can be replaced
+        self.replaceable_results = []
+        # Attachments as (plan id, case id, attachment id) and
+        # (plan id, case id, result id, attachment id)
+        self.step_attachments = []
+        self.result_step_attachments = []
+        # Words of the test case titles to search for
+        self.words = []
+        self.job_id = None
+        self.scratch_plan_id = None
+
+    def seed(
+        self, plans, cases_per_plan, steps_per_case, results_per_case, attachments
+    ):
+        """
+        Create the test plans through the same code paths as the API, so the
+        statistics, latest results, search index and blobs are all in place.
+        """
+        fake = self.fake
+        for _ in range(plans):
+            plan = TestPlan.objects.create(
+                title=self.title(),
+                description=fake.paragraph(),
+                status=self.choice(TEST_PLAN_STATUS),
+            )
+            self.plans.append(plan.pk)
+            self.cases[plan.pk] = []
+
+            items = []
+            for _ in range(cases_per_plan):
+                case = TestCase.objects.create(
+                    plan=plan,
+                    title=fake.catch_phrase(),
+                    description=fake.paragraph(),
+                    status=self.choice(TEST_CASE_STATUS),
+                )
+                self.cases[plan.pk].append(case.pk)
+                self.titles[case.pk] = case.title
+                self.words += re.findall(r"[a-z]{4,}", case.title.lower())
+
+                steps = TestStep.objects.bulk_create(
+                    [
+                        TestStep(
+                            case=case,
+                            order=order,
+                            action=fake.sentence(),
+                            expected_result=fake.sentence(),
+                        )
+                        for order in range(1, steps_per_case + 1)
+                    ]
+                )
+                # Bulk writes skip the post_save signals that index the steps
+                indexing.index_steps(steps, plan.pk)
+                self.steps[case.pk] = [(step.pk, step.order) for step in steps]
+                items += [self.result_item(case.pk) for _ in range(results_per_case)]
+
+            statuses = ingest_results(plan.pk, items, self.user)
+            first_results = set()
+            for item, status in zip(items, statuses):
+                result = (plan.pk, item["case"], status["id"])
+                self.results.append(result)
+                if item["case"] in first_results:
+                    self.replaceable_results.append(result)
+                    continue
+                first_results.add(item["case"])
+                self.attach(result, attachments)
+
+        self.words = sorted(set(self.words))
+        self.job_id = Job.objects.create(
+            kind="rebuild_plan_stats",
+            status="succeeded",
+            attempts=1,
+            result={"rebuilt": len(self.plans)},
+            created_by=self.user,
+        ).pk
+        self.scratch_plan_id = TestPlan.objects.create(
+            title=f"{TITLE_PREFIX} Scratch"
+        ).pk
+
+    def attach(self, result, count):
+        # Attachments of the first step of the test case and of the first step
+        # of its first test result, which the download requests read
+        plan_id, case_id, result_id = result
+        step_id = self.steps[case_id][0][0]
+        result_step_id = (
+            TestResultStep.objects.filter(result_id=result_id)
+            .order_by("order")
+            .values_list("pk", flat=True)
+            .first()
+        )
+        for _ in range(count):
+            attachment = TestStepAttachment(step_id=step_id, file=attachment_file())
+            attachment.save()
+            self.step_attachments.append((plan_id, case_id, attachment.pk))
+            attachment = TestResultStepAttachment(
+                result_step_id=result_step_id, file=attachment_file()
+            )
+            attachment.save()
+            self.result_step_attachments.append(
+                (plan_id, case_id, result_id, attachment.pk)
+            )
+
+    def delete(self):
+        """Delete the test plans of every load test, and what they hold."""
+        TestPlan.objects.filter(title__startswith=TITLE_PREFIX).delete()
+        Job.objects.filter(pk=self.job_id).delete()
+
+    def title(self):
+        return f"{TITLE_PREFIX} {self.fake.catch_phrase()}"
+
+    def choice(self, choices):
+        return self.rng.choice(choices)[0]
+
+    def plan(self):
+        return self.rng.choice(self.plans)
+
+    def case(self):
+        plan_id = self.plan()
+        return plan_id, self.rng.choice(self.cases[plan_id])
+
+    def result_item(self, case_id):
+        return {
+            "case": case_id,
+            "result": self.choice(TEST_CASE_RESULTS),
+            "browser": self.choice(BROWSER_LIST),
+            "os": self.choice(OS_LIST),
+            "steps": [
+                {
+                    "step": step_id,
+                    "order": order,
+                    "action": self.fake.sentence(),
+                    "expected_result": self.fake.sentence(),
+                    "status": self.choice(TEST_RESULT_STEP_STATUS),
+                    "comment": self.fake.sentence() if self.rng.random() < 0.3 else "",
+                }
+                for step_id, order in self.steps[case_id]
+            ],
+        }
+
+    def scratch_case(self):
+        """A test case with one test step in the scratch test plan"""
+        case = TestCase.objects.create(
+            plan_id=self.scratch_plan_id, title=self.fake.catch_phrase()
+        )
+        step = TestStep.objects.create(case=case, order=1, action=self.fake.sentence())
+        return self.scratch_plan_id, case.pk, step.pk
+
+    def scratch_result(self):
+        """A test result with one test result step in the scratch test plan"""
+        plan_id, case_id, step_id = self.scratch_case()
+        result = TestResult.objects.create(case_id=case_id, tester=self.user)
+        result_step = TestResultStep.objects.create(
+            result=result, step_id=step_id, order=1
+        )
+        return plan_id, case_id, result.pk, result_step.pk
+
+    def direct_upload(self, model, scope):
+        """
+        Store a file the way a browser does with a presigned POST policy and
+        return the token confirming it, as issued by uploads.issue_upload().
+        """
+        field = model._meta.get_field("file")
+        name = field.storage.save(
+            upload_name(field, "notes.txt"), ContentFile(ATTACHMENT_CONTENT)
+        )
+        return signing.dumps({"name": name, **scope}, salt=UPLOAD_TOKEN_SALT)
+
+
+def plan_create(dataset):
+    return json_request(f"{API}/testplans/", {"title": dataset.title()})
+
+
+def plan_update(dataset):
+    return json_request(
+        plan_url(dataset.plan()),
+        {
+            "title": dataset.title(),
+            "description": dataset.fake.paragraph(),
+            "status": dataset.choice(TEST_PLAN_STATUS),
+        },
+    )
+
+
+def plan_partial_update(dataset):
+    return json_request(
+        plan_url(dataset.plan()), {"status": dataset.choice(TEST_PLAN_STATUS)}
+    )
+
+
+def plan_delete(dataset):
+    plan = TestPlan.objects.create(title=dataset.title())
+    return plan_url(plan.pk), None, None
+
+
+def case_create(dataset):
+    plan_id = dataset.plan()
+    return json_request(
+        f"{plan_url(plan_id)}testcases/",
+        {
+            "plan": plan_id,
+            "title": dataset.fake.catch_phrase(),
+            "description": dataset.fake.paragraph(),
+            "status": dataset.choice(TEST_CASE_STATUS),
+        },
+    )
+
+
+def case_update(dataset):
+    plan_id, case_id = dataset.case()
+    return json_request(
+        case_url(plan_id, case_id),
+        {
+            "plan": plan_id,
+            # The JUnit reports are matched by title
+            "title": dataset.titles[case_id],
+            "description": dataset.fake.paragraph(),
+            "status": dataset.choice(TEST_CASE_STATUS),
+        },
+    )
+
+
+def case_partial_update(dataset):
+    return json_request(
+        case_url(*dataset.case()), {"status": dataset.choice(TEST_CASE_STATUS)}
+    )
+
+
+def case_delete(dataset):
+    plan_id, case_id, _ = dataset.scratch_case()
+    return case_url(plan_id, case_id), None, None
+
+
+def result_bulk(dataset):
+    plan_id = dataset.plan()
+    cases = dataset.rng.sample(
+        dataset.cases[plan_id], min(BATCH_SIZE, len(dataset.cases[plan_id]))
+    )
+    return json_request(
+        f"{plan_url(plan_id)}testresults/bulk/",
+        [dataset.result_item(case_id) for case_id in cases],
+    )
+
+
+def result_junit(dataset):
+    plan_id = dataset.plan()
+    cases = dataset.rng.sample(
+        dataset.cases[plan_id], min(BATCH_SIZE, len(dataset.cases[plan_id]))
+    )
+    testcases = "".join(
+        f"<testcase classname={quoteattr('loadtest')} name={quoteattr(dataset.titles[case_id])}>"
+        + ("" if dataset.rng.random() < 0.8 else "<failure/>")
+        + "</testcase>"
+        for case_id in cases
+    )
+    report = ContentFile(
+        f'<testsuite name="loadtest">{testcases}</testsuite>'.encode(),
+        name="report.xml",
+    )
+    return multipart_request(
+        f"{plan_url(plan_id)}testresults/junit/",
+        {
+            "file": report,
+            "browser": dataset.choice(BROWSER_LIST),
+            "os": dataset.choice(OS_LIST),
+        },
+    )
+
+
+def result_data(dataset, case_id):
+    return {
+        "case": case_id,
+        "result": dataset.choice(TEST_CASE_RESULTS),
+        "browser": dataset.choice(BROWSER_LIST),
+        "os": dataset.choice(OS_LIST),
+        "tester": dataset.user.pk,
+    }
+
+
+def result_create(dataset):
+    plan_id, case_id = dataset.case()
+    return json_request(
+        f"{case_url(plan_id, case_id)}testresults/", result_data(dataset, case_id)
+    )
+
+
+def result_update(dataset):
+    plan_id, case_id, result_id = dataset.rng.choice(dataset.results)
+    return json_request(
+        result_url(plan_id, case_id, result_id), result_data(dataset, case_id)
+    )
+
+
+def result_partial_update(dataset):
+    return json_request(
+        result_url(*dataset.rng.choice(dataset.results)),
+        {"result": dataset.choice(TEST_CASE_RESULTS)},
+    )
+
+
+def result_delete(dataset):
+    plan_id, case_id, result_id, _ = dataset.scratch_result()
+    return result_url(plan_id, case_id, result_id), None, None
+
+
+def step_replace(dataset):
+    # The same test steps with new text, which keep their IDs
+    plan_id, case_id = dataset.case()
+    return json_request(
+        f"{case_url(plan_id, case_id)}teststeps/",
+        [
+            {
+                "id": step_id,
+                "order": order,
+                "action": dataset.fake.sentence(),
+                "expected_result": dataset.fake.sentence(),
+            }
+            for step_id, order in dataset.steps[case_id]
+        ],
+    )
+
+
+def step_attachment_replace(dataset):
+    plan_id, case_id, _ = dataset.scratch_case()
+    return multipart_request(
+        f"{case_url(plan_id, case_id)}teststepattachments/",
+        {"0_step": 1, "0_file": attachment_file()},
+    )
+
+
+def step_attachment_add(dataset):
+    plan_id, case_id, _ = dataset.scratch_case()
+    return multipart_request(
+        f"{case_url(plan_id, case_id)}teststepattachments/add/",
+        {"step": 1, "file": attachment_file()},
+    )
+
+
+def step_attachment_delete(dataset):
+    plan_id, case_id, step_id = dataset.scratch_case()
+    attachment = TestStepAttachment(step_id=step_id, file=attachment_file())
+    attachment.save()
+    return (
+        f"{case_url(plan_id, case_id)}teststepattachments/{attachment.pk}/",
+        None,
+        None,
+    )
+
+
+def step_attachment_uploads(dataset):
+    return json_request(
+        f"{case_url(*dataset.case())}teststepattachments/uploads/",
+        [{"step": 1, "filename": "notes.txt", "content_type": "text/plain"}],
+    )
+
+
+def step_attachment_confirm(dataset):
+    plan_id, case_id, step_id = dataset.scratch_case()
+    token = dataset.direct_upload(
+        TestStepAttachment, {"case": case_id, "step": step_id}
+    )
+    return json_request(
+        f"{case_url(plan_id, case_id)}teststepattachments/uploads/confirm/",
+        {"tokens": [token]},
+    )
+
+
+def step_attachment_download(dataset):
+    plan_id, case_id, attachment_id = dataset.rng.choice(dataset.step_attachments)
+    return (
+        f"{case_url(plan_id, case_id)}teststepattachments/{attachment_id}/download/",
+        None,
+        None,
+    )
+
+
+def result_step_replace(dataset):
+    plan_id, case_id, result_id = dataset.rng.choice(dataset.replaceable_results)
+    return json_request(
+        f"{result_url(plan_id, case_id, result_id)}testresultsteps/",
+        dataset.result_item(case_id)["steps"],
+    )
+
+
+def result_step_attachment_replace(dataset):
+    plan_id, case_id, result_id, _ = dataset.scratch_result()
+    return multipart_request(
+        f"{result_url(plan_id, case_id, result_id)}testresultstepattachments/",
+        {"0_result_step": 1, "0_file": attachment_file()},
+    )
+
+
+def result_step_attachment_add(dataset):
+    plan_id, case_id, result_id, _ = dataset.scratch_result()
+    return multipart_request(
+        f"{result_url(plan_id, case_id, result_id)}testresultstepattachments/add/",
+        {"result_step": 1, "file": attachment_file()},
+    )
+
+
+def result_step_attachment_delete(dataset):
+    plan_id, case_id, result_id, result_step_id = dataset.scratch_result()
+    attachment = TestResultStepAttachment(
+        result_step_id=result_step_id, file=attachment_file()
+    )
+    attachment.save()
+    return (
+        f"{result_url(plan_id, case_id, result_id)}testresultstepattachments/{attachment.pk}/",
+        None,
+        None,
+    )
+
+
+def result_step_attachment_uploads(dataset):
+    return json_request(
+        f"{result_url(*dataset.rng.choice(dataset.results))}testresultstepattachments/uploads/",
+        [{"result_step": 1, "filename": "notes.txt", "content_type": "text/plain"}],
+    )
+
+
+def result_step_attachment_confirm(dataset):
+    plan_id, case_id, result_id, result_step_id = dataset.scratch_result()
+    token = dataset.direct_upload(
+        TestResultStepAttachment, {"result": result_id, "result_step": result_step_id}
+    )
+    return json_request(
+        f"{result_url(plan_id, case_id, result_id)}testresultstepattachments/uploads/confirm/",
+        {"tokens": [token]},
+    )
+
+
+def result_step_attachment_download(dataset):
+    plan_id, case_id, result_id, attachment_id = dataset.rng.choice(
+        dataset.result_step_attachments
+    )
+    return (
+        f"{result_url(plan_id, case_id, result_id)}testresultstepattachments/{attachment_id}/download/",
+        None,
+        None,
+    )
+
+
+def get(url):
+    """Prepare a GET request of the URL returned for the dataset"""
+    return lambda dataset: (url(dataset), None, None)
+
+
+# Every route of testplan/urls.py with each of its methods, and how often it
+# is requested relative to the others: mostly the reads of people going
+# through their test plans, and fewer writes recording their test results.
+# Each prepare function returns the path, body and content type of a request.
+ENDPOINTS = [
+    # name, method, weight, prepare
+    ("api root", "GET", 1, get(lambda d: f"{API}/")),
+    ("plan list", "GET", 10, get(lambda d: f"{API}/testplans/")),
+    ("plan create", "POST", 1, plan_create),
+    ("plan detail", "GET", 8, get(lambda d: plan_url(d.plan()))),
+    ("plan update", "PUT", 1, plan_update),
+    ("plan partial update", "PATCH", 1, plan_partial_update),
+    ("plan delete", "DELETE", 1, plan_delete),
+    ("plan summary", "GET", 4, get(lambda d: f"{plan_url(d.plan())}summary/")),
+    ("user list", "GET", 1, get(lambda d: f"{API}/users/")),
+    ("user me", "GET", 2, get(lambda d: f"{API}/users/me/")),
+    ("job list", "GET", 1, get(lambda d: f"{API}/jobs/")),
+    ("job detail", "GET", 1, get(lambda d: f"{API}/jobs/{d.job_id}/")),
+    ("search", "GET", 3, get(lambda d: f"{API}/search/?q={d.rng.choice(d.words)}")),
+    ("case list", "GET", 10, get(lambda d: f"{plan_url(d.plan())}testcases/")),
+    ("case create", "POST", 2, case_create),
+    ("case detail", "GET", 8, get(lambda d: case_url(*d.case()))),
+    ("case update", "PUT", 1, case_update),
+    ("case partial update", "PATCH", 1, case_partial_update),
+    ("case delete", "DELETE", 1, case_delete),
+    ("plan result list", "GET", 4, get(lambda d: f"{plan_url(d.plan())}testresults/")),
+    ("result bulk", "POST", 1, result_bulk),
+    (
+        "result export",
+        "GET",
+        1,
+        get(lambda d: f"{plan_url(d.plan())}testresults/export/?format=csv"),
+    ),
+    ("result junit", "POST", 1, result_junit),
+    ("case result list", "GET", 4, get(lambda d: f"{case_url(*d.case())}testresults/")),
+    ("result create", "POST", 3, result_create),
+    ("result detail", "GET", 4, get(lambda d: result_url(*d.rng.choice(d.results)))),
+    ("result update", "PUT", 1, result_update),
+    ("result partial update", "PATCH", 1, result_partial_update),
+    ("result delete", "DELETE", 1, result_delete),
+    ("step list", "GET", 8, get(lambda d: f"{case_url(*d.case())}teststeps/")),
+    ("step replace", "POST", 2, step_replace),
+    (
+        "step attachment list",
+        "GET",
+        4,
+        get(lambda d: f"{case_url(*d.case())}teststepattachments/"),
+    ),
+    ("step attachment replace", "POST", 1, step_attachment_replace),
+    ("step attachment add", "POST", 1, step_attachment_add),
+    ("step attachment delete", "DELETE", 1, step_attachment_delete),
+    ("step attachment uploads", "POST", 1, step_attachment_uploads),
+    ("step attachment confirm", "POST", 1, step_attachment_confirm),
+    ("step attachment download", "GET", 2, step_attachment_download),
+    (
+        "result step list",
+        "GET",
+        4,
+        get(lambda d: f"{result_url(*d.rng.choice(d.results))}testresultsteps/"),
+    ),
+    ("result step replace", "POST", 2, result_step_replace),
+    (
+        "result step attachment list",
+        "GET",
+        2,
+        get(
+            lambda d: f"{result_url(*d.rng.choice(d.results))}testresultstepattachments/"
+        ),
+    ),
+    ("result step attachment replace", "POST", 1, result_step_attachment_replace),
+    ("result step attachment add", "POST", 1, result_step_attachment_add),
+    ("result step attachment delete", "DELETE", 1, result_step_attachment_delete),
+    ("result step attachment uploads", "POST", 1, result_step_attachment_uploads),
+    ("result step attachment confirm", "POST", 1, result_step_attachment_confirm),
+    ("result step attachment download", "GET", 1, result_step_attachment_download),
+]
+
+# Endpoints issuing presigned POST policies, which need a storage able to sign them
+DIRECT_UPLOAD_ENDPOINTS = ["step attachment uploads", "result step attachment uploads"]
+
+
+def unsupported_endpoints():
+    """Endpoints this deployment cannot serve, with the reason"""
+    field = TestStepAttachment._meta.get_field("file")
+    if presigned_post(field.storage, upload_name(field, "notes.txt"), 1, 1) is None:
+        return {
+            name: "The configured storage does not support direct uploads."
+            for name in DIRECT_UPLOAD_ENDPOINTS
+        }
+    return {}
+
+
+def schedule(endpoints, count, rng):
+    """
+    The names of the endpoints of count requests, in random order, each one
+    getting its share by weight and at least one request. The same count and
+    seed always give the same requests, to compare runs endpoint by endpoint.
+    """
+    total = sum(weight for _, _, weight, _ in endpoints)
+    names = [
+        name
+        for name, _, weight, _ in endpoints
+        for _ in range(max(1, round(count * weight / total)))
+    ]
+    rng.shuffle(names)
+    return names
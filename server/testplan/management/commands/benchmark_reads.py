@@ -0,0 +1,305 @@
+import asyncio
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from io import BytesIO
+from types import ModuleType
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from testplan.asynchronous import sync_urlpatterns
+from testplan.loadtest import summarize
+from testplan.models import TestResult
+
+MODES = ["wsgi", "asgi"]
+
+
+class Command(BaseCommand):
+    """
+    Compare the read endpoints served by the sync DRF views through Django's
+    WSGI handler, with a pool of threads, against their async views through
+    the ASGI handler, with as many concurrent requests on one event loop.
+    Requests are passed to the handlers in this process, without a server or
+    sockets in between, and read the rows of the configured database.
+    """
+
+    help = "Benchmark the read endpoints under WSGI and ASGI"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=700,
+            help="Number of requests per mode, spread over the endpoints (default: 700)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="Number of requests in flight at the same time (default: 16)",
+        )
+        parser.add_argument(
+            "--mode",
+            choices=MODES,
+            action="append",
+            help="Benchmark only this mode, can be repeated (default: both)",
+        )
+        parser.add_argument(
+            "--username",
+            help="User the requests are authenticated as (default: the first superuser)",
+        )
+        parser.add_argument(
+            "--host",
+            default="localhost",
+            help="Host header of the requests, which must be allowed (default: localhost)",
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the results to this JSON file",
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1.")
+
+        users = User.objects.order_by("-is_superuser", "pk")
+        if options["username"]:
+            users = users.filter(username=options["username"])
+        user = users.first()
+        if user is None:
+            raise CommandError("No user to authenticate the requests as.")
+
+        result = TestResult.objects.select_related("case").order_by("-pk").first()
+        if result is None:
+            raise CommandError(
+                "No test results to read, seed the database first with `manage.py seed`."
+            )
+
+        plan_url = f"/api/v1/testplans/{result.case.plan_id}/"
+        case_url = f"{plan_url}testcases/{result.case_id}/"
+        endpoints = {
+            "plan list": "/api/v1/testplans/",
+            "plan detail": plan_url,
+            "case list": f"{plan_url}testcases/",
+            "case detail": case_url,
+            "result list": f"{plan_url}testresults/",
+            "result detail": f"{case_url}testresults/{result.pk}/",
+            "step list": f"{case_url}teststeps/",
+        }
+        names = list(endpoints)
+        requests = [names[i % len(names)] for i in range(options["requests"])]
+        auth = f"Bearer {RefreshToken.for_user(user).access_token}"
+
+        report = {
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "endpoints": endpoints,
+        }
+        for mode in options["mode"] or MODES:
+            run = self.run_wsgi if mode == "wsgi" else self.run_asgi
+            self.stdout.write(
+                f"Sending {len(requests)} {mode.upper()} requests, "
+                f"{options['concurrency']} at a time.."
+            )
+            report[mode] = run(
+                endpoints, requests, options["concurrency"], options["host"], auth
+            )
+            self.write_summary(report[mode])
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Wrote the results to {options['output']}.")
+
+    def run_wsgi(self, endpoints, requests, concurrency, host, auth):
+        application = get_wsgi_application()
+
+        def get(url):
+            path, _, query = url.partition("?")
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": path,
+                "QUERY_STRING": query,
+                "SERVER_NAME": host,
+                "SERVER_PORT": "80",
+                "HTTP_HOST": host,
+                "HTTP_AUTHORIZATION": auth,
+                "wsgi.input": BytesIO(),
+                "wsgi.errors": sys.stderr,
+                "wsgi.url_scheme": "http",
+            }
+            statuses = []
+            response = application(
+                environ, lambda status, headers, exc_info=None: statuses.append(status)
+            )
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()
+            return int(statuses[0].split()[0])
+
+        pending = queue.SimpleQueue()
+        for name in requests:
+            pending.put(name)
+        results = []
+        lock = threading.Lock()
+
+        def worker():
+            while True:
+                try:
+                    name = pending.get_nowait()
+                except queue.Empty:
+                    return
+                started = time.perf_counter()
+                status = get(endpoints[name])
+                elapsed = time.perf_counter() - started
+                with lock:
+                    results.append((name, status, elapsed))
+
+        # The sync DRF views in place of the async ones
+        urlconf = ModuleType("sync_urls")
+        urlconf.urlpatterns = sync_urlpatterns(
+            import_module(settings.ROOT_URLCONF).urlpatterns
+        )
+        with override_settings(ROOT_URLCONF=urlconf):
+            self.warm_up(get, endpoints)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                workers = [executor.submit(worker) for _ in range(concurrency)]
+            elapsed = time.perf_counter() - started
+            for future in workers:
+                future.result()
+        return self.summarize_run(endpoints, results, elapsed)
+
+    def run_asgi(self, endpoints, requests, concurrency, host, auth):
+        application = get_asgi_application()
+
+        async def get(url):
+            path, _, query = url.partition("?")
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": query.encode(),
+                "root_path": "",
+                "headers": [
+                    (b"host", host.encode()),
+                    (b"authorization", auth.encode()),
+                ],
+                "client": ("127.0.0.1", 0),
+                "server": (host, 80),
+            }
+            body_sent = False
+            disconnected = asyncio.Event()
+
+            async def receive():
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # The client stays connected until the response is sent
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            statuses = []
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            await application(scope, receive, send)
+            return statuses[0]
+
+        async def main():
+            await self.awarm_up(get, endpoints)
+            pending = iter(requests)
+            results = []
+
+            async def worker():
+                for name in pending:
+                    started = time.perf_counter()
+                    status = await get(endpoints[name])
+                    results.append((name, status, time.perf_counter() - started))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            return results, time.perf_counter() - started
+
+        results, elapsed = asyncio.run(main())
+        return self.summarize_run(endpoints, results, elapsed)
+
+    def check_status(self, name, status):
+        if status != 200:
+            raise CommandError(
+                f"The {name} endpoint answered {status}, check --host and --username."
+            )
+
+    def warm_up(self, get, endpoints):
+        # Loads the URL patterns, middleware and serializers before measuring
+        for name, url in endpoints.items():
+            self.check_status(name, get(url))
+
+    async def awarm_up(self, get, endpoints):
+        for name, url in endpoints.items():
+            self.check_status(name, await get(url))
+
+    def summarize_run(self, endpoints, results, elapsed):
+        by_endpoint = {name: ([], []) for name in endpoints}
+        for name, status, latency in results:
+            latencies, errors = by_endpoint[name]
+            latencies.append(latency)
+            if status != 200:
+                errors.append(status)
+        return {
+            **summarize(
+                [latency for _, _, latency in results],
+                sum(status != 200 for _, status, _ in results),
+                elapsed,
+            ),
+            "by_endpoint": {
+                name: summarize(latencies, len(errors))
+                for name, (latencies, errors) in by_endpoint.items()
+            },
+        }
+
+    def write_summary(self, summary):
+        rows = [("", "requests", "errors", "p50 ms", "p95 ms", "p99 ms")]
+        for name, values in [*summary["by_endpoint"].items(), ("all", summary)]:
+            rows.append(
+                (
+                    name,
+                    *(
+                        str(values[key])
+                        for key in ("requests", "errors", "p50_ms", "p95_ms", "p99_ms")
+                    ),
+                )
+            )
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        for row in rows:
+            self.stdout.write(
+                "  ".join(
+                    value.ljust(width) if i == 0 else value.rjust(width)
+                    for i, (value, width) in enumerate(zip(row, widths))
+                )
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{summary['requests_per_second']} requests per second "
+                f"over {summary['seconds']} seconds."
+            )
+        )
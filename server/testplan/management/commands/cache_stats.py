@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from testplan import caching
+
+
+class Command(BaseCommand):
+    """
+    Show how often the cached step and attachment lists were served from the
+    cache. The counters are kept in the cache itself, so with a shared cache
+    backend they add up the lookups of every app server.
+    """
+
+    help = "Show the hit and miss counts of the cached step and attachment lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Reset the counters after showing them",
+        )
+
+    def handle(self, *args, **options):
+        counts = caching.stats()
+        hit_rate = counts["hit_rate"]
+        self.stdout.write(f"Hits: {counts['hits']}")
+        self.stdout.write(f"Misses: {counts['misses']}")
+        self.stdout.write(f"Hit rate: {'-' if hit_rate is None else f'{hit_rate:.1%}'}")
+
+        if options["reset"]:
+            caching.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Reset the counters."))
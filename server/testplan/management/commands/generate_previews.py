@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from testplan import jobs
+from testplan.models import AttachmentBlob
+from testplan.previews import generate_previews, is_image
+
+
+class Command(BaseCommand):
+    """
+    Backfill the thumbnails and previews of image attachments, for instance
+    for files stored before previews existed or after a worker was stopped.
+    """
+
+    help = "Generate missing thumbnails and previews of image attachments"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate the previews of every image, even the existing ones",
+        )
+        parser.add_argument(
+            "--background",
+            action="store_true",
+            help="Queue one background job per image instead of generating them here",
+        )
+
+    def handle(self, *args, **options):
+        queryset = AttachmentBlob.objects.order_by("pk")
+        if not options["force"]:
+            queryset = queryset.filter(thumbnail="")
+
+        blob_ids = [
+            blob_id
+            for blob_id, name in queryset.values_list("pk", "file")
+            if is_image(name)
+        ]
+
+        if options["background"]:
+            for blob_id in blob_ids:
+                jobs.enqueue("generate_previews", {"blob_id": blob_id})
+            self.stdout.write(
+                self.style.SUCCESS(f"Queued previews for {len(blob_ids)} images.")
+            )
+            return
+
+        self.stdout.write(f"Generating previews for {len(blob_ids)} images..")
+
+        generated = sum(1 for blob_id in blob_ids if generate_previews(blob_id))
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Generated previews for {generated} images.")
+        )
@@ -0,0 +1,78 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from testplan.constants import BROWSER_LIST, OS_LIST
+from testplan.ingest import INGEST_CHUNK_SIZE
+from testplan.junit import JUnitImportError, import_junit
+from testplan.models import TestPlan
+
+
+class Command(BaseCommand):
+    """
+    Record the test cases of a JUnit/xUnit XML report as test results.
+    """
+
+    help = "Import test results from a JUnit XML report"
+
+    def add_arguments(self, parser):
+        parser.add_argument("report", help="Path to the JUnit XML report")
+        parser.add_argument(
+            "--plan",
+            type=int,
+            required=True,
+            help="Test plan whose test cases are matched by title",
+        )
+        parser.add_argument(
+            "--user",
+            required=True,
+            help="Username recorded as the tester of the test results",
+        )
+        parser.add_argument(
+            "--browser",
+            choices=[value for value, _ in BROWSER_LIST],
+            default=BROWSER_LIST[0][0],
+            help=f"Browser of the run (default: {BROWSER_LIST[0][0]})",
+        )
+        parser.add_argument(
+            "--os",
+            choices=[value for value, _ in OS_LIST],
+            default=OS_LIST[0][0],
+            help=f"OS of the run (default: {OS_LIST[0][0]})",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=INGEST_CHUNK_SIZE,
+            help=f"Number of test results written per statement (default: {INGEST_CHUNK_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        if not TestPlan.objects.filter(pk=options["plan"]).exists():
+            raise CommandError(f"Test plan {options['plan']} does not exist")
+        try:
+            tester = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist")
+
+        self.stdout.write(f"Importing {options['report']}..")
+
+        try:
+            with open(options["report"], "rb") as report:
+                summary = import_junit(
+                    report,
+                    options["plan"],
+                    tester,
+                    browser=options["browser"],
+                    os=options["os"],
+                    batch_size=options["batch_size"],
+                )
+        except (OSError, JUnitImportError) as e:
+            raise CommandError(f"Could not import the report: {e}")
+
+        for name in summary["unmatched_names"]:
+            self.stdout.write(self.style.WARNING(f"No test case titled {name}"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {summary['created']} of {summary['total']} test cases "
+                f"({summary['skipped']} skipped, {summary['unmatched']} unmatched)."
+            )
+        )
@@ -0,0 +1,421 @@
+import http.client
+import json
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework_simplejwt.tokens import AccessToken
+
+from testplan.loadtest import (
+    ENDPOINTS,
+    Dataset,
+    schedule,
+    summarize,
+    unsupported_endpoints,
+)
+
+# Dataset shape options and their defaults
+SHAPE = {
+    "plans": 5,
+    "cases_per_plan": 50,
+    "steps_per_case": 5,
+    "results_per_case": 3,
+    "attachments_per_case": 1,
+}
+
+
+def is_error(status):
+    # 0 stands for a request that got no response
+    return status == 0 or status >= 400
+
+
+class Command(BaseCommand):
+    """
+    Replay a mix of JWT-authenticated requests against every route of the
+    testplan API, over HTTP against a running server, and report the latency
+    percentiles, throughput and database queries of each endpoint as JSON to
+    compare with the report of a previous run.
+
+    The dataset is seeded in the database configured for this command, which
+    must be the one of the server under test. Its test plans are titled with
+    a prefix of their own and are deleted after the run, along with anything
+    the requests created in them.
+    """
+
+    help = "Load test every endpoint of the API over HTTP"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--url",
+            default="http://localhost:8000",
+            help="Base URL of the server under test (default: http://localhost:8000)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=2000,
+            help="Number of requests, spread over the endpoints by weight (default: 2000)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="Number of requests in flight at the same time (default: 16)",
+        )
+        for option, default in SHAPE.items():
+            parser.add_argument(
+                f"--{option.replace('_', '-')}",
+                type=int,
+                default=default,
+                help=f"Number of {option.replace('_', ' ')} to seed (default: {default})",
+            )
+        parser.add_argument(
+            "--random-seed",
+            type=int,
+            default=0,
+            help="Seed of the dataset and of the requests, the same for comparable runs (default: 0)",
+        )
+        parser.add_argument(
+            "--username",
+            help="User the requests are authenticated as (default: the first superuser)",
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the report to this JSON file",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="Compare with the report of a previous run, written with --output",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="Fail when the p95 latency of an endpoint grows by more than this "
+            "percentage over the baseline, or its number of queries grows at all",
+        )
+        parser.add_argument(
+            "--keep-data",
+            action="store_true",
+            help="Keep the seeded test plans after the run",
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1.")
+        if options["plans"] < 1 or options["cases_per_plan"] < 1:
+            raise CommandError("--plans and --cases-per-plan must be at least 1.")
+        if options["steps_per_case"] < 1 or options["results_per_case"] < 2:
+            raise CommandError(
+                "--steps-per-case must be at least 1 and --results-per-case at least 2."
+            )
+        if options["attachments_per_case"] < 1:
+            raise CommandError("--attachments-per-case must be at least 1.")
+        if options["max_regression"] is not None and not options["baseline"]:
+            raise CommandError("--max-regression needs a --baseline to compare with.")
+
+        url = urlsplit(options["url"])
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise CommandError(f"Invalid --url: {options['url']}")
+
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as f:
+                baseline = json.load(f)
+
+        users = User.objects.order_by("-is_superuser", "pk")
+        if options["username"]:
+            users = users.filter(username=options["username"])
+        user = users.first()
+        if user is None:
+            raise CommandError("No user to authenticate the requests as.")
+
+        skipped = unsupported_endpoints()
+        endpoints = {
+            name: (method, prepare)
+            for name, method, _, prepare in ENDPOINTS
+            if name not in skipped
+        }
+        for name, reason in skipped.items():
+            self.stdout.write(f"Skipping the {name} endpoint: {reason}")
+
+        dataset = Dataset(user, seed=options["random_seed"])
+        shape = {option: options[option] for option in SHAPE}
+        self.stdout.write(
+            "Seeding {plans} test plans of {cases_per_plan} test cases..".format(
+                **shape
+            )
+        )
+        try:
+            dataset.seed(
+                shape["plans"],
+                shape["cases_per_plan"],
+                shape["steps_per_case"],
+                shape["results_per_case"],
+                shape["attachments_per_case"],
+            )
+            report = self.run(url, endpoints, dataset, options)
+        finally:
+            if not options["keep_data"]:
+                dataset.delete()
+
+        report.update(
+            {
+                "url": options["url"],
+                "random_seed": options["random_seed"],
+                "dataset": shape,
+                "skipped": skipped,
+            }
+        )
+        self.write_summary(report)
+
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f"Wrote the report to {options['output']}.")
+
+        if baseline is not None:
+            regressions = self.compare(baseline, report, options["max_regression"])
+            if regressions:
+                raise CommandError(
+                    f"{len(regressions)} regressions over the baseline: "
+                    + "; ".join(regressions)
+                )
+
+    def prepare(self, endpoints, name, dataset):
+        method, prepare = endpoints[name]
+        path, body, content_type = prepare(dataset)
+        # Every request carries a token of its own, as issued to many clients
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(dataset.user)}"}
+        if content_type:
+            headers["Content-Type"] = content_type
+        return name, method, path, body, headers
+
+    def run(self, url, endpoints, dataset, options):
+        # Counted on the freshly seeded dataset, so the same seed and shape
+        # give the same rows whatever the number of requests
+        self.stdout.write("Counting the queries of each endpoint..")
+        queries = self.count_queries(url, endpoints, dataset)
+
+        names = schedule(
+            [endpoint for endpoint in ENDPOINTS if endpoint[0] in endpoints],
+            options["requests"],
+            random.Random(options["random_seed"]),
+        )
+        # The rows the requests work on are created before the clock starts
+        self.stdout.write(f"Preparing {len(names)} requests..")
+        warm_up = [self.prepare(endpoints, name, dataset) for name in endpoints]
+        requests = [self.prepare(endpoints, name, dataset) for name in names]
+
+        pending = queue.SimpleQueue()
+        results = []
+        lock = threading.Lock()
+        connection_class = (
+            http.client.HTTPSConnection
+            if url.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        prefix = url.path.rstrip("/")
+
+        def worker():
+            # One keep-alive connection per worker, as a pool of clients would
+            conn = connection_class(url.hostname, url.port, timeout=60)
+            try:
+                while True:
+                    try:
+                        name, method, path, body, headers = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    started = time.perf_counter()
+                    try:
+                        conn.request(method, prefix + path, body=body, headers=headers)
+                        response = conn.getresponse()
+                        response.read()
+                        status = response.status
+                    except (OSError, http.client.HTTPException):
+                        conn.close()
+                        status = 0
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        results.append((name, status, elapsed))
+            finally:
+                conn.close()
+
+        def send(requests, concurrency):
+            for request in requests:
+                pending.put(request)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                workers = [executor.submit(worker) for _ in range(concurrency)]
+            elapsed = time.perf_counter() - started
+            for future in workers:
+                future.result()
+            return elapsed
+
+        # Loads the URL patterns, middleware and serializers of the server,
+        # and tells a wrong --url or --username apart from a slow endpoint
+        send(warm_up, 1)
+        for name, status, _ in results:
+            if is_error(status):
+                raise CommandError(
+                    f"The {name} endpoint answered {status or 'nothing'}, "
+                    "check --url and --username."
+                )
+        results.clear()
+
+        self.stdout.write(
+            f"Sending {len(requests)} requests to {options['url']}, "
+            f"{options['concurrency']} at a time.."
+        )
+        elapsed = send(requests, options["concurrency"])
+
+        by_endpoint = {name: ([], Counter()) for name in endpoints}
+        for name, status, latency in results:
+            latencies, statuses = by_endpoint[name]
+            latencies.append(latency)
+            statuses[status] += 1
+        report = {
+            "requests": len(requests),
+            "concurrency": options["concurrency"],
+            "total": summarize(
+                [latency for _, _, latency in results],
+                sum(is_error(status) for _, status, _ in results),
+                elapsed,
+            ),
+            "endpoints": {},
+        }
+        paths = {name: path for name, _, path, _, _ in warm_up}
+        for name, (latencies, statuses) in by_endpoint.items():
+            report["endpoints"][name] = {
+                "method": endpoints[name][0],
+                "route": resolve(paths[name].partition("?")[0]).url_name,
+                "queries": queries[name],
+                "statuses": {str(status): count for status, count in statuses.items()},
+                **summarize(
+                    latencies,
+                    sum(
+                        count for status, count in statuses.items() if is_error(status)
+                    ),
+                    elapsed,
+                ),
+            }
+        return report
+
+    def count_queries(self, url, endpoints, dataset):
+        """
+        Number of database queries of one request to each endpoint, through
+        Django's handler in this process since the server doesn't tell. Reads
+        are counted the second time, with the caches the first one filled.
+        """
+        client = Client(HTTP_HOST=url.netloc)
+        queries = {}
+        for name in endpoints:
+            _, method, path, body, headers = self.prepare(endpoints, name, dataset)
+            request = {
+                "path": path,
+                "data": body or "",
+                "content_type": headers.get("Content-Type", "application/octet-stream"),
+                "headers": {"Authorization": headers["Authorization"]},
+            }
+            if method == "GET":
+                self.request(client, method, request)
+            with CaptureQueriesContext(connection) as context:
+                self.request(client, method, request)
+            queries[name] = len(context.captured_queries)
+        return queries
+
+    def request(self, client, method, request):
+        response = client.generic(method, **request)
+        # Streaming responses read their rows while they are consumed
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        response.close()
+
+    def compare(self, baseline, report, max_regression):
+        """
+        Write the p95 latency and queries of each endpoint next to those of
+        the baseline. Returns the regressions beyond max_regression, if given.
+        """
+        rows = [("", "p95 ms", "baseline", "change", "queries", "baseline")]
+        regressions = []
+        for name, values in report["endpoints"].items():
+            before = baseline.get("endpoints", {}).get(name)
+            if before is None:
+                continue
+            change = None
+            if before["p95_ms"] and values["p95_ms"] is not None:
+                change = (values["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+            rows.append(
+                (
+                    name,
+                    str(values["p95_ms"]),
+                    str(before["p95_ms"]),
+                    "" if change is None else f"{change:+.1f}%",
+                    str(values["queries"]),
+                    str(before["queries"]),
+                )
+            )
+            if max_regression is None:
+                continue
+            if change is not None and change > max_regression:
+                regressions.append(
+                    f"{name} p95 {before['p95_ms']} -> {values['p95_ms']} ms"
+                )
+            if values["queries"] > before["queries"]:
+                regressions.append(
+                    f"{name} queries {before['queries']} -> {values['queries']}"
+                )
+
+        self.stdout.write(f"Compared with the baseline of {baseline.get('url')}:")
+        self.write_table(rows)
+        return regressions
+
+    def write_summary(self, report):
+        rows = [("", "requests", "errors", "p50 ms", "p95 ms", "p99 ms", "queries")]
+        for name, values in [
+            *report["endpoints"].items(),
+            ("all", {**report["total"], "queries": ""}),
+        ]:
+            rows.append(
+                (
+                    name,
+                    *(
+                        str(values[key])
+                        for key in (
+                            "requests",
+                            "errors",
+                            "p50_ms",
+                            "p95_ms",
+                            "p99_ms",
+                            "queries",
+                        )
+                    ),
+                )
+            )
+        self.write_table(rows)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report['total']['requests_per_second']} requests per second "
+                f"over {report['total']['seconds']} seconds."
+            )
+        )
+
+    def write_table(self, rows):
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        for row in rows:
+            self.stdout.write(
+                "  ".join(
+                    value.ljust(width) if i == 0 else value.rjust(width)
+                    for i, (value, width) in enumerate(zip(row, widths))
+                )
+            )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from testplan.models import AttachmentBlob
+
+
+class Command(BaseCommand):
+    """
+    Remove attachment blobs that are no longer referenced, for instance when
+    the process died before the purge scheduled at commit could run.
+    """
+
+    help = "Delete unreferenced attachment blobs and their files"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="Recount the references of every blob before purging",
+        )
+
+    def handle(self, *args, **options):
+        if options["recount"]:
+            recounted = AttachmentBlob.recount()
+            self.stdout.write(f"Recounted references of {recounted} blobs..")
+
+        purged = AttachmentBlob.purge()
+
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} attachment blobs."))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from testplan.models import PlanStats, TestCase
+
+
+class Command(BaseCommand):
+    """
+    Backfill or repair the denormalized latest result columns on test cases,
+    and recount the statistics of the test plans they belong to.
+    """
+
+    help = "Recompute the latest result columns of test cases"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--plan",
+            type=int,
+            default=None,
+            help="Only rebuild the test cases of this test plan (default: all plans)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of test cases updated per transaction (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        plan_id = options["plan"]
+        batch_size = options["batch_size"]
+
+        queryset = TestCase.objects.order_by("pk")
+        if plan_id is not None:
+            queryset = queryset.filter(plan_id=plan_id)
+
+        case_ids = list(queryset.values_list("pk", flat=True))
+
+        self.stdout.write(f"Rebuilding latest results for {len(case_ids)} test cases..")
+
+        updated = 0
+        for start in range(0, len(case_ids), batch_size):
+            with transaction.atomic():
+                updated += TestCase.refresh_latest_results(
+                    case_ids[start : start + batch_size], update_stats=False
+                )
+
+        # The stored latest results may have drifted, so recount rather than
+        # moving the counters from a wrong value
+        # order_by() replaces the order by pk, which DISTINCT would select too
+        plan_ids = list(
+            queryset.order_by("plan_id").values_list("plan_id", flat=True).distinct()
+        )
+        for start in range(0, len(plan_ids), batch_size):
+            with transaction.atomic():
+                PlanStats.rebuild(plan_ids[start : start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt latest results for {updated} test cases.")
+        )
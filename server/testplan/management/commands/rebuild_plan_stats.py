@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from testplan import jobs
+from testplan.models import PlanStats, TestPlan
+
+
+class Command(BaseCommand):
+    """
+    Backfill or repair the rolled up statistics of test plans.
+    """
+
+    help = "Recount the test case statistics of test plans"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--plan",
+            type=int,
+            default=None,
+            help="Only rebuild the statistics of this test plan (default: all plans)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of test plans recounted per transaction (default: 1000)",
+        )
+        parser.add_argument(
+            "--background",
+            action="store_true",
+            help="Queue a background job doing the rebuild instead of running it here",
+        )
+
+    def handle(self, *args, **options):
+        plan_id = options["plan"]
+        batch_size = options["batch_size"]
+
+        if options["background"]:
+            job = jobs.enqueue(
+                "rebuild_plan_stats",
+                {"plan_ids": None if plan_id is None else [plan_id]},
+            )
+            self.stdout.write(self.style.SUCCESS(f"Queued job {job.pk}."))
+            return
+
+        queryset = TestPlan.objects.order_by("pk")
+        if plan_id is not None:
+            queryset = queryset.filter(pk=plan_id)
+
+        plan_ids = list(queryset.values_list("pk", flat=True))
+
+        self.stdout.write(f"Rebuilding statistics for {len(plan_ids)} test plans..")
+
+        rebuilt = 0
+        for start in range(0, len(plan_ids), batch_size):
+            with transaction.atomic():
+                rebuilt += PlanStats.rebuild(plan_ids[start : start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt statistics for {rebuilt} test plans.")
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from testplan.indexing import reindex_all
+from testplan.search import SEARCH_INDEXES, install_search_index
+
+
+class Command(BaseCommand):
+    """
+    Recreate the full-text search triggers and rebuild the search index.
+    """
+
+    help = "Rebuild the full-text search index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of search documents written per statement (default: 1000)",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding search documents..")
+        with transaction.atomic():
+            reindex_all(batch_size=options["batch_size"])
+
+        for table, columns in SEARCH_INDEXES.items():
+            self.stdout.write(f"Rebuilding search index for {table}..")
+            with transaction.atomic():
+                install_search_index(connection, table, columns)
+
+        self.stdout.write(self.style.SUCCESS("Rebuilt search index successfully."))
@@ -0,0 +1,136 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+
+# How often stale jobs are looked for, in seconds
+REQUEUE_INTERVAL = 60
+
+
+def setup_process():
+    # Pool processes are spawned, so they start without Django configured,
+    # and leave Ctrl+C to the main process, which waits for their jobs
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    django.setup()
+
+
+class Command(BaseCommand):
+    """
+    Run the queued background jobs with a pool of threads or processes.
+    Jobs are claimed from the database with SELECT ... FOR UPDATE SKIP LOCKED,
+    so any number of workers can run side by side on any number of hosts.
+    SIGTERM and SIGINT stop claiming jobs and wait for the running ones.
+    """
+
+    help = "Run queued background jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pool",
+            choices=["thread", "process"],
+            default=settings.JOB_WORKER_POOL,
+            help=f"Run the jobs in threads or processes (default: {settings.JOB_WORKER_POOL})",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.JOB_WORKER_CONCURRENCY,
+            help=f"Number of jobs run at the same time (default: {settings.JOB_WORKER_CONCURRENCY})",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait for new jobs when the queue is empty (default: 1)",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the due jobs one after another in this process, then exit",
+        )
+
+    def handle(self, *args, **options):
+        # Not imported at the top, as pool processes import this module for
+        # setup_process() before Django is set up
+        from testplan import jobs
+
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+
+        if options["once"]:
+            jobs.requeue_stale()
+            count = jobs.run_pending(worker)
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} jobs."))
+            return
+
+        concurrency = options["concurrency"]
+        if concurrency < 1:
+            raise CommandError("--concurrency must be at least 1.")
+
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: stop.set())
+
+        if options["pool"] == "process":
+            executor = ProcessPoolExecutor(
+                max_workers=concurrency,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=setup_process,
+            )
+        else:
+            executor = ThreadPoolExecutor(
+                max_workers=concurrency, thread_name_prefix="worker"
+            )
+
+        self.stdout.write(
+            f"Worker {worker} running {concurrency} jobs at a time in a {options['pool']} pool.."
+        )
+
+        running = set()
+        requeued_at = 0
+        with executor:
+            while not stop.is_set():
+                running = {future for future in running if not future.done()}
+                job_ids = []
+                try:
+                    if time.monotonic() - requeued_at > REQUEUE_INTERVAL:
+                        if released := jobs.requeue_stale():
+                            self.stdout.write(f"Released {released} stale jobs.")
+                        requeued_at = time.monotonic()
+
+                    if len(running) < concurrency:
+                        job_ids = jobs.claim(worker, concurrency - len(running))
+                except DatabaseError as e:
+                    # Keep polling through database restarts and lock timeouts
+                    self.stderr.write(f"Claiming jobs failed: {e}")
+                    connections.close_all()
+
+                running.update(
+                    executor.submit(jobs.execute, i, worker) for i in job_ids
+                )
+
+                if len(job_ids) == 0 or len(running) >= concurrency:
+                    if running:
+                        wait(
+                            running,
+                            timeout=options["poll_interval"],
+                            return_when=FIRST_COMPLETED,
+                        )
+                    else:
+                        stop.wait(options["poll_interval"])
+
+            self.stdout.write("Waiting for the running jobs to finish..")
+
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker} stopped."))
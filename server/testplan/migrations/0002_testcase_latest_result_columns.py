@@ -0,0 +1,65 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_latest_results(apps, schema_editor):
+    TestCase = apps.get_model("testplan", "TestCase")
+    TestResult = apps.get_model("testplan", "TestResult")
+
+    latest = TestResult.objects.filter(case=OuterRef("pk")).order_by(
+        "-executed_at", "-pk"
+    )
+    TestCase.objects.update(
+        last_result=Subquery(latest.values("pk")[:1]),
+        latest_result=Subquery(latest.values("result")[:1]),
+        last_executed_at=Subquery(latest.values("executed_at")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("testplan", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="testcase",
+            name="last_executed_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="last_result",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="testplan.testresult",
+            ),
+        ),
+        migrations.AddField(
+            model_name="testcase",
+            name="latest_result",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("pass", "Pass"),
+                    ("fail", "Fail"),
+                    ("in_progress", "In Progress"),
+                ],
+                editable=False,
+                max_length=20,
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="testcase",
+            index=models.Index(
+                fields=["plan", "latest_result"], name="testcase_plan_latest_idx"
+            ),
+        ),
+        migrations.RunPython(backfill_latest_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+import testplan.operations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("testplan", "0002_testcase_latest_result_columns"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        testplan.operations.AddIndexConcurrently(
+            model_name="testcase",
+            index=models.Index(
+                fields=["plan", "-created_at", "-id"], name="testcase_plan_created_idx"
+            ),
+        ),
+        testplan.operations.AddIndexConcurrently(
+            model_name="testcase",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("title"), name="gin_trgm_ops"
+                ),
+                name="testcase_title_trgm_idx",
+            ),
+        ),
+        testplan.operations.AddIndexConcurrently(
+            model_name="testplan",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="testplan_created_idx"
+            ),
+        ),
+        testplan.operations.AddIndexConcurrently(
+            model_name="testplan",
+            index=models.Index(
+                fields=["status", "-created_at", "-id"],
+                name="testplan_status_created_idx",
+            ),
+        ),
+        testplan.operations.AddIndexConcurrently(
+            model_name="testplan",
+            index=django.contrib.postgres.indexes.GinIndex(
+                django.contrib.postgres.indexes.OpClass(
+                    django.db.models.functions.text.Upper("title"), name="gin_trgm_ops"
+                ),
+                name="testplan_title_trgm_idx",
+            ),
+        ),
+        testplan.operations.AddIndexConcurrently(
+            model_name="testresult",
+            index=models.Index(
+                fields=["case", "-executed_at", "-id"],
+                name="testresult_case_executed_idx",
+            ),
+        ),
+        testplan.operations.AddIndexConcurrently(
+            model_name="testresult",
+            index=models.Index(
+                fields=["-executed_at", "-id"], name="testresult_executed_idx"
+            ),
+        ),
+    ]
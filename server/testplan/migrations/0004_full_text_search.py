@@ -0,0 +1,57 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+import testplan.operations
+from testplan.search import install_search_index, uninstall_search_index
+
+SEARCH_COLUMNS = {"title": "A", "description": "B"}
+
+
+def install_search_indexes(apps, schema_editor):
+    for table in ["testplan_testplan", "testplan_testcase"]:
+        install_search_index(schema_editor.connection, table, SEARCH_COLUMNS)
+
+
+def uninstall_search_indexes(apps, schema_editor):
+    for table in ["testplan_testplan", "testplan_testcase"]:
+        uninstall_search_index(schema_editor.connection, table)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("testplan", "0003_api_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="testcase",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="testplan",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(install_search_indexes, uninstall_search_indexes),
+        testplan.operations.AddIndexConcurrently(
+            model_name="testcase",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="testcase_search_idx"
+            ),
+        ),
+        testplan.operations.AddIndexConcurrently(
+            model_name="testplan",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="testplan_search_idx"
+            ),
+        ),
+    ]
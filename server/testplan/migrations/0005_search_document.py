@@ -0,0 +1,203 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+import testplan.operations
+from testplan.search import install_search_index, uninstall_search_index
+
+BATCH_SIZE = 1000
+
+
+def backfill_search_documents(apps, schema_editor):
+    SearchDocument = apps.get_model("testplan", "SearchDocument")
+    TestPlan = apps.get_model("testplan", "TestPlan")
+    TestCase = apps.get_model("testplan", "TestCase")
+    TestStep = apps.get_model("testplan", "TestStep")
+    TestResultStep = apps.get_model("testplan", "TestResultStep")
+
+    def documents():
+        for pk, title, description in TestPlan.objects.values_list(
+            "pk", "title", "description"
+        ).iterator():
+            yield SearchDocument(
+                kind="plan", object_id=pk, plan_id=pk, title=title, body=description
+            )
+        for pk, plan_id, title, description in TestCase.objects.values_list(
+            "pk", "plan_id", "title", "description"
+        ).iterator():
+            yield SearchDocument(
+                kind="case",
+                object_id=pk,
+                plan_id=plan_id,
+                case_id=pk,
+                title=title,
+                body=description,
+            )
+        for (
+            pk,
+            case_id,
+            plan_id,
+            action,
+            expected_result,
+        ) in TestStep.objects.values_list(
+            "pk", "case_id", "case__plan_id", "action", "expected_result"
+        ).iterator():
+            yield SearchDocument(
+                kind="step",
+                object_id=pk,
+                plan_id=plan_id,
+                case_id=case_id,
+                step_id=pk,
+                title=action,
+                body=expected_result,
+            )
+        for pk, result_id, case_id, plan_id, comment in (
+            TestResultStep.objects.exclude(comment="")
+            .values_list(
+                "pk", "result_id", "result__case_id", "result__case__plan_id", "comment"
+            )
+            .iterator()
+        ):
+            yield SearchDocument(
+                kind="result_step",
+                object_id=pk,
+                plan_id=plan_id,
+                case_id=case_id,
+                result_id=result_id,
+                result_step_id=pk,
+                body=comment,
+            )
+
+    batch = []
+    for document in documents():
+        batch.append(document)
+        if len(batch) >= BATCH_SIZE:
+            SearchDocument.objects.bulk_create(batch)
+            batch = []
+    SearchDocument.objects.bulk_create(batch)
+
+
+def install_search_document_index(apps, schema_editor):
+    install_search_index(
+        schema_editor.connection,
+        "testplan_searchdocument",
+        {"title": "A", "body": "B"},
+    )
+
+
+def uninstall_search_document_index(apps, schema_editor):
+    uninstall_search_index(schema_editor.connection, "testplan_searchdocument")
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("testplan", "0004_full_text_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SearchDocument",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("plan", "Test Plan"),
+                            ("case", "Test Case"),
+                            ("step", "Test Step"),
+                            ("result_step", "Test Result Step"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("object_id", models.BigIntegerField()),
+                ("title", models.TextField(blank=True)),
+                ("body", models.TextField(blank=True)),
+                (
+                    "search_vector",
+                    django.contrib.postgres.search.SearchVectorField(
+                        editable=False, null=True
+                    ),
+                ),
+                (
+                    "case",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="testplan.testcase",
+                    ),
+                ),
+                (
+                    "plan",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="testplan.testplan",
+                    ),
+                ),
+                (
+                    "result",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="testplan.testresult",
+                    ),
+                ),
+                (
+                    "result_step",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="testplan.testresultstep",
+                    ),
+                ),
+                (
+                    "step",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="testplan.teststep",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "object_id"),
+                        name="unique_search_document_per_object",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(
+            install_search_document_index, uninstall_search_document_index
+        ),
+        testplan.operations.AddIndexConcurrently(
+            model_name="searchdocument",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="searchdocument_search_idx"
+            ),
+        ),
+    ]
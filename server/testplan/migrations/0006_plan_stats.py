@@ -0,0 +1,60 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_plan_stats(apps, schema_editor):
+    TestPlan = apps.get_model("testplan", "TestPlan")
+    TestCase = apps.get_model("testplan", "TestCase")
+    PlanStats = apps.get_model("testplan", "PlanStats")
+
+    stats = {
+        plan_id: PlanStats(plan_id=plan_id)
+        for plan_id in TestPlan.objects.values_list("pk", flat=True)
+    }
+    rows = (
+        TestCase.objects.values("plan_id", "status", "latest_result")
+        .annotate(count=Count("pk"))
+        .order_by()
+    )
+    for row in rows:
+        plan_stats = stats[row["plan_id"]]
+        for field in (
+            f"status_{row['status']}",
+            f"result_{row['latest_result'] or 'untested'}",
+        ):
+            setattr(plan_stats, field, getattr(plan_stats, field) + row["count"])
+
+    PlanStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("testplan", "0005_search_document"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlanStats",
+            fields=[
+                (
+                    "plan",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="testplan.testplan",
+                    ),
+                ),
+                ("status_design", models.IntegerField(default=0)),
+                ("status_ready", models.IntegerField(default=0)),
+                ("status_closed", models.IntegerField(default=0)),
+                ("result_pass", models.IntegerField(default=0)),
+                ("result_fail", models.IntegerField(default=0)),
+                ("result_in_progress", models.IntegerField(default=0)),
+                ("result_untested", models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_plan_stats, migrations.RunPython.noop),
+    ]
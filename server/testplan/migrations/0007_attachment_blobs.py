@@ -0,0 +1,78 @@
+import django.db.models.deletion
+import testplan.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("testplan", "0006_plan_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttachmentBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                (
+                    "file",
+                    models.FileField(
+                        max_length=255, upload_to=testplan.models.blob_upload_to
+                    ),
+                ),
+                ("size", models.BigIntegerField()),
+                ("ref_count", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="testresultstepattachment",
+            name="filename",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="teststepattachment",
+            name="filename",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="testresultstepattachment",
+            name="file",
+            field=models.FileField(max_length=255, upload_to="result_attachments/"),
+        ),
+        migrations.AlterField(
+            model_name="teststepattachment",
+            name="file",
+            field=models.FileField(max_length=255, upload_to="attachments/"),
+        ),
+        migrations.AddField(
+            model_name="testresultstepattachment",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="testplan.attachmentblob",
+            ),
+        ),
+        migrations.AddField(
+            model_name="teststepattachment",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="testplan.attachmentblob",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+import testplan.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("testplan", "0007_attachment_blobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachmentblob",
+            name="preview",
+            field=models.FileField(
+                blank=True, max_length=255, upload_to=testplan.models.blob_upload_to
+            ),
+        ),
+        migrations.AddField(
+            model_name="attachmentblob",
+            name="thumbnail",
+            field=models.FileField(
+                blank=True, max_length=255, upload_to=testplan.models.blob_upload_to
+            ),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("testplan", "0009_jobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="planstats",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("testplan", "0010_plan_stats_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="testresultstepattachment",
+            name="upload_name",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="teststepattachment",
+            name="upload_name",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AlterField(
+            model_name="attachmentblob",
+            name="sha256",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -1,4 +1,14 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
+from collections import Counter, defaultdict
+from functools import partial
+import os
+
+from django.db import IntegrityError, models, transaction
+from django_cleanup import cleanup
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Upper
+from django.utils import timezone
 
 from .constants import (
     TEST_PLAN_STATUS,
@@ -7,7 +17,10 @@ from .constants import (
     BROWSER_LIST,
     OS_LIST,
     TEST_RESULT_STEP_STATUS,
+    SEARCH_DOCUMENT_KINDS,
+    JOB_STATUS,
 )
+from .storage import content_hash, file_metadata, read_chunks
 
 # Create your models here.
 
@@ -24,11 +37,158 @@ class TestPlan(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Weighted title/description vector maintained by a database trigger on Postgres
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="testplan_created_idx"),
+            models.Index(
+                fields=["status", "-created_at", "-id"],
+                name="testplan_status_created_idx",
+            ),
+            # Serves title__icontains, which compiles to UPPER(title) LIKE on Postgres
+            GinIndex(
+                OpClass(Upper("title"), name="gin_trgm_ops"),
+                name="testplan_title_trgm_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="testplan_search_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The plan statistics row is created by a signal in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
 
 
+class PlanStats(models.Model):
+    """
+    Rolled up test case counters of a test plan, kept up to date with F()
+    deltas by the TestCase and TestResult signals so reading the progress of
+    a test plan never needs a recount. Repaired by the rebuild_plan_stats command.
+    """
+
+    plan = models.OneToOneField(
+        TestPlan, related_name="stats", on_delete=models.CASCADE, primary_key=True
+    )
+    # Signed so a drifted counter never makes a test case write fail
+    status_design = models.IntegerField(default=0)
+    status_ready = models.IntegerField(default=0)
+    status_closed = models.IntegerField(default=0)
+    result_pass = models.IntegerField(default=0)
+    result_fail = models.IntegerField(default=0)
+    result_in_progress = models.IntegerField(default=0)
+    result_untested = models.IntegerField(default=0)
+    # Last change of the counters or of the latest result of any test case of
+    # the plan, which the updated_at of the plan and its test cases miss
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTER_FIELDS = [
+        "status_design",
+        "status_ready",
+        "status_closed",
+        "result_pass",
+        "result_fail",
+        "result_in_progress",
+        "result_untested",
+    ]
+
+    @staticmethod
+    def status_field(status):
+        return f"status_{status}"
+
+    @staticmethod
+    def result_field(latest_result):
+        return f"result_{latest_result or 'untested'}"
+
+    @classmethod
+    def case_counters(cls, status, latest_result):
+        """Counters a test case with the given status and latest result is counted in."""
+        return [cls.status_field(status), cls.result_field(latest_result)]
+
+    @classmethod
+    def apply_changes(cls, changes, touched=()):
+        """
+        Shift the counters by the given (plan_id, field, delta) changes
+        with one UPDATE per test plan. The test plans in touched have their
+        updated_at moved even when none of their counters change.
+        """
+        deltas = defaultdict(lambda: defaultdict(int))
+        for plan_id in touched:
+            deltas[plan_id]
+        for plan_id, field, delta in changes:
+            deltas[plan_id][field] += delta
+
+        now = timezone.now()
+        for plan_id, fields in deltas.items():
+            values = {
+                field: F(field) + delta for field, delta in fields.items() if delta
+            }
+            if values or plan_id in touched:
+                cls.objects.filter(plan_id=plan_id).update(updated_at=now, **values)
+
+    @classmethod
+    def rebuild(cls, plan_ids=None):
+        """
+        Recount the statistics of the given test plans with one grouped
+        aggregate. Recounts every test plan when plan_ids is None.
+        """
+        plans = TestPlan.objects.all()
+        cases = TestCase.objects.all()
+        if plan_ids is not None:
+            plans = plans.filter(pk__in=plan_ids)
+            cases = cases.filter(plan_id__in=plan_ids)
+
+        stats = {
+            plan_id: cls(plan_id=plan_id)
+            for plan_id in plans.values_list("pk", flat=True)
+        }
+        rows = (
+            cases.values("plan_id", "status", "latest_result")
+            .annotate(count=Count("pk"))
+            .order_by()
+        )
+        for row in rows:
+            plan_stats = stats[row["plan_id"]]
+            for field in cls.case_counters(row["status"], row["latest_result"]):
+                setattr(plan_stats, field, getattr(plan_stats, field) + row["count"])
+
+        cls.objects.bulk_create(
+            stats.values(),
+            update_conflicts=True,
+            unique_fields=["plan"],
+            update_fields=cls.COUNTER_FIELDS + ["updated_at"],
+        )
+        return len(stats)
+
+    @property
+    def total(self):
+        return self.status_design + self.status_ready + self.status_closed
+
+    @property
+    def status_counts(self):
+        return {
+            "design": self.status_design,
+            "ready": self.status_ready,
+            "closed": self.status_closed,
+        }
+
+    @property
+    def result_counts(self):
+        return {
+            "pass": self.result_pass,
+            "fail": self.result_fail,
+            "in_progress": self.result_in_progress,
+            "untested": self.result_untested,
+        }
+
+    def __str__(self):
+        return f"Stats for {self.plan_id}"
+
+
 class TestCase(models.Model):
     plan = models.ForeignKey(
         TestPlan, related_name="test_cases", on_delete=models.CASCADE
@@ -44,23 +204,119 @@ class TestCase(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized copy of the latest TestResult so listings don't need a query per row.
+    # Kept in sync by the TestResult signals and the rebuild_latest_results command.
+    last_result = models.ForeignKey(
+        "TestResult",
+        related_name="+",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    latest_result = models.CharField(
+        max_length=20,
+        choices=TEST_CASE_RESULTS,
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    last_executed_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Weighted title/description vector maintained by a database trigger on Postgres
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["plan", "latest_result"], name="testcase_plan_latest_idx"
+            ),
+            models.Index(
+                fields=["plan", "-created_at", "-id"],
+                name="testcase_plan_created_idx",
+            ),
+            GinIndex(
+                OpClass(Upper("title"), name="gin_trgm_ops"),
+                name="testcase_title_trgm_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="testcase_search_idx"),
+        ]
+
+    @classmethod
+    def refresh_latest_results(cls, case_ids=None, update_stats=True):
+        """
+        Recompute the denormalized latest result columns in a single UPDATE
+        and move the plan statistics counters of the test cases whose latest
+        result changed. Refreshes every test case when case_ids is None.
+        Pass update_stats=False when the columns may have drifted, as the
+        counters would be moved from the wrong value, and recount instead.
+        """
+        latest = TestResult.objects.filter(case=OuterRef("pk")).order_by(
+            "-executed_at", "-pk"
+        )
+        columns = {
+            "last_result": Subquery(latest.values("pk")[:1]),
+            "latest_result": Subquery(latest.values("result")[:1]),
+            "last_executed_at": Subquery(latest.values("executed_at")[:1]),
+        }
+        queryset = cls.objects.all()
+        if case_ids is not None:
+            queryset = queryset.filter(pk__in=case_ids)
+
+        if not update_stats:
+            return queryset.update(**columns)
+
+        with transaction.atomic():
+            if case_ids is None:
+                updated = queryset.update(**columns)
+                PlanStats.rebuild()
+                return updated
+
+            # Locked until the counters are moved, so concurrent refreshes of
+            # the same test case cannot both move them from the same value
+            before = list(
+                queryset.select_for_update()
+                .order_by("pk")
+                .values_list("pk", "plan_id", "latest_result", "last_result")
+            )
+            updated = queryset.update(**columns)
+            after = {
+                pk: (latest_result, last_result)
+                for pk, latest_result, last_result in queryset.values_list(
+                    "pk", "latest_result", "last_result"
+                )
+            }
+
+            changes = []
+            touched = set()
+            for pk, plan_id, latest_result, last_result in before:
+                if after.get(pk, (latest_result, last_result)) == (
+                    latest_result,
+                    last_result,
+                ):
+                    continue
+                touched.add(plan_id)
+                if after[pk][0] != latest_result:
+                    changes += [
+                        (plan_id, PlanStats.result_field(latest_result), -1),
+                        (plan_id, PlanStats.result_field(after[pk][0]), 1),
+                    ]
+            PlanStats.apply_changes(changes, touched)
+        return updated
+
+    def save(self, *args, **kwargs):
+        # The plan statistics are updated by signals in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     @property
     def latest_test_result(self):
         """Get the latest test result for this test case."""
-        return self.test_results.order_by("-executed_at").first()
+        return self.last_result
 
     @property
     def executed_at(self):
         """Get the execution time of the latest test result."""
-        latest_result = self.latest_test_result
-        return latest_result.executed_at if latest_result else None
-
-    @property
-    def latest_result(self):
-        """Get the result of the latest test execution."""
-        latest_result = self.latest_test_result
-        return latest_result.result if latest_result else None
+        return self.last_executed_at
 
     def __str__(self):
         return self.title
@@ -91,11 +347,231 @@ class TestStep(models.Model):
         return f"Step {self.order} for {self.case.title}"
 
 
-class TestStepAttachment(models.Model):
+def blob_upload_to(blob, filename):
+    prefix = f"blobs/{blob.sha256[:2]}/{blob.sha256}/"
+    room = AttachmentBlob._meta.get_field("file").max_length - len(prefix)
+    if len(filename) > room:
+        stem, ext = os.path.splitext(filename)
+        filename = stem[: room - len(ext)] + ext
+    return prefix + filename
+
+
+# The file is deleted by purge() while the blob is locked
+@cleanup.ignore
+class AttachmentBlob(models.Model):
+    """
+    One stored attachment file, addressed by the SHA-256 of its content and
+    shared by every attachment with that content. ref_count is the number of
+    attachments using the blob, which is removed with its file once the last
+    of them is gone.
+    """
+
+    # Null until the content of a direct upload is hashed in the background
+    sha256 = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    file = models.FileField(upload_to=blob_upload_to, max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    # WebP renditions of image blobs, generated in the background after upload
+    thumbnail = models.FileField(upload_to=blob_upload_to, max_length=255, blank=True)
+    preview = models.FileField(upload_to=blob_upload_to, max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def reference(cls, sha256):
+        """Add a reference to the blob with the given content, if there is one."""
+        if not cls.objects.filter(sha256=sha256).update(ref_count=F("ref_count") + 1):
+            return None
+        return cls.objects.get(sha256=sha256)
+
+    @classmethod
+    def insert(cls, blob):
+        """
+        Save a new blob whose file is already stored. When the same content was
+        stored concurrently, the other blob gets the reference instead.
+        """
+        try:
+            with transaction.atomic():
+                blob.save()
+            return blob
+        except IntegrityError:
+            existing = cls.reference(blob.sha256)
+            if existing is None:
+                raise
+            if existing.file.name != blob.file.name:
+                blob.file.storage.delete(blob.file.name)
+            return existing
+
+    @classmethod
+    def acquire(cls, file):
+        """
+        Blob holding the content of the uploaded file, with one more reference.
+        Content that is already stored is not written to the storage again.
+        """
+        sha256 = content_hash(file.chunks())
+        blob = cls.reference(sha256)
+        if blob is not None:
+            return blob
+
+        blob = cls(sha256=sha256, size=file.size, ref_count=1)
+        blob.file.save(os.path.basename(file.name), file, save=False)
+        return cls.insert(blob)
+
+    @classmethod
+    def adopt(cls, name):
+        """
+        New blob with one reference for a file already in the storage, such
+        as a direct upload. Only its size is read, with a HEAD request on S3:
+        the content is hashed later by identify(), in the background.
+        """
+        blob = cls(file=name, ref_count=1)
+        blob.size = file_metadata(blob.file).size
+        blob.save()
+        return blob
+
+    @classmethod
+    def identify(cls, blob_id):
+        """
+        Hash the content of a blob adopted without it. When the same content
+        is stored already, the attachments of the blob are moved over to the
+        existing blob and the blob is purged along with its file. Returns the
+        blob now holding the content, or None when there is nothing to hash.
+        """
+        blob = cls.objects.filter(pk=blob_id, sha256__isnull=True).first()
+        if blob is None:
+            return None
+        # Read before locking anything, as it takes as long as a download
+        sha256 = content_hash(
+            read_chunks(blob.file, 0, blob.size - 1) if blob.size else []
+        )
+
+        with transaction.atomic():
+            blob = (
+                cls.objects.select_for_update()
+                .filter(pk=blob_id, sha256__isnull=True)
+                .first()
+            )
+            if blob is None:
+                return None
+            existing = cls.objects.select_for_update().filter(sha256=sha256).first()
+            if existing is None:
+                blob.sha256 = sha256
+                blob.save(update_fields=["sha256"])
+                return blob
+
+            moved = sum(
+                model.objects.filter(blob=blob).update(
+                    blob=existing, file=existing.file.name
+                )
+                for model in (TestStepAttachment, TestResultStepAttachment)
+            )
+            cls.objects.filter(pk=existing.pk).update(ref_count=F("ref_count") + moved)
+            cls.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") - moved)
+            transaction.on_commit(partial(cls.purge, {blob.pk}))
+            return existing
+
+    @classmethod
+    def release(cls, blob_ids):
+        """
+        Drop one reference per given blob id. Blobs left without references
+        are purged once the transaction commits, so content that gets attached
+        again in the same transaction is kept.
+        """
+        for blob_id, count in Counter(blob_ids).items():
+            cls.objects.filter(pk=blob_id).update(ref_count=F("ref_count") - count)
+        transaction.on_commit(partial(cls.purge, set(blob_ids)))
+
+    @classmethod
+    def purge(cls, blob_ids=None):
+        """
+        Remove the given blobs, or all of them when blob_ids is None, along
+        with their files if they have no references left.
+        Returns the number of removed blobs.
+        """
+        queryset = cls.objects.filter(ref_count__lte=0)
+        if blob_ids is not None:
+            queryset = queryset.filter(pk__in=blob_ids)
+
+        purged = 0
+        for blob_id in queryset.values_list("pk", flat=True):
+            with transaction.atomic():
+                # Lock the blob so it cannot get a new reference while its file is deleted
+                blob = (
+                    cls.objects.select_for_update()
+                    .filter(pk=blob_id, ref_count__lte=0)
+                    .first()
+                )
+                if blob is None:
+                    continue
+                for file in (blob.file, blob.thumbnail, blob.preview):
+                    if file:
+                        file.delete(save=False)
+                blob.delete()
+                purged += 1
+        return purged
+
+    @classmethod
+    def recount(cls):
+        """
+        Repair the reference counts of every blob from the attachment tables
+        with a single UPDATE. Returns the number of blobs.
+        """
+
+        def references(model):
+            return Coalesce(
+                Subquery(
+                    model.objects.filter(blob=OuterRef("pk"))
+                    .order_by()
+                    .values("blob")
+                    .annotate(count=Count("pk"))
+                    .values("count")
+                ),
+                0,
+            )
+
+        return cls.objects.update(
+            ref_count=references(TestStepAttachment)
+            + references(TestResultStepAttachment)
+        )
+
+    def __str__(self):
+        return self.sha256 or self.file.name
+
+
+class AttachmentFileMixin:
+    """
+    Stores the file of a new attachment as a shared AttachmentBlob and keeps
+    the uploaded file name, since the stored name is derived from the content.
+    """
+
+    def save(self, *args, **kwargs):
+        # The reference to the blob is rolled back if the row cannot be saved
+        with transaction.atomic():
+            if self.file and not self.file._committed:
+                self.filename = os.path.basename(self.file.name)
+                self.blob = AttachmentBlob.acquire(self.file)
+                self.file = self.blob.file.name
+            super().save(*args, **kwargs)
+
+
+# Files are released through their blob by the post_delete signal
+@cleanup.ignore
+class TestStepAttachment(AttachmentFileMixin, models.Model):
     step = models.ForeignKey(
         TestStep, related_name="attachments", on_delete=models.CASCADE
     )
-    file = models.FileField(upload_to="attachments/")
+    file = models.FileField(upload_to="attachments/", max_length=255)
+    filename = models.CharField(max_length=255, blank=True)
+    # Storage name of the direct upload the attachment was confirmed from,
+    # which confirming the upload again finds it by
+    upload_name = models.CharField(max_length=255, blank=True)
+    # Null for files stored before attachments were deduplicated
+    blob = models.ForeignKey(
+        AttachmentBlob,
+        related_name="+",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+    )
 
 
 class TestResult(models.Model):
@@ -123,6 +599,23 @@ class TestResult(models.Model):
     executed_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["case", "-executed_at", "-id"],
+                name="testresult_case_executed_idx",
+            ),
+            models.Index(
+                fields=["-executed_at", "-id"], name="testresult_executed_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The latest result columns and plan statistics are updated by signals
+        # in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     @property
     def configuration(self):
         return f"{self.browser} on {self.os}"
@@ -163,8 +656,110 @@ class TestResultStep(models.Model):
         ]
 
 
-class TestResultStepAttachment(models.Model):
+# Files are released through their blob by the post_delete signal
+@cleanup.ignore
+class TestResultStepAttachment(AttachmentFileMixin, models.Model):
     result_step = models.ForeignKey(
         TestResultStep, related_name="attachments", on_delete=models.CASCADE
     )
-    file = models.FileField(upload_to="result_attachments/")
+    file = models.FileField(upload_to="result_attachments/", max_length=255)
+    filename = models.CharField(max_length=255, blank=True)
+    # Storage name of the direct upload the attachment was confirmed from,
+    # which confirming the upload again finds it by
+    upload_name = models.CharField(max_length=255, blank=True)
+    # Null for files stored before attachments were deduplicated
+    blob = models.ForeignKey(
+        AttachmentBlob,
+        related_name="+",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+    )
+
+
+class SearchDocument(models.Model):
+    """
+    One row of the global search index. Plans, cases, step text and result
+    comments are copied here on save, so a single full-text index covers them.
+    Rows are removed with their source through the cascading foreign keys.
+    """
+
+    kind = models.CharField(max_length=20, choices=SEARCH_DOCUMENT_KINDS)
+    object_id = models.BigIntegerField()
+    plan = models.ForeignKey(TestPlan, related_name="+", on_delete=models.CASCADE)
+    case = models.ForeignKey(
+        TestCase, related_name="+", on_delete=models.CASCADE, null=True, blank=True
+    )
+    step = models.ForeignKey(
+        TestStep, related_name="+", on_delete=models.CASCADE, null=True, blank=True
+    )
+    result = models.ForeignKey(
+        TestResult, related_name="+", on_delete=models.CASCADE, null=True, blank=True
+    )
+    result_step = models.ForeignKey(
+        TestResultStep,
+        related_name="+",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    title = models.TextField(blank=True)
+    body = models.TextField(blank=True)
+    # Weighted title/body vector maintained by a database trigger on Postgres
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "object_id"],
+                name="unique_search_document_per_object",
+            )
+        ]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="searchdocument_search_idx"),
+        ]
+
+
+class Job(models.Model):
+    """
+    One unit of background work run by the `run_worker` command. Jobs wait
+    as "queued" until run_at, are claimed by one worker at a time and are
+    queued again with a backoff when they fail, until max_attempts is used up.
+    """
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20, choices=JOB_STATUS, default=JOB_STATUS[0][0]
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        "auth.User",
+        related_name="+",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers only ever scan the queued jobs that are due
+            models.Index(
+                fields=["run_at", "id"],
+                condition=models.Q(status="queued"),
+                name="job_queued_run_at_idx",
+            ),
+            models.Index(fields=["-created_at", "-id"], name="job_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
@@ -0,0 +1,30 @@
+from django.contrib.postgres.indexes import PostgresIndex
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently as PostgresAddIndexConcurrently,
+)
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexConcurrently(PostgresAddIndexConcurrently):
+    """
+    Build the index with CREATE INDEX CONCURRENTLY on Postgres so live tables
+    keep accepting writes, and fall back to a regular CREATE INDEX elsewhere.
+    Postgres-only index types (GIN, GiST, ...) are skipped on other backends.
+    Migrations using this operation must set `atomic = False`.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        elif not isinstance(self.index, PostgresIndex):
+            AddIndex.database_forwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        elif not isinstance(self.index, PostgresIndex):
+            AddIndex.database_backwards(
+                self, app_label, schema_editor, from_state, to_state
+            )
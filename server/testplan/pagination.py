@@ -0,0 +1,262 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+    _positive_int,
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .search import search_tokens
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination on a (timestamp, id) pair.
+    Every page is a single indexed range scan without COUNT(*) or OFFSET,
+    so deep pages cost the same as the first one.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+    # Can be overridden per view with a `keyset_ordering` attribute
+    ordering = ("-created_at", "-id")
+
+    def __init__(self, page_size, page_size_query_param=None, max_page_size=None):
+        self.page_size = page_size
+        self.page_size_query_param = page_size_query_param
+        self.max_page_size = max_page_size
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size,
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        return self.set_page([obj async for obj in queryset.aiterator()])
+
+    def get_page_queryset(self, queryset, request, view):
+        """The rows of the requested page, plus the first row beyond it."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        field, pk_field = (
+            name.lstrip("-") for name in getattr(view, "keyset_ordering", self.ordering)
+        )
+        self.field = field
+
+        cursor = self.decode_cursor(request)
+        self.has_cursor = cursor is not None
+        self.reverse = bool(cursor and cursor["reverse"])
+
+        if cursor is not None:
+            value = cursor["value"]
+            if self.reverse:
+                position = Q(**{f"{field}__gt": value}) | Q(
+                    **{field: value, f"{pk_field}__gt": cursor["id"]}
+                )
+            else:
+                position = Q(**{f"{field}__lt": value}) | Q(
+                    **{field: value, f"{pk_field}__lt": cursor["id"]}
+                )
+            queryset = queryset.filter(position)
+
+        if self.reverse:
+            queryset = queryset.order_by(field, pk_field)
+        else:
+            queryset = queryset.order_by(f"-{field}", f"-{pk_field}")
+
+        # Fetch one extra row to know whether there is a page beyond this one
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+
+        if self.reverse:
+            results.reverse()
+            self.has_next = self.has_cursor
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.has_cursor
+
+        self.page = results
+        return results
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            cursor = {
+                # Raises ValueError for well-formed but impossible dates
+                "value": parse_datetime(str(cursor["v"])),
+                "id": int(cursor["i"]),
+                "reverse": bool(cursor.get("r", False)),
+            }
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if cursor["value"] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def encode_cursor(self, obj, reverse):
+        value = getattr(obj, self.field)
+        data = {"v": value.isoformat(), "i": obj.pk}
+        if reverse:
+            data["r"] = True
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode("ascii"))
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, "page")
+        return replace_query_param(url, self.cursor_query_param, encoded.decode())
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+
+class SearchResultsSetPagination(PageNumberPagination):
+    """
+    Page number pagination for ranked search hits, which have no stable
+    timestamp order to build a keyset on.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """
+    Page number pagination that switches to keyset pagination when the client
+    asks for it with `?pagination=cursor` (or follows a `cursor` link).
+    Ranked full-text searches keep page numbers, as a keyset on timestamps
+    would drop their relevance order.
+    """
+
+    page_size = 10
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    mode_query_param = "pagination"
+    search_query_param = "search"
+
+    def use_keyset(self, request):
+        if search_tokens(request.query_params.get(self.search_query_param)):
+            return False
+        return (
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def django_paginator_class(self, object_list, per_page):
+        paginator = Paginator(object_list, per_page)
+        if self.row_count is not None:
+            # Counted by the view along with its conditional request validators
+            paginator.count = self.row_count
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        self.row_count = getattr(view, "row_count", None)
+        if self.use_keyset(request):
+            self.keyset = KeysetPagination(
+                self.page_size, self.page_size_query_param, self.max_page_size
+            )
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() reading the count and the rows with the async ORM."""
+        self.keyset = None
+        self.row_count = getattr(view, "row_count", None)
+        if self.use_keyset(request):
+            self.keyset = KeysetPagination(
+                self.page_size, self.page_size_query_param, self.max_page_size
+            )
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+
+        if self.row_count is None:
+            self.row_count = await queryset.acount()
+        self.request = request
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        # Load the rows before anything iterates the page synchronously
+        self.page.object_list = [obj async for obj in self.page.object_list.aiterator()]
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters += [
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Set to 'cursor' to use keyset pagination instead of page numbers. Searches ranked by relevance always use page numbers.",
+                "schema": {"type": "string", "enum": ["page", "cursor"]},
+            },
+            {
+                "name": KeysetPagination.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+        ]
+        return parameters
@@ -0,0 +1,92 @@
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import caching, jobs
+from .models import AttachmentBlob, TestStepAttachment
+
+logger = logging.getLogger(__name__)
+
+# Preview files generated for image attachments and their maximum width
+PREVIEW_WIDTHS = {"thumbnail": 320, "preview": 1280}
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp", ".tif", ".tiff"}
+
+# Images are decoded in full, so refuse anything larger than this many pixels
+MAX_IMAGE_PIXELS = 50_000_000
+
+
+def is_image(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def render_webp(image, width):
+    """Encode the image as WebP, scaled down to the given width if it is wider."""
+    image = image.copy()
+    image.thumbnail((width, image.height))
+    if image.mode not in ("RGB", "RGBA"):
+        transparent = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if transparent else "RGB")
+    output = io.BytesIO()
+    image.save(output, format="WEBP", quality=80, method=4)
+    return output.getvalue()
+
+
+def generate_previews(blob_id):
+    """
+    Store the WebP thumbnail and preview of an image blob next to its file.
+    Returns False when the blob is gone, is not an image or cannot be decoded.
+    """
+    blob = AttachmentBlob.objects.filter(pk=blob_id).first()
+    if blob is None or not is_image(blob.file.name):
+        return False
+
+    try:
+        with blob.file.open("rb") as f:
+            image = Image.open(f)
+            if image.width * image.height > MAX_IMAGE_PIXELS:
+                return False
+            image = ImageOps.exif_transpose(image)
+            previews = {
+                field: render_webp(image, width)
+                for field, width in PREVIEW_WIDTHS.items()
+            }
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        logger.warning("Cannot generate previews of %s", blob.file.name)
+        return False
+
+    stale_names = {getattr(blob, field).name for field in previews} - {""}
+    for field, content in previews.items():
+        getattr(blob, field).save(f"{field}.webp", ContentFile(content), save=False)
+    names = {field: getattr(blob, field).name for field in previews}
+
+    # The blob may have been purged in the meantime, in which case nothing is updated
+    if not AttachmentBlob.objects.filter(pk=blob_id).update(**names):
+        for field in previews:
+            getattr(blob, field).delete(save=False)
+        return False
+
+    # Regenerated previews may have been stored under a new name
+    for name in stale_names - set(names.values()):
+        blob.file.storage.delete(name)
+
+    # The cached attachment lists show the preview URLs
+    for case_id in (
+        TestStepAttachment.objects.filter(blob_id=blob_id)
+        .values_list("step__case_id", flat=True)
+        .distinct()
+    ):
+        caching.invalidate_case(case_id)
+    return True
+
+
+def schedule_previews(blob):
+    """
+    Queue a job generating the previews of a new image blob, so uploads never
+    wait for them. The job is committed along with the blob.
+    """
+    if is_image(blob.file.name):
+        jobs.enqueue("generate_previews", {"blob_id": blob.pk})
@@ -0,0 +1,66 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+class Echo:
+    """File-like object that returns what is written, to stream csv.writer rows."""
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(columns, rows):
+    """Yield the CSV lines of the header and the rows one at a time."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_rows(columns, rows):
+    """Yield one JSON object per row, one line at a time."""
+    for row in rows:
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def as_records(data):
+    if isinstance(data, dict):
+        return [data]
+    return list(data or [])
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Selects `?format=csv` for views that stream their own response,
+    and renders regular responses such as errors as CSV.
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        records = as_records(data)
+        columns = list(records[0]) if records else []
+        rows = ([record.get(column) for column in columns] for record in records)
+        return "".join(csv_rows(columns, rows)).encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Selects `?format=ndjson` for views that stream their own response,
+    and renders regular responses such as errors as NDJSON.
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        records = as_records(data)
+        return "".join(
+            ndjson_rows(list(record), [list(record.values())]) for record in records
+        ).encode(self.charset)
@@ -0,0 +1,224 @@
+import re
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Concat
+
+# Text search configuration used for Postgres tsvector columns
+SEARCH_CONFIG = "english"
+
+# Relative weight of each Postgres weight class in the SQLite bm25() ranking
+SQLITE_WEIGHTS = {"A": 10.0, "B": 4.0, "C": 2.0, "D": 1.0}
+
+# Tables with a full-text index and the weight of each indexed column
+SEARCH_INDEXES = {
+    "testplan_testplan": {"title": "A", "description": "B"},
+    "testplan_testcase": {"title": "A", "description": "B"},
+    "testplan_searchdocument": {"title": "A", "body": "B"},
+}
+
+
+def search_tokens(value):
+    """Split the user input into plain word tokens safe for both query syntaxes."""
+    return re.findall(r"\w+", value or "")
+
+
+def fts_table(table):
+    """Name of the SQLite FTS5 table mirroring the given table."""
+    return f"{table}_fts"
+
+
+def postgres_search_statements(table, columns):
+    vector = " || ".join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce({{row}}{column}, '')), '{weight}')"
+        for column, weight in columns.items()
+    )
+    column_list = ", ".join(columns)
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {vector.format(row="NEW.")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f"DROP TRIGGER IF EXISTS {table}_search_vector ON {table}",
+        f"""
+        CREATE TRIGGER {table}_search_vector
+        BEFORE INSERT OR UPDATE OF {column_list} ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {table}_search_vector_update()
+        """,
+        f"UPDATE {table} SET search_vector = {vector.format(row='')}",
+    ]
+
+
+def sqlite_search_statements(table, columns):
+    fts = fts_table(table)
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete_old = (
+        f"INSERT INTO {fts}({fts}, rowid, {column_list}) "
+        f"VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = (
+        f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values});"
+    )
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            {column_list}, content='{table}', content_rowid='id',
+            tokenize='porter unicode61'
+        )
+        """,
+        f"DROP TRIGGER IF EXISTS {fts}_ai",
+        f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"DROP TRIGGER IF EXISTS {fts}_ad",
+        f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"DROP TRIGGER IF EXISTS {fts}_au",
+        f"""
+        CREATE TRIGGER {fts}_au AFTER UPDATE OF {column_list} ON {table}
+        BEGIN {delete_old} {insert_new} END
+        """,
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def install_search_index(connection, table, columns):
+    """
+    Create (or recreate) the triggers keeping the full-text index of a table
+    up to date and rebuild the index from the current rows.
+    Postgres keeps a weighted tsvector in the search_vector column,
+    SQLite mirrors the columns into an external content FTS5 table.
+    """
+    if connection.vendor == "postgresql":
+        statements = postgres_search_statements(table, columns)
+    elif connection.vendor == "sqlite":
+        statements = sqlite_search_statements(table, columns)
+    else:
+        return
+
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def uninstall_search_index(connection, table):
+    if connection.vendor == "postgresql":
+        statements = [
+            f"DROP TRIGGER IF EXISTS {table}_search_vector ON {table}",
+            f"DROP FUNCTION IF EXISTS {table}_search_vector_update()",
+        ]
+    elif connection.vendor == "sqlite":
+        fts = fts_table(table)
+        statements = [
+            f"DROP TRIGGER IF EXISTS {fts}_{suffix}" for suffix in ("ai", "ad", "au")
+        ]
+        statements.append(f"DROP TABLE IF EXISTS {fts}")
+    else:
+        return
+
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def postgres_query(tokens):
+    return SearchQuery(
+        " & ".join(f"{token}:*" for token in tokens),
+        config=SEARCH_CONFIG,
+        search_type="raw",
+    )
+
+
+def sqlite_match(tokens):
+    return " ".join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+
+def search_queryset(queryset, value):
+    """
+    Filter the queryset down to rows matching every word of the value as a
+    prefix and order them by relevance, annotated as `search_rank`.
+    """
+    tokens = search_tokens(value)
+    if not tokens:
+        return queryset
+
+    connection = connections[queryset.db]
+
+    if connection.vendor == "postgresql":
+        query = postgres_query(tokens)
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(search_rank=SearchRank(F("search_vector"), query))
+            .order_by("-search_rank", "-pk")
+        )
+
+    table = queryset.model._meta.db_table
+    fts = fts_table(table)
+    match = sqlite_match(tokens)
+    weights = ", ".join(str(SQLITE_WEIGHTS[w]) for w in SEARCH_INDEXES[table].values())
+    return (
+        queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {fts} WHERE {fts} MATCH %s", (match,))
+        )
+        .annotate(
+            # bm25() is lower for better matches
+            search_rank=RawSQL(
+                f"SELECT -bm25({fts}, {weights}) FROM {fts} "
+                f"WHERE {fts} MATCH %s AND rowid = {table}.id",
+                (match,),
+            )
+        )
+        .order_by("-search_rank", "-pk")
+    )
+
+
+def highlight_queryset(queryset, value, start_sel="<mark>", stop_sel="</mark>"):
+    """
+    Annotate each row with `search_highlight`, a short fragment of its indexed
+    text with the words matching the value wrapped in the given markers.
+    """
+    tokens = search_tokens(value)
+    if not tokens:
+        return queryset.annotate(search_highlight=Value(""))
+
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    columns = list(SEARCH_INDEXES[table])
+
+    if connection.vendor == "postgresql":
+        text = Concat(*intersperse([F(column) for column in columns], Value(" ")))
+        return queryset.annotate(
+            search_highlight=SearchHeadline(
+                text,
+                postgres_query(tokens),
+                config=SEARCH_CONFIG,
+                start_sel=start_sel,
+                stop_sel=stop_sel,
+                max_words=24,
+                min_words=8,
+            )
+        )
+
+    fts = fts_table(table)
+    return queryset.annotate(
+        # Column -1 lets snippet() pick the column with the best match
+        search_highlight=RawSQL(
+            f"SELECT snippet({fts}, -1, %s, %s, '…', 16) FROM {fts} "
+            f"WHERE {fts} MATCH %s AND rowid = {table}.id",
+            (start_sel, stop_sel, sqlite_match(tokens)),
+        )
+    )
+
+
+def intersperse(items, separator):
+    result = []
+    for item in items:
+        if result:
+            result.append(separator)
+        result.append(item)
+    return result
@@ -1,13 +1,21 @@
+import os
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils.text import get_valid_filename
+from .constants import BROWSER_LIST, OS_LIST, INGEST_STATUS
 from .models import (
     TestPlan,
+    PlanStats,
     TestCase,
     TestResult,
     TestStep,
     TestResultStep,
     TestStepAttachment,
     TestResultStepAttachment,
+    SearchDocument,
+    Job,
 )
 
 
@@ -18,10 +26,26 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "username", "first_name", "last_name", "email"]
 
 
+class PlanProgressSerializer(serializers.ModelSerializer):
+    total = serializers.IntegerField(read_only=True)
+    status = serializers.DictField(
+        source="status_counts", child=serializers.IntegerField(), read_only=True
+    )
+    latest_result = serializers.DictField(
+        source="result_counts", child=serializers.IntegerField(), read_only=True
+    )
+
+    class Meta:
+        model = PlanStats
+        fields = ["total", "status", "latest_result"]
+
+
 class TestPlanSerializer(serializers.ModelSerializer):
+    progress = PlanProgressSerializer(source="stats", read_only=True, allow_null=True)
+
     class Meta:
         model = TestPlan
-        fields = "__all__"
+        exclude = ["search_vector"]
         read_only_fields = ["created_at", "updated_at"]
 
 
@@ -32,13 +56,27 @@ class TestPlanCreateSerializer(serializers.ModelSerializer):
         read_only_fields = ["created_at", "updated_at"]
 
 
+class TestEnvironmentSummarySerializer(serializers.Serializer):
+    browser = serializers.CharField()
+    os = serializers.CharField()
+    count = serializers.IntegerField()
+
+
+class TestPlanSummarySerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    status = serializers.DictField(child=serializers.IntegerField())
+    latest_result = serializers.DictField(child=serializers.IntegerField())
+    environments = TestEnvironmentSummarySerializer(many=True)
+    pass_rate = serializers.FloatField(allow_null=True)
+
+
 class TestCaseSerializer(serializers.ModelSerializer):
-    executed_at = serializers.DateTimeField(read_only=True)
+    executed_at = serializers.DateTimeField(source="last_executed_at", read_only=True)
     latest_result = serializers.CharField(read_only=True)
 
     class Meta:
         model = TestCase
-        fields = "__all__"
+        exclude = ["last_result", "last_executed_at", "search_vector"]
         read_only_fields = ["created_at", "updated_at", "executed_at", "latest_result"]
 
 
@@ -86,11 +124,15 @@ class TestStepCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating test steps.
     The 'case' field will be automatically set from the URL parameter.
+    The optional 'id' refers to an existing test step to update in place.
     """
 
+    id = serializers.IntegerField(required=False, allow_null=True)
+
     class Meta:
         model = TestStep
         fields = [
+            "id",
             "order",
             "action",
             "expected_result",
@@ -116,8 +158,12 @@ class TestResultStepCreateSerializer(serializers.ModelSerializer):
     """
     Serializer for creating test result steps.
     The 'result' field will be automatically set from the URL parameter.
+    The 'step' field is checked for all items at once by the view instead of
+    with one query per item.
     """
 
+    step = serializers.IntegerField(source="step_id", required=False, allow_null=True)
+
     class Meta:
         model = TestResultStep
         fields = [
@@ -130,10 +176,60 @@ class TestResultStepCreateSerializer(serializers.ModelSerializer):
         ]
 
 
+class TestResultIngestSerializer(serializers.ModelSerializer):
+    """
+    Serializer for one test result of a bulk ingest, along with its steps.
+    The test case and test step references are checked for the whole batch at once.
+    """
+
+    case = serializers.IntegerField(source="case_id")
+    steps = TestResultStepCreateSerializer(many=True, default=list)
+
+    class Meta:
+        model = TestResult
+        fields = ["case", "result", "browser", "os", "steps"]
+
+
+class TestResultIngestStatusSerializer(serializers.Serializer):
+    index = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=INGEST_STATUS)
+    id = serializers.IntegerField(required=False)
+    errors = serializers.JSONField(required=False)
+
+
+class TestResultIngestResponseSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    failed = serializers.IntegerField()
+    results = TestResultIngestStatusSerializer(many=True)
+
+
+class JUnitImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    browser = serializers.ChoiceField(choices=BROWSER_LIST, default=BROWSER_LIST[0][0])
+    os = serializers.ChoiceField(choices=OS_LIST, default=OS_LIST[0][0])
+
+
+class JUnitImportSummarySerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    created = serializers.IntegerField()
+    skipped = serializers.IntegerField()
+    unmatched = serializers.IntegerField()
+    unmatched_names = serializers.ListField(child=serializers.CharField())
+
+
 class TestStepAttachmentSerializer(serializers.ModelSerializer):
+    # WebP renditions of image attachments, null until they are generated
+    thumbnail = serializers.FileField(
+        source="blob.thumbnail", read_only=True, allow_null=True
+    )
+    preview = serializers.FileField(
+        source="blob.preview", read_only=True, allow_null=True
+    )
+
     class Meta:
         model = TestStepAttachment
-        fields = ["id", "step", "file"]
+        fields = ["id", "step", "file", "filename", "thumbnail", "preview"]
+        read_only_fields = ["filename"]
 
 
 class TestStepAttachmentCreateSerializer(serializers.ModelSerializer):
@@ -143,12 +239,90 @@ class TestStepAttachmentCreateSerializer(serializers.ModelSerializer):
 
 
 class TestResultStepAttachmentSerializer(serializers.ModelSerializer):
+    # WebP renditions of image attachments, null until they are generated
+    thumbnail = serializers.FileField(
+        source="blob.thumbnail", read_only=True, allow_null=True
+    )
+    preview = serializers.FileField(
+        source="blob.preview", read_only=True, allow_null=True
+    )
+
     class Meta:
         model = TestResultStepAttachment
-        fields = ["id", "result_step", "file"]
+        fields = ["id", "result_step", "file", "filename", "thumbnail", "preview"]
+        read_only_fields = ["filename"]
 
 
 class TestResultStepAttachmentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = TestResultStepAttachment
         fields = ["result_step", "file"]
+
+
+class AttachmentUploadRequestSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=255, required=False)
+
+    def validate_filename(self, value):
+        if value.lower().endswith(".exe"):
+            raise serializers.ValidationError(
+                "Executable files (.exe) are not allowed."
+            )
+        try:
+            return get_valid_filename(os.path.basename(value))
+        except SuspiciousFileOperation:
+            raise serializers.ValidationError("Invalid file name.")
+
+
+class TestStepAttachmentUploadSerializer(AttachmentUploadRequestSerializer):
+    step = serializers.IntegerField(help_text="Order of the test step")
+
+
+class TestResultStepAttachmentUploadSerializer(AttachmentUploadRequestSerializer):
+    result_step = serializers.IntegerField(help_text="Order of the test result step")
+
+
+class AttachmentUploadSerializer(serializers.Serializer):
+    name = serializers.CharField(help_text="Storage name of the uploaded file")
+    url = serializers.URLField(help_text="URL to POST the file to")
+    fields = serializers.DictField(
+        child=serializers.CharField(),
+        help_text="Form fields to send along with the file",
+    )
+    token = serializers.CharField(help_text="Token confirming the upload")
+
+
+class AttachmentUploadConfirmSerializer(serializers.Serializer):
+    tokens = serializers.ListField(child=serializers.CharField(), allow_empty=False)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        exclude = ["locked_by", "locked_at"]
+        read_only_fields = [
+            "kind",
+            "payload",
+            "status",
+            "attempts",
+            "max_attempts",
+            "run_at",
+            "result",
+            "error",
+            "created_by",
+            "created_at",
+            "updated_at",
+            "finished_at",
+        ]
+
+
+class SearchHitSerializer(serializers.ModelSerializer):
+    type = serializers.CharField(source="kind", read_only=True)
+    id = serializers.IntegerField(source="object_id", read_only=True)
+    highlight = serializers.CharField(source="search_highlight", read_only=True)
+    rank = serializers.FloatField(source="search_rank", read_only=True)
+
+    class Meta:
+        model = SearchDocument
+        fields = ["type", "id", "title", "highlight", "rank", "plan", "case", "result"]
+        read_only_fields = ["title", "plan", "case", "result"]
@@ -1,8 +1,27 @@
-from django.db.models.signals import post_migrate
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_migrate, pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.core.management import call_command
+from functools import partial
 import os
 
+from . import caching, indexing, jobs, previews
+from .models import (
+    TestPlan,
+    PlanStats,
+    TestCase,
+    TestResult,
+    TestStep,
+    TestResultStep,
+    AttachmentBlob,
+    TestStepAttachment,
+    TestResultStepAttachment,
+)
+
+LATEST_RESULT_FIELDS = ["last_result", "latest_result", "last_executed_at"]
+PLAN_STATS_FIELDS = {"plan", "status", "latest_result"}
+
 
 @receiver(post_migrate)
 def generate_er_diagram(sender, **kwargs):
@@ -25,3 +44,217 @@ def generate_api_schema(sender, **kwargs):
         call_command("spectacular", "--file", schema_path)
     except Exception as e:
         print(f"Error generating API schema: {e}")
+
+
+def deleted_along_with(origin, *models):
+    """Whether a delete cascades from an instance or queryset of the given models."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, models)
+
+
+@receiver(pre_save, sender=TestResult)
+def remember_result_case(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember the test case of the test result before the save, so the
+    post_save signal can refresh the one it was moved away from as well.
+    """
+    instance._previous_case_id = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and "case" not in update_fields:
+        return
+    instance._previous_case_id = (
+        TestResult.objects.filter(pk=instance.pk)
+        .values_list("case_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=TestResult)
+@receiver(post_delete, sender=TestResult)
+def sync_latest_result(sender, instance, origin=None, **kwargs):
+    """
+    Keep the denormalized latest result columns of the test case up to date,
+    and of its previous test case when the test result was moved.
+    """
+    # The test case is being deleted as well
+    if deleted_along_with(origin, TestCase, TestPlan):
+        return
+
+    case_ids = {instance.case_id}
+    previous_case_id = getattr(instance, "_previous_case_id", None)
+    if previous_case_id is not None:
+        case_ids.add(previous_case_id)
+    TestCase.refresh_latest_results(sorted(case_ids))
+
+    # Keep an already loaded test case in step with the database
+    if TestResult.case.is_cached(instance):
+        case = instance.case
+        if case.pk is not None:
+            case.refresh_from_db(fields=LATEST_RESULT_FIELDS)
+
+
+@receiver(post_save, sender=TestPlan)
+def create_plan_stats(sender, instance, created, **kwargs):
+    """
+    Start the statistics of a new test plan at zero.
+    """
+    if created:
+        PlanStats.objects.create(plan=instance)
+
+
+@receiver(pre_save, sender=TestCase)
+def remember_counted_values(sender, instance, update_fields=None, **kwargs):
+    """
+    Remember the plan statistics counters the test case was counted in
+    before the save, so the post_save signal can move it between counters.
+    """
+    instance._counted_values = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and PLAN_STATS_FIELDS.isdisjoint(update_fields):
+        return
+    instance._counted_values = (
+        TestCase.objects.filter(pk=instance.pk)
+        .values_list("plan_id", "status", "latest_result")
+        .first()
+    )
+
+
+@receiver(post_save, sender=TestCase)
+def count_test_case(sender, instance, created, **kwargs):
+    """
+    Keep the plan statistics up to date when a test case is added or changed.
+    """
+    before = getattr(instance, "_counted_values", None)
+    if not created and before is None:
+        return
+
+    changes = []
+    if before is not None:
+        plan_id, status, latest_result = before
+        changes += [
+            (plan_id, field, -1)
+            for field in PlanStats.case_counters(status, latest_result)
+        ]
+    changes += [
+        (instance.plan_id, field, 1)
+        for field in PlanStats.case_counters(instance.status, instance.latest_result)
+    ]
+    PlanStats.apply_changes(changes)
+
+
+@receiver(post_delete, sender=TestCase)
+def uncount_test_case(sender, instance, origin=None, **kwargs):
+    """
+    Keep the plan statistics up to date when a test case is deleted.
+    """
+    # The statistics are deleted along with the test plan
+    if deleted_along_with(origin, TestPlan):
+        return
+
+    PlanStats.apply_changes(
+        [
+            (instance.plan_id, field, -1)
+            for field in PlanStats.case_counters(
+                instance.status, instance.latest_result
+            )
+        ]
+    )
+
+
+def indexed_fields_changed(update_fields, indexed_fields):
+    return update_fields is None or not indexed_fields.isdisjoint(update_fields)
+
+
+@receiver(post_save, sender=TestPlan)
+def index_test_plan(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the search document of the test plan up to date.
+    """
+    if indexed_fields_changed(update_fields, {"title", "description"}):
+        indexing.index_plans([instance])
+
+
+@receiver(post_save, sender=TestCase)
+def index_test_case(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the search document of the test case up to date, and the documents
+    below it on the test plan it was moved to.
+    """
+    before = getattr(instance, "_counted_values", None)
+    if before is not None and before[0] != instance.plan_id:
+        indexing.move_case_documents(instance.pk, instance.plan_id)
+    if indexed_fields_changed(update_fields, {"title", "description"}):
+        indexing.index_cases([instance])
+
+
+@receiver(post_save, sender=TestStep)
+def index_test_step(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the search document of the test step up to date.
+    """
+    if indexed_fields_changed(update_fields, {"action", "expected_result"}):
+        plan_id = instance.case.plan_id if TestStep.case.is_cached(instance) else None
+        indexing.index_steps([instance], plan_id=plan_id)
+
+
+@receiver(post_save, sender=TestResultStep)
+def index_test_result_step(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the search document of the test result step comment up to date.
+    """
+    # Nothing to add or remove for a new step without a comment
+    if created and not instance.comment:
+        return
+    if indexed_fields_changed(update_fields, {"comment"}):
+        indexing.index_result_steps([instance])
+
+
+@receiver(post_delete, sender=TestStepAttachment)
+@receiver(post_delete, sender=TestResultStepAttachment)
+def release_attachment_file(sender, instance, **kwargs):
+    """
+    Drop the reference of a deleted attachment to its blob. Files stored
+    before attachments were deduplicated belong to their row alone.
+    """
+    if instance.blob_id:
+        AttachmentBlob.release([instance.blob_id])
+    elif instance.file:
+        transaction.on_commit(partial(instance.file.delete, save=False))
+
+
+@receiver(post_save, sender=AttachmentBlob)
+def schedule_blob_previews(sender, instance, created, **kwargs):
+    """
+    Queue the previews of a new blob, or first the hashing of its content
+    when it was adopted from a direct upload.
+    """
+    if not created:
+        return
+    if instance.sha256 is None:
+        jobs.enqueue("identify_blob", {"blob_id": instance.pk})
+    else:
+        previews.schedule_previews(instance)
+
+
+@receiver(post_save, sender=TestCase)
+def start_case_version(sender, instance, created, **kwargs):
+    """
+    Start a new test case on a fresh version of its cached payloads, which
+    could otherwise be left over from a deleted row with the same ID.
+    """
+    if created:
+        caching.invalidate_case(instance.pk)
+
+
+@receiver(post_save, sender=TestStep)
+@receiver(post_delete, sender=TestStep)
+def invalidate_step_list(sender, instance, origin=None, **kwargs):
+    """
+    Drop the cached step and attachment lists of the test case of a test step
+    saved or deleted outside the API, e.g. in the admin site.
+    """
+    if deleted_along_with(origin, TestCase, TestPlan):
+        return
+    caching.invalidate_case(instance.case_id)
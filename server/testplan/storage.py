@@ -0,0 +1,146 @@
+import hashlib
+from collections import namedtuple
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from storages.backends.s3 import S3Storage
+from storages.utils import clean_name
+
+# Size of the chunks streamed to the client when proxying a file
+CHUNK_SIZE = 64 * 1024
+
+FileMetadata = namedtuple("FileMetadata", ["size", "last_modified", "etag"])
+
+# Clients signing URLs for the public storage endpoint, by endpoint and access key
+signing_clients = {}
+
+
+def signing_client(storage):
+    """
+    S3 client signing URLs for the endpoint browsers reach the storage at.
+    The app server talks to MinIO at an internal endpoint while browsers use
+    AWS_S3_CUSTOM_DOMAIN, and the host is part of the signature.
+    """
+    if not storage.custom_domain:
+        return storage.connection.meta.client
+
+    endpoint_url = f"{storage.url_protocol}//{storage.custom_domain}"
+    key = (endpoint_url, storage.access_key)
+    if key not in signing_clients:
+        signing_clients[key] = boto3.session.Session().client(
+            "s3",
+            endpoint_url=endpoint_url,
+            aws_access_key_id=storage.access_key,
+            aws_secret_access_key=storage.secret_key,
+            aws_session_token=storage.security_token,
+            region_name=storage.region_name,
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        )
+    return signing_clients[key]
+
+
+def presigned_url(file, expires, filename=None):
+    """
+    Short-lived URL to download the file straight from the storage.
+    Falls back to the plain storage URL for storages that cannot sign URLs,
+    such as the local filesystem.
+    """
+    storage = file.storage
+    if not isinstance(storage, S3Storage):
+        return storage.url(file.name)
+
+    params = {
+        "Bucket": storage.bucket_name,
+        "Key": storage._normalize_name(clean_name(file.name)),
+    }
+    if filename:
+        params["ResponseContentDisposition"] = f'inline; filename="{filename}"'
+    return signing_client(storage).generate_presigned_url(
+        "get_object", Params=params, ExpiresIn=expires
+    )
+
+
+def presigned_post(storage, name, max_size, expires, content_type=None):
+    """
+    Presigned POST policy letting a browser upload a file of at most max_size
+    bytes straight to the storage under the given name. Returns None for
+    storages that cannot sign policies, such as the local filesystem.
+    """
+    if not isinstance(storage, S3Storage):
+        return None
+
+    fields = {}
+    conditions = [["content-length-range", 1, max_size]]
+    if content_type:
+        fields["Content-Type"] = content_type
+        conditions.append({"Content-Type": content_type})
+    return signing_client(storage).generate_presigned_post(
+        Bucket=storage.bucket_name,
+        Key=storage._normalize_name(clean_name(name)),
+        Fields=fields,
+        Conditions=conditions,
+        ExpiresIn=expires,
+    )
+
+
+def content_hash(chunks):
+    """Hex SHA-256 digest of the content given as an iterable of byte chunks."""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def s3_object(file):
+    storage = file.storage
+    return storage.bucket.Object(storage._normalize_name(clean_name(file.name)))
+
+
+def file_metadata(file):
+    """
+    Size, last modification time and strong ETag of the stored file, read
+    with a single HEAD request on S3. Raises FileNotFoundError when the
+    file is missing from the storage.
+    """
+    storage = file.storage
+    if isinstance(storage, S3Storage):
+        obj = s3_object(file)
+        try:
+            obj.load()
+        except ClientError as e:
+            raise FileNotFoundError(file.name) from e
+        return FileMetadata(obj.content_length, obj.last_modified, obj.e_tag)
+
+    size = storage.size(file.name)
+    last_modified = storage.get_modified_time(file.name)
+    digest = hashlib.md5(
+        f"{file.name}:{size}:{last_modified.timestamp()}".encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    return FileMetadata(size, last_modified, f'"{digest}"')
+
+
+def read_chunks(file, start, end):
+    """
+    Yield the bytes of the stored file from start to end inclusive.
+    S3 objects are read with a ranged GET instead of being downloaded
+    to a temporary file first.
+    """
+    if isinstance(file.storage, S3Storage):
+        body = s3_object(file).get(Range=f"bytes={start}-{end}")["Body"]
+        try:
+            yield from body.iter_chunks(CHUNK_SIZE)
+        finally:
+            body.close()
+        return
+
+    with file.storage.open(file.name, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
@@ -0,0 +1,90 @@
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import caching, previews
+from .jobs import JobError, task
+from .junit import JUnitImportError, import_junit
+from .models import AttachmentBlob, PlanStats, TestPlan, TestStepAttachment
+
+# Number of test plans recounted per transaction by rebuild_plan_stats
+PLAN_STATS_BATCH_SIZE = 1000
+
+
+@task("generate_previews")
+def generate_previews(blob_id):
+    return {"generated": previews.generate_previews(blob_id)}
+
+
+@task("identify_blob")
+def identify_blob(blob_id):
+    """
+    Hash the content of a blob adopted from a direct upload, merging it into
+    the blob with the same content if there is one.
+    """
+    # The cached attachment lists show the file URLs, which change on a merge
+    case_ids = set(
+        TestStepAttachment.objects.filter(blob_id=blob_id).values_list(
+            "step__case_id", flat=True
+        )
+    )
+    blob = AttachmentBlob.identify(blob_id)
+    if blob is None:
+        return {"blob_id": None}
+
+    if blob.pk == blob_id:
+        previews.schedule_previews(blob)
+    else:
+        for case_id in case_ids:
+            caching.invalidate_case(case_id)
+    return {"blob_id": blob.pk}
+
+
+@task("rebuild_plan_stats")
+def rebuild_plan_stats(plan_ids=None):
+    queryset = TestPlan.objects.order_by("pk")
+    if plan_ids is not None:
+        queryset = queryset.filter(pk__in=plan_ids)
+    plan_ids = list(queryset.values_list("pk", flat=True))
+
+    rebuilt = 0
+    for start in range(0, len(plan_ids), PLAN_STATS_BATCH_SIZE):
+        with transaction.atomic():
+            rebuilt += PlanStats.rebuild(
+                plan_ids[start : start + PLAN_STATS_BATCH_SIZE]
+            )
+    return {"rebuilt": rebuilt}
+
+
+@task("delete_test_plan")
+def delete_test_plan(plan_id):
+    test_plan = TestPlan.objects.filter(pk=plan_id).first()
+    if test_plan is None:
+        return {"deleted": 0}
+    deleted, _ = test_plan.delete()
+    return {"deleted": deleted}
+
+
+# Not retried: the batches recorded before a failure are kept, and another
+# attempt would record them twice
+@task("import_junit", max_attempts=1)
+def import_junit_report(name, plan_id, tester_id, browser, os):
+    """
+    Import a JUnit XML report stored by the junit endpoint. The report is
+    deleted once imported or found invalid, and kept otherwise to look into
+    the failure.
+    """
+    tester = User.objects.filter(pk=tester_id).first()
+    if tester is None or not TestPlan.objects.filter(pk=plan_id).exists():
+        default_storage.delete(name)
+        raise JobError("The test plan or the tester no longer exists.")
+
+    try:
+        with default_storage.open(name, "rb") as source:
+            summary = import_junit(source, plan_id, tester, browser=browser, os=os)
+    except JUnitImportError as e:
+        default_storage.delete(name)
+        raise JobError(str(e))
+
+    default_storage.delete(name)
+    return summary
@@ -8,12 +8,19 @@ from .test_models import (
     TestResultModelTests,
     TestStepAttachmentModelTests,
     TestResultStepModelTests,
+    PlanStatsModelTests,
+    AttachmentBlobModelTests,
+    AttachmentPreviewTests,
 )
 
 from .test_apis import (
     TestPlanAPITests,
     TestCaseAPITests,
     TestResultAPITests,
+    SearchAPITests,
+    JobAPITests,
+    AsyncReadAPITests,
+    HealthAPITests,
 )
 
 from .test_filters import (
@@ -22,6 +29,27 @@ from .test_filters import (
     TestResultFilterTests,
 )
 
+from .test_commands import (
+    RebuildLatestResultsCommandTests,
+    RebuildPlanStatsCommandTests,
+    RebuildSearchIndexCommandTests,
+    ImportJUnitCommandTests,
+    PurgeAttachmentBlobsCommandTests,
+    GeneratePreviewsCommandTests,
+    RunWorkerCommandTests,
+    CacheStatsCommandTests,
+    BenchmarkReadsCommandTests,
+    LoadtestCommandTests,
+)
+
+from .test_indexes import (
+    ListQueryPlanTests,
+)
+
+from .test_jobs import (
+    JobQueueTests,
+)
+
 __all__ = [
     # Model tests
     "TestPlanModelTests",
@@ -30,12 +58,34 @@ __all__ = [
     "TestResultModelTests",
     "TestStepAttachmentModelTests",
     "TestResultStepModelTests",
+    "PlanStatsModelTests",
+    "AttachmentBlobModelTests",
+    "AttachmentPreviewTests",
     # API tests
     "TestPlanAPITests",
     "TestCaseAPITests",
     "TestResultAPITests",
+    "SearchAPITests",
+    "JobAPITests",
+    "AsyncReadAPITests",
+    "HealthAPITests",
     # Filter tests
     "TestPlanFilterTests",
     "TestCaseFilterTests",
     "TestResultFilterTests",
+    # Command tests
+    "RebuildLatestResultsCommandTests",
+    "RebuildPlanStatsCommandTests",
+    "RebuildSearchIndexCommandTests",
+    "ImportJUnitCommandTests",
+    "PurgeAttachmentBlobsCommandTests",
+    "GeneratePreviewsCommandTests",
+    "RunWorkerCommandTests",
+    "CacheStatsCommandTests",
+    "BenchmarkReadsCommandTests",
+    "LoadtestCommandTests",
+    # Index tests
+    "ListQueryPlanTests",
+    # Job queue tests
+    "JobQueueTests",
 ]
@@ -1,20 +1,45 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
 from django.contrib.auth.models import User
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
+import base64
+import hashlib
+import io
+import json
 import tempfile
+import warnings
+from unittest import mock
+
+from PIL import Image
 
 from ..models import (
     TestPlan,
+    PlanStats,
     TestCase as TestCaseModel,
     TestResult,
     TestStep,
     TestResultStep,
     TestStepAttachment,
     TestResultStepAttachment,
+    AttachmentBlob,
+    SearchDocument,
+    Job,
 )
+from .. import caching, health
+from ..asynchronous import sync_urlpatterns
+from ..jobs import run_pending
+from ..uploads import UPLOAD_TOKEN_SALT
+from ..urls import urlpatterns as testplan_urls
+from ..views import TestPlanViewSet
 
 
 class TestPlanAPITests(APITestCase):
@@ -41,6 +66,31 @@ class TestPlanAPITests(APITestCase):
         self.assertEqual(len(response.data["results"]), 1)
         self.assertEqual(response.data["results"][0]["title"], "API Test Plan")
 
+    def test_list_test_plans_with_progress(self):
+        """Test listing test plans includes their progress without extra queries"""
+        self.authenticate()
+        for i in range(5):
+            plan = TestPlan.objects.create(title=f"Plan {i}")
+            TestCaseModel.objects.create(plan=plan, title="Case", status="ready")
+
+        # Authentication, the validators along with the count and the page
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/v1/testplans/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["results"][0]["progress"],
+            {
+                "total": 1,
+                "status": {"design": 0, "ready": 1, "closed": 0},
+                "latest_result": {
+                    "pass": 0,
+                    "fail": 0,
+                    "in_progress": 0,
+                    "untested": 1,
+                },
+            },
+        )
+
     def test_retrieve_test_plan(self):
         """Test retrieving a specific test plan"""
         self.authenticate()
@@ -57,6 +107,215 @@ class TestPlanAPITests(APITestCase):
         self.assertEqual(response.data["title"], "New Test Plan")
         self.assertTrue(TestPlan.objects.filter(title="New Test Plan").exists())
 
+    def test_list_test_plans_cursor_pagination(self):
+        """Test paging through test plans with cursor pagination"""
+        self.authenticate()
+        for i in range(24):
+            TestPlan.objects.create(title=f"Plan {i}")
+        # Identical timestamps must be ordered by id without skipping rows
+        TestPlan.objects.filter(title__startswith="Plan").update(
+            created_at=self.test_plan.created_at
+        )
+        expected_ids = list(
+            TestPlan.objects.order_by("-created_at", "-id").values_list("id", flat=True)
+        )
+
+        seen_ids = []
+        url = "/api/v1/testplans/?pagination=cursor"
+        while url:
+            # Authentication, the page itself and the validators of its rows,
+            # without counting the whole list
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(len(queries), 3)
+            self.assertFalse(
+                any("COUNT(" in query["sql"].upper() for query in queries),
+                queries.captured_queries,
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            seen_ids += [plan["id"] for plan in response.data["results"]]
+            url = response.data["next"]
+
+        self.assertEqual(seen_ids, expected_ids)
+
+        # Walking back from the last page returns the previous page
+        response = self.client.get(response.data["previous"])
+        self.assertEqual(
+            [plan["id"] for plan in response.data["results"]], expected_ids[10:20]
+        )
+
+    def test_list_test_plans_invalid_cursor(self):
+        """Test an invalid cursor returns 404"""
+        self.authenticate()
+        response = self.client.get("/api/v1/testplans/", {"cursor": "invalid"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Well-formed but impossible date
+        cursor = base64.urlsafe_b64encode(
+            json.dumps({"v": "2020-13-45T00:00:00", "i": 1}).encode()
+        ).decode()
+        response = self.client.get("/api/v1/testplans/", {"cursor": cursor})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_test_plan_summary(self):
+        """Test the test plan summary counts the latest result of each test case"""
+        self.authenticate()
+        passed = TestCaseModel.objects.create(plan=self.test_plan, title="Passed")
+        failed = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Failed", status="ready"
+        )
+        TestCaseModel.objects.create(plan=self.test_plan, title="Untested")
+        TestResult.objects.create(
+            case=passed, result="fail", browser="firefox", os="linux", tester=self.user
+        )
+        TestResult.objects.create(
+            case=passed, result="pass", browser="chrome", os="macos", tester=self.user
+        )
+        TestResult.objects.create(
+            case=failed, result="fail", browser="chrome", os="macos", tester=self.user
+        )
+        other_plan = TestPlan.objects.create(title="Other Plan")
+        TestCaseModel.objects.create(plan=other_plan, title="Other Case")
+
+        # Authentication, the test plan and the aggregate
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                f"/api/v1/testplans/{self.test_plan.id}/summary/"
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"], 3)
+        self.assertEqual(
+            response.data["status"], {"design": 2, "ready": 1, "closed": 0}
+        )
+        self.assertEqual(
+            response.data["latest_result"],
+            {"pass": 1, "fail": 1, "in_progress": 0, "untested": 1},
+        )
+        self.assertEqual(
+            response.data["environments"],
+            [{"browser": "chrome", "os": "macos", "count": 2}],
+        )
+        self.assertEqual(response.data["pass_rate"], 0.5)
+
+    def test_test_plan_summary_without_results(self):
+        """Test the pass rate is null when no test case has been executed"""
+        self.authenticate()
+        response = self.client.get(f"/api/v1/testplans/{self.test_plan.id}/summary/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total"], 0)
+        self.assertEqual(response.data["environments"], [])
+        self.assertIsNone(response.data["pass_rate"])
+
+        response = self.client.get("/api/v1/testplans/999999/summary/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_test_plans_not_modified(self):
+        """Test polling an unchanged test plan list answers 304 from the validators"""
+        self.authenticate()
+        response = self.client.get("/api/v1/testplans/")
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertEqual(response["Cache-Control"], "private, no-cache")
+        self.assertFalse(response.has_header("Last-Modified"))
+
+        # Authentication and the validators, nothing is serialized
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/v1/testplans/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        # Another page or filter is another representation
+        response = self.client.get(
+            "/api/v1/testplans/?status=not_started", HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Progress changes do not move the updated_at of the plan
+        TestCaseModel.objects.create(plan=self.test_plan, title="Test Case")
+        response = self.client.get("/api/v1/testplans/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["progress"]["total"], 1)
+
+        # Neither does deleting another plan, which changes the count
+        etag = response["ETag"]
+        other_plan = TestPlan.objects.create(title="Other Plan")
+        response = self.client.get("/api/v1/testplans/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        other_plan.delete()
+        response = self.client.get("/api/v1/testplans/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_test_plans_cursor_pagination_not_modified(self):
+        """Test polling an unchanged keyset page answers 304 from its own rows"""
+        self.authenticate()
+        for i in range(12):
+            TestPlan.objects.create(title=f"Plan {i}")
+        url = "/api/v1/testplans/?pagination=cursor"
+        response = self.client.get(url)
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        # Changes beyond the page leave it valid
+        TestPlan.objects.order_by("created_at", "id").first().delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Deleting a row of the page brings in another one
+        TestPlan.objects.order_by("-created_at", "-id")[2].delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_retrieve_test_plan_not_modified(self):
+        """Test conditional retrieves with ETag and Last-Modified"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/"
+        response = self.client.get(url)
+        etag = response["ETag"]
+        last_modified = response["Last-Modified"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.patch(url, {"title": "Renamed"})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["title"], "Renamed")
+
+        response = self.client.get("/api/v1/testplans/0/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_test_plan_in_background(self):
+        """Test deleting a test plan in the background queues a job doing it"""
+        self.authenticate()
+        TestCaseModel.objects.create(plan=self.test_plan, title="Test Case")
+
+        response = self.client.delete(
+            f"/api/v1/testplans/{self.test_plan.id}/?background=true"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["kind"], "delete_test_plan")
+        self.assertEqual(response.data["status"], "queued")
+        self.assertTrue(response["Location"].endswith(f"/jobs/{response.data['id']}/"))
+        self.assertTrue(TestPlan.objects.filter(pk=self.test_plan.id).exists())
+
+        run_pending()
+
+        job = Job.objects.get(pk=response.data["id"])
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual(job.created_by, self.user)
+        self.assertFalse(TestPlan.objects.filter(pk=self.test_plan.id).exists())
+        self.assertFalse(TestCaseModel.objects.exists())
+
     def test_unauthorized_access(self):
         """Test unauthorized access to test plans"""
         response = self.client.get("/api/v1/testplans/")
@@ -116,6 +375,112 @@ class TestCaseAPITests(APITestCase):
         self.assertEqual(len(response.data["results"]), 1)
         self.assertEqual(response.data["results"][0]["plan"], self.test_plan.id)
 
+    def test_search_test_cases(self):
+        """Test searching test cases returns ranked matches"""
+        self.authenticate()
+        TestCaseModel.objects.create(
+            plan=self.test_plan,
+            title="Checkout",
+            description="Covers API error handling",
+        )
+        TestCaseModel.objects.create(plan=self.test_plan, title="Unrelated Case")
+
+        response = self.client.get(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/", {"search": "api"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        # The title match ranks above the description match
+        self.assertEqual(
+            [case["title"] for case in response.data["results"]],
+            ["API Test Case", "Checkout"],
+        )
+
+        # Ranked searches keep page numbers instead of a keyset on created_at
+        response = self.client.get(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/",
+            {"search": "api", "pagination": "cursor"},
+        )
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            [case["title"] for case in response.data["results"]],
+            ["API Test Case", "Checkout"],
+        )
+
+    def assert_list_query_budget(self, page_size):
+        """Helper method to list a full page of test cases within a fixed budget"""
+        for i in range(page_size):
+            test_case = TestCaseModel.objects.create(
+                plan=self.test_plan, title=f"Budget Case {i}"
+            )
+            TestResult.objects.create(
+                case=test_case,
+                result="pass",
+                browser="chrome",
+                os="windows10",
+                tester=self.user,
+            )
+
+        # Authentication, the validators along with the count and the page itself
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                f"/api/v1/testplans/{self.test_plan.id}/testcases/",
+                {"page_size": page_size},
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), page_size)
+        self.assertEqual(response.data["results"][0]["latest_result"], "pass")
+        self.assertIsNotNone(response.data["results"][0]["executed_at"])
+
+    def test_list_test_cases_query_budget_page_size_10(self):
+        """Test listing 10 test cases costs a constant number of queries"""
+        self.authenticate()
+        self.assert_list_query_budget(10)
+
+    def test_list_test_cases_query_budget_page_size_100(self):
+        """Test listing 100 test cases costs the same number of queries"""
+        self.authenticate()
+        self.assert_list_query_budget(100)
+
+    def test_list_test_cases_not_modified_until_results_change(self):
+        """Test recording or deleting a latest result changes the test case list"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/"
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        first = TestResult.objects.create(
+            case=self.test_case,
+            result="pass",
+            browser="chrome",
+            os="windows10",
+            tester=self.user,
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["latest_result"], "pass")
+
+        # Deleting a newer result with the same outcome only changes the execution time
+        second = TestResult.objects.create(
+            case=self.test_case,
+            result="pass",
+            browser="chrome",
+            os="windows10",
+            tester=self.user,
+        )
+        etag = self.client.get(url)["ETag"]
+        second.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.test_case.refresh_from_db()
+        self.assertEqual(self.test_case.last_result, first)
+
+        detail_url = f"{url}{self.test_case.id}/"
+        etag = self.client.get(detail_url)["ETag"]
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
 
 class TestResultAPITests(APITestCase):
     def setUp(self):
@@ -151,6 +516,58 @@ class TestResultAPITests(APITestCase):
         self.assertEqual(len(response.data["results"]), 1)
         self.assertEqual(response.data["results"][0]["result"], "pass")
 
+    def test_list_test_results_not_modified(self):
+        """Test test result lists change with the title of their test case"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testresults/"
+        etag = self.client.get(url)["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.test_case.title = "Renamed Case"
+        self.test_case.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["case_title"], "Renamed Case")
+
+        detail_url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/testresults/{self.test_result.id}/"
+        etag = self.client.get(detail_url)["ETag"]
+        response = self.client.get(detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(detail_url, HTTP_IF_MATCH='"other"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+
+    def test_list_test_results_cursor_pagination(self):
+        """Test paging through a plan's test results ordered by execution time"""
+        self.authenticate()
+        for _ in range(4):
+            TestResult.objects.create(
+                case=self.test_case,
+                result="fail",
+                browser="firefox",
+                os="macos",
+                tester=self.user,
+            )
+        expected_ids = list(
+            TestResult.objects.order_by("-executed_at", "-id").values_list(
+                "id", flat=True
+            )
+        )
+
+        response = self.client.get(
+            f"/api/v1/testplans/{self.test_plan.id}/testresults/",
+            {"pagination": "cursor", "page_size": 3},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["previous"])
+        first_page = [result["id"] for result in response.data["results"]]
+
+        response = self.client.get(response.data["next"])
+        second_page = [result["id"] for result in response.data["results"]]
+
+        self.assertEqual(first_page + second_page, expected_ids)
+        self.assertIsNone(response.data["next"])
+
     def test_create_test_result(self):
         """Test creating a new test result"""
         self.authenticate()
@@ -169,6 +586,239 @@ class TestResultAPITests(APITestCase):
         self.assertEqual(response.data["result"], "fail")
         self.assertEqual(response.data["tester"], self.user.id)
 
+    def test_bulk_create_test_results(self):
+        """Test recording many test results with their steps at once"""
+        self.authenticate()
+        test_step = TestStep.objects.create(case=self.test_case, order=1)
+        other_case = TestCaseModel.objects.create(plan=self.test_plan, title="Other")
+        other_plan_case = TestCaseModel.objects.create(
+            plan=TestPlan.objects.create(title="Other Plan"), title="Elsewhere"
+        )
+
+        response = self.client.post(
+            f"/api/v1/testplans/{self.test_plan.id}/testresults/bulk/",
+            [
+                {
+                    "case": self.test_case.id,
+                    "result": "fail",
+                    "browser": "firefox",
+                    "os": "linux",
+                    "steps": [
+                        {
+                            "step": test_step.id,
+                            "order": 1,
+                            "status": "fail",
+                            "comment": "Timeout waiting for login",
+                        }
+                    ],
+                },
+                {"case": other_case.id, "result": "pass"},
+                {"case": other_plan_case.id, "result": "pass"},
+                {"case": other_case.id, "result": "unknown"},
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(response.data["failed"], 2)
+        statuses = response.data["results"]
+        self.assertEqual(
+            [item["status"] for item in statuses],
+            ["created", "created", "error", "error"],
+        )
+        self.assertIn("case", statuses[2]["errors"])
+        self.assertIn("result", statuses[3]["errors"])
+
+        test_result = TestResult.objects.get(pk=statuses[0]["id"])
+        self.assertEqual(test_result.tester, self.user)
+        self.assertEqual(
+            test_result.result_steps.get().comment, "Timeout waiting for login"
+        )
+
+        # Latest results, plan statistics and search documents follow the bulk writes
+        self.test_case.refresh_from_db()
+        self.assertEqual(self.test_case.latest_result, "fail")
+        stats = PlanStats.objects.get(plan=self.test_plan)
+        self.assertEqual((stats.result_fail, stats.result_pass), (1, 1))
+        self.assertTrue(
+            SearchDocument.objects.filter(
+                kind="result_step", case=self.test_case, body__contains="Timeout"
+            ).exists()
+        )
+
+    def test_bulk_create_test_results_query_count(self):
+        """Test recording test results in bulk costs the same statements for any batch size"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testresults/bulk/"
+
+        def record_results(count):
+            items = [
+                {
+                    "case": self.test_case.id,
+                    "result": "pass",
+                    "steps": [{"order": 1}, {"order": 2}],
+                }
+                for _ in range(count)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(url, items, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        self.assertEqual(record_results(5), record_results(50))
+
+    def test_bulk_create_test_results_invalid_request(self):
+        """Test a payload that is not an array or has no valid item returns 400"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testresults/bulk/"
+
+        response = self.client.post(url, {"case": self.test_case.id}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(url, [{"case": 999999}], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["failed"], 1)
+
+    def test_export_test_results_csv(self):
+        """Test exporting the test results of a test plan as streamed CSV"""
+        self.authenticate()
+        TestResult.objects.create(
+            case=self.test_case, result="fail", os="linux", tester=self.user
+        )
+        other_case = TestCaseModel.objects.create(
+            plan=TestPlan.objects.create(title="Other Plan"), title="Other Case"
+        )
+        TestResult.objects.create(case=other_case, result="pass", tester=self.user)
+
+        response = self.client.get(
+            f"/api/v1/testplans/{self.test_plan.id}/testresults/export/",
+            {"format": "csv"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            lines[0],
+            "id,case,case_title,result,browser,os,tester,executed_at,updated_at",
+        )
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].startswith(f"{self.test_result.id},"))
+        self.assertIn(",Test Case,fail,chrome,linux,testuser,", lines[2])
+
+    def test_export_test_results_ndjson_with_filters(self):
+        """Test exporting filtered test results as streamed NDJSON"""
+        self.authenticate()
+        TestResult.objects.create(case=self.test_case, result="fail", tester=self.user)
+
+        response = self.client.get(
+            f"/api/v1/testplans/{self.test_plan.id}/testresults/export/",
+            {"format": "ndjson", "result": "fail"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["result"], "fail")
+        self.assertEqual(rows[0]["case_title"], "Test Case")
+        self.assertEqual(rows[0]["tester"], "testuser")
+
+    def test_import_junit_report(self):
+        """Test uploading a JUnit XML report records matched test results"""
+        self.authenticate()
+        report = SimpleUploadedFile(
+            "report.xml",
+            b"""<testsuite xmlns="urn:example">
+                <testcase classname="suite" name="Test Case">
+                    <error message="Crashed"/>
+                </testcase>
+                <testcase classname="suite" name="Other test"/>
+            </testsuite>""",
+            content_type="application/xml",
+        )
+
+        response = self.client.post(
+            f"/api/v1/testplans/{self.test_plan.id}/testresults/junit/",
+            {"file": report, "os": "linux"},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["unmatched_names"], ["Other test"])
+        self.test_case.refresh_from_db()
+        self.assertEqual(self.test_case.latest_result, "fail")
+        self.assertEqual(self.test_case.last_result.os, "linux")
+
+    def test_import_junit_report_invalid_xml(self):
+        """Test uploading a malformed report returns 400"""
+        self.authenticate()
+        report = SimpleUploadedFile(
+            "report.xml", b'<testsuite><testcase name="Test Case"/><testcase'
+        )
+        results = self.test_case.test_results.count()
+
+        response = self.client.post(
+            f"/api/v1/testplans/{self.test_plan.id}/testresults/junit/",
+            {"file": report},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Invalid JUnit XML report", response.data["error"])
+        self.assertIn("no test results were recorded", response.data["error"])
+        # Nothing is recorded, so the report can be sent again
+        self.assertEqual(response.data["summary"]["total"], 1)
+        self.assertEqual(response.data["summary"]["created"], 0)
+        self.assertEqual(self.test_case.test_results.count(), results)
+
+    @override_settings(
+        STORAGES={
+            "default": {
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+            },
+        },
+        MEDIA_ROOT=tempfile.mkdtemp(),
+    )
+    def test_import_junit_report_in_background(self):
+        """Test a report imported in the background is stored until a job imports it"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testresults/junit/?background=1"
+        report = SimpleUploadedFile(
+            "report.xml", b'<testsuite><testcase name="Test Case"/></testsuite>'
+        )
+        broken = SimpleUploadedFile("broken.xml", b"<testsuite><testcase")
+
+        response = self.client.post(url, {"file": report}, format="multipart")
+        broken_response = self.client.post(url, {"file": broken}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(broken_response.status_code, status.HTTP_202_ACCEPTED)
+        name = response.data["payload"]["name"]
+        self.assertTrue(default_storage.exists(name))
+
+        with self.assertLogs("testplan.jobs", "WARNING"):
+            self.assertEqual(run_pending(), 2)
+
+        job = Job.objects.get(pk=response.data["id"])
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual(job.result["created"], 1)
+        self.assertFalse(default_storage.exists(name))
+        self.assertEqual(self.test_case.test_results.count(), 2)
+
+        # Invalid reports fail without retries
+        job = Job.objects.get(pk=broken_response.data["id"])
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.max_attempts, 1)
+        self.assertIn("Invalid JUnit XML report", job.error)
+
 
 class TestStepAPITests(APITestCase):
     def setUp(self):
@@ -290,6 +940,152 @@ class TestStepAPITests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_test_steps_keeps_ids_and_history(self):
+        """Test saving test steps updates matching steps in place"""
+        self.authenticate()
+        test_result = TestResult.objects.create(
+            case=self.test_case, result="pass", tester=self.user
+        )
+        result_step = TestResultStep.objects.create(
+            result=test_result, step=self.test_step_1, order=1
+        )
+
+        response = self.client.post(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststeps/",
+            [
+                {"order": 1, "action": "First action", "expected_result": "Changed"},
+                {"order": 2, "action": "New second action"},
+                {"order": 3, "action": "Third action"},
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data[0]["id"], self.test_step_1.id)
+        self.assertEqual(response.data[1]["id"], self.test_step_2.id)
+        self.test_step_1.refresh_from_db()
+        self.assertEqual(self.test_step_1.expected_result, "Changed")
+        self.test_step_2.refresh_from_db()
+        self.assertEqual(self.test_step_2.action, "New second action")
+
+        # The execution history still points at the step
+        result_step.refresh_from_db()
+        self.assertEqual(result_step.step_id, self.test_step_1.id)
+
+    def test_create_test_steps_reorders_by_id(self):
+        """Test test steps sent with their id can swap orders and drop others"""
+        self.authenticate()
+        TestStep.objects.create(case=self.test_case, order=3, action="Third action")
+
+        response = self.client.post(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststeps/",
+            [
+                {"id": self.test_step_2.id, "order": 1, "action": "Second action"},
+                {"id": self.test_step_1.id, "order": 2, "action": "First action"},
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            list(
+                TestStep.objects.filter(case=self.test_case).values_list("id", "order")
+            ),
+            [(self.test_step_2.id, 1), (self.test_step_1.id, 2)],
+        )
+
+    def test_create_test_steps_query_count(self):
+        """Test saving test steps costs the same statements for any number of steps"""
+        self.authenticate()
+
+        def save_steps(count):
+            # Two existing steps to update and the rest to create
+            test_case = TestCaseModel.objects.create(plan=self.test_plan, title="Case")
+            TestStep.objects.create(case=test_case, order=1, action="Old")
+            TestStep.objects.create(case=test_case, order=2, action="Old")
+            url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{test_case.id}/teststeps/"
+            steps = [{"order": i, "action": f"Action {i}"} for i in range(1, count + 1)]
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(url, steps, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        self.assertEqual(save_steps(3), save_steps(30))
+
+    def test_create_test_steps_invalid_items_leave_steps_untouched(self):
+        """Test errors are reported per item and nothing is saved"""
+        self.authenticate()
+
+        response = self.client.post(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststeps/",
+            [
+                {"order": 1, "action": "Changed action"},
+                {"order": 1, "action": "Duplicate order"},
+                {"id": 999999, "order": 3},
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("order", response.data[1])
+        self.assertIn("id", response.data[2])
+        self.test_step_1.refresh_from_db()
+        self.assertEqual(self.test_step_1.action, "First action")
+
+    def test_list_test_steps_served_from_cache(self):
+        """Test that repeated step lists are served from the cache without querying the steps"""
+        self.authenticate()
+        caching.reset_stats()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststeps/"
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Cache"], "MISS")
+
+        # The user lookup of the authentication only
+        with self.assertNumQueries(1):
+            cached = self.client.get(url)
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertEqual(cached.json(), response.json())
+        self.assertEqual(caching.stats(), {"hits": 1, "misses": 1, "hit_rate": 0.5})
+
+    def test_replace_test_steps_invalidates_cached_list(self):
+        """Test that replacing the steps moves the test case to a new cache version"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststeps/"
+        self.client.get(url)
+
+        response = self.client.post(
+            url, [{"order": 1, "action": "Only action"}], format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual([step["action"] for step in response.data], ["Only action"])
+
+        # Steps changed outside the API invalidate the list as well
+        TestStep.objects.create(case=self.test_case, order=2, action="Admin action")
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.data), 2)
+
+    def test_cached_list_follows_shared_version(self):
+        """Test that a version bumped by another app server drops the cached list"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststeps/"
+        self.client.get(url)
+
+        # Another server replaced the steps and bumped the shared version key
+        TestStep.objects.filter(pk=self.test_step_1.pk).update(action="Elsewhere")
+        caching.bump_version(self.test_case.id)
+
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data[0]["action"], "Elsewhere")
+
 
 class TestResultStepAPITests(APITestCase):
     def setUp(self):
@@ -442,6 +1238,65 @@ class TestResultStepAPITests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_test_result_steps_query_count(self):
+        """Test recording test result steps costs the same statements for any number of steps"""
+        self.authenticate()
+        test_step = TestStep.objects.create(case=self.test_case, order=1)
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/testresults/{self.test_result.id}/testresultsteps/"
+
+        def record_steps(count):
+            steps = [
+                {
+                    "step": test_step.id,
+                    "order": i,
+                    "status": "fail",
+                    "comment": "Broken",
+                }
+                for i in range(1, count + 1)
+            ]
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(url, steps, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(response.data), count)
+            return len(context.captured_queries)
+
+        self.assertEqual(record_steps(5), record_steps(50))
+        self.assertEqual(
+            TestResultStep.objects.filter(result=self.test_result).count(), 50
+        )
+
+    def test_create_test_result_steps_errors_per_index(self):
+        """Test invalid items are reported at their index and nothing is replaced"""
+        self.authenticate()
+
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/testresults/{self.test_result.id}/testresultsteps/"
+
+        response = self.client.post(
+            url,
+            [{"order": 1, "status": "pass"}, {"order": 2, "status": "unknown"}],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("status", response.data[1])
+
+        response = self.client.post(
+            url,
+            [
+                {"order": 1, "step": 999999},
+                {"order": 2},
+                {"order": 2},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("step", response.data[0])
+        self.assertEqual(response.data[1], {})
+        self.assertIn("order", response.data[2])
+        self.assertEqual(
+            TestResultStep.objects.filter(result=self.test_result).count(), 2
+        )
+
 
 @override_settings(
     STORAGES={
@@ -485,6 +1340,33 @@ class TestStepAttachmentAPITests(APITestCase):
         """Helper method to authenticate requests"""
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
 
+    def test_list_test_step_attachments_with_previews(self):
+        """Test that image attachments list the URLs of their generated previews"""
+        self.authenticate()
+        image = io.BytesIO()
+        Image.new("RGB", (800, 600)).save(image, format="PNG")
+        TestStepAttachment.objects.create(
+            step=self.test_step_1, file=SimpleUploadedFile("log.txt", b"log")
+        )
+        TestStepAttachment.objects.create(
+            step=self.test_step_2,
+            file=SimpleUploadedFile("screenshot.png", image.getvalue()),
+        )
+        run_pending()
+
+        # The user lookup of the authentication and one query for the attachments
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/"
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        text, screenshot = sorted(response.data, key=lambda a: a["filename"])
+        self.assertIsNone(text["thumbnail"])
+        self.assertIsNone(text["preview"])
+        self.assertTrue(screenshot["thumbnail"].endswith("/thumbnail.webp"))
+        self.assertTrue(screenshot["preview"].endswith("/preview.webp"))
+
     def test_list_test_step_attachments_filtered_by_test_case(self):
         """Test that test step attachments are filtered by test case as defined in get_queryset"""
         self.authenticate()
@@ -551,30 +1433,301 @@ class TestStepAttachmentAPITests(APITestCase):
         ).count()
         self.assertEqual(final_count, 2)
 
-    def test_create_test_step_attachments_no_data_returns_400(self):
-        """Test that providing no attachment data returns 400"""
+    def test_replace_test_step_attachments_reuses_stored_content(self):
+        """Test that re-sending known files on replace does not store them again"""
         self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/"
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                url,
+                {"0_step": "1", "0_file": SimpleUploadedFile("shot.txt", b"log lines")},
+                format="multipart",
+            )
+        blob = AttachmentBlob.objects.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                url,
+                {
+                    "0_step": "1",
+                    "0_file": SimpleUploadedFile("shot.txt", b"log lines"),
+                    "1_step": "2",
+                    "1_file": SimpleUploadedFile("renamed.txt", b"log lines"),
+                },
+                format="multipart",
+            )
 
-        response = self.client.post(
-            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/",
-            {},
-            format="multipart",
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [attachment["filename"] for attachment in response.data],
+            ["shot.txt", "renamed.txt"],
         )
+        self.assertEqual(AttachmentBlob.objects.get().pk, blob.pk)
+        self.assertEqual(AttachmentBlob.objects.get().ref_count, 2)
+        self.assertTrue(default_storage.exists(blob.file.name))
 
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn("error", response.data)
+        # Downloads keep the name the file was attached with
+        download = self.client.get(f"{url}{response.data[1]['id']}/download/")
+        self.assertEqual(
+            download["Content-Disposition"], 'inline; filename="renamed.txt"'
+        )
 
-    def test_create_test_step_attachments_invalid_step_returns_400(self):
-        """Test that referencing non-existent step returns 400"""
+    def test_replace_test_step_attachments_keeps_referenced_attachments(self):
+        """Test that attachments referenced by id are kept without re-uploading"""
         self.authenticate()
-
-        file1 = SimpleUploadedFile(
-            "new_file.txt", b"new content", content_type="text/plain"
+        kept = TestStepAttachment.objects.create(
+            step=self.test_step_1, file=SimpleUploadedFile("kept.png", b"kept")
+        )
+        dropped = TestStepAttachment.objects.create(
+            step=self.test_step_2, file=SimpleUploadedFile("dropped.png", b"dropped")
         )
 
-        # Use a step order that doesn't exist
-        data = {
-            "0_step": "999",
+        response = self.client.post(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/",
+            {
+                "0_step": "2",
+                "0_attachment": str(kept.id),
+                "1_step": "1",
+                "1_file": SimpleUploadedFile("new.png", b"new"),
+            },
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data[0]["id"], kept.id)
+        self.assertEqual(response.data[0]["step"], self.test_step_2.id)
+        self.assertEqual(response.data[1]["filename"], "new.png")
+        kept.refresh_from_db()
+        self.assertEqual(kept.step, self.test_step_2)
+        self.assertFalse(TestStepAttachment.objects.filter(pk=dropped.pk).exists())
+        self.assertEqual(TestStepAttachment.objects.count(), 2)
+
+    def test_replace_test_step_attachments_invalid_reference_changes_nothing(self):
+        """Test that a bad reference is rejected before any attachment is deleted"""
+        self.authenticate()
+        existing = TestStepAttachment.objects.create(
+            step=self.test_step_1, file=SimpleUploadedFile("kept.png", b"kept")
+        )
+        other_case = TestCaseModel.objects.create(plan=self.test_plan, title="Other")
+        other_step = TestStep.objects.create(case=other_case, order=1)
+        foreign = TestStepAttachment.objects.create(
+            step=other_step, file=SimpleUploadedFile("other.png", b"other")
+        )
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/"
+
+        response = self.client.post(
+            url,
+            {
+                "0_step": "1",
+                "0_file": SimpleUploadedFile("new.png", b"new"),
+                "1_step": "1",
+                "1_attachment": str(foreign.id),
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(f"attachment {foreign.id} not found", response.data["error"])
+
+        response = self.client.post(
+            url,
+            {
+                "0_step": "1",
+                "0_attachment": str(existing.id),
+                "1_step": "2",
+                "1_attachment": str(existing.id),
+            },
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("more than once", response.data["error"])
+
+        self.assertEqual(
+            list(
+                TestStepAttachment.objects.order_by("pk").values_list("pk", flat=True)
+            ),
+            [existing.id, foreign.id],
+        )
+
+    def test_replace_test_step_attachments_non_integer_values_return_400(self):
+        """Test that a step or attachment that is not an integer is rejected"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/"
+
+        response = self.client.post(
+            url, {"0_step": "1", "0_attachment": "abc"}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("0_attachment", response.data)
+
+        response = self.client.post(
+            url,
+            {"0_step": "first", "0_file": SimpleUploadedFile("new.png", b"new")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("0_step", response.data)
+
+    def test_add_single_test_step_attachment(self):
+        """Test adding one attachment while keeping the existing ones"""
+        self.authenticate()
+        existing = TestStepAttachment.objects.create(
+            step=self.test_step_1, file=SimpleUploadedFile("first.png", b"first")
+        )
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/add/"
+
+        response = self.client.post(
+            url,
+            {"step": "2", "file": SimpleUploadedFile("second.png", b"second")},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["step"], self.test_step_2.id)
+        self.assertEqual(response.data["filename"], "second.png")
+        self.assertTrue(TestStepAttachment.objects.filter(pk=existing.pk).exists())
+        self.assertEqual(TestStepAttachment.objects.count(), 2)
+
+        response = self.client.post(
+            url,
+            {"step": "9", "file": SimpleUploadedFile("third.png", b"third")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(
+            url,
+            {"step": "1", "file": SimpleUploadedFile("virus.exe", b"MZ")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(url, {"step": "1"}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("file", response.data)
+
+    def test_delete_single_test_step_attachment(self):
+        """Test deleting one attachment by id releases its stored file"""
+        self.authenticate()
+        deleted = TestStepAttachment.objects.create(
+            step=self.test_step_1, file=SimpleUploadedFile("gone.png", b"gone")
+        )
+        kept = TestStepAttachment.objects.create(
+            step=self.test_step_2, file=SimpleUploadedFile("kept.png", b"kept")
+        )
+        base = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments"
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f"{base}/{deleted.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(TestStepAttachment.objects.all()), [kept])
+        self.assertFalse(AttachmentBlob.objects.filter(pk=deleted.blob_id).exists())
+        self.assertFalse(default_storage.exists(deleted.file.name))
+
+        # Attachments of another test case are not reachable
+        other_case = TestCaseModel.objects.create(plan=self.test_plan, title="Other")
+        response = self.client.delete(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{other_case.id}/teststepattachments/{kept.id}/"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_confirm_direct_upload_of_known_content(self):
+        """Test that a direct upload of known content is merged into the stored blob in the background"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/uploads/confirm/"
+        existing = TestStepAttachment.objects.create(
+            step=self.test_step_1, file=SimpleUploadedFile("shot.png", b"pixels")
+        )
+        name = default_storage.save(
+            "attachments/89abcdef/again.png", ContentFile(b"pixels")
+        )
+        token = signing.dumps(
+            {"name": name, "case": self.test_case.id, "step": self.test_step_2.id},
+            salt=UPLOAD_TOKEN_SALT,
+        )
+
+        # The content is not read on the request path
+        with mock.patch("testplan.models.content_hash") as content_hash:
+            response = self.client.post(url, {"tokens": [token]}, format="json")
+        content_hash.assert_not_called()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data[0]["filename"], "again.png")
+        attachment = TestStepAttachment.objects.get(pk=response.data[0]["id"])
+        self.assertEqual(attachment.file.name, name)
+        self.assertIsNone(attachment.blob.sha256)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending()
+
+        attachment.refresh_from_db()
+        self.assertEqual(attachment.blob, existing.blob)
+        self.assertEqual(attachment.file.name, existing.file.name)
+        self.assertEqual(attachment.blob.ref_count, 2)
+        self.assertEqual(AttachmentBlob.objects.count(), 1)
+        self.assertFalse(default_storage.exists(name))
+
+        # Confirming again finds the attachment, although its upload is gone
+        response = self.client.post(url, {"tokens": [token]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([a["id"] for a in response.data], [attachment.id])
+        self.assertEqual(TestStepAttachment.objects.count(), 2)
+
+    def test_confirm_direct_upload_of_new_content(self):
+        """Test that a direct upload of new content keeps its file as the blob file once hashed"""
+        self.authenticate()
+        image = io.BytesIO()
+        Image.new("RGB", (8, 8), "red").save(image, format="PNG")
+        name = default_storage.save(
+            "attachments/fedcba98/new.png", ContentFile(image.getvalue())
+        )
+        token = signing.dumps(
+            {"name": name, "case": self.test_case.id, "step": self.test_step_1.id},
+            salt=UPLOAD_TOKEN_SALT,
+        )
+
+        response = self.client.post(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/uploads/confirm/",
+            {"tokens": [token]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        run_pending()
+
+        blob = TestStepAttachment.objects.get(pk=response.data[0]["id"]).blob
+        self.assertEqual(blob.sha256, hashlib.sha256(image.getvalue()).hexdigest())
+        self.assertEqual(blob.file.name, name)
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(default_storage.exists(name))
+        # The previews of the image are generated once its content is known
+        self.assertTrue(blob.thumbnail)
+
+    def test_create_test_step_attachments_no_data_returns_400(self):
+        """Test that providing no attachment data returns 400"""
+        self.authenticate()
+
+        response = self.client.post(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/",
+            {},
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.data)
+
+    def test_create_test_step_attachments_invalid_step_returns_400(self):
+        """Test that referencing non-existent step returns 400"""
+        self.authenticate()
+
+        file1 = SimpleUploadedFile(
+            "new_file.txt", b"new content", content_type="text/plain"
+        )
+
+        # Use a step order that doesn't exist
+        data = {
+            "0_step": "999",
             "0_file": file1,
         }
 
@@ -628,6 +1781,303 @@ class TestStepAttachmentAPITests(APITestCase):
         self.assertEqual(response["Content-Type"], "application/octet-stream")
         self.assertIn("Content-Disposition", response.headers)
 
+    def test_download_attachment_escapes_filename(self):
+        """Test that quotes and non-ASCII file names are escaped on every response"""
+        self.authenticate()
+        attachment = TestStepAttachment.objects.create(
+            step=self.test_step_1,
+            file=SimpleUploadedFile('résumé "final".txt', b"0123456789"),
+        )
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/{attachment.id}/download/"
+
+        response = self.client.get(url)
+        self.assertEqual(
+            response["Content-Disposition"],
+            "inline; filename*=utf-8''r%C3%A9sum%C3%A9%20%22final%22.txt",
+        )
+        response = self.client.get(url, HTTP_RANGE="bytes=2-5")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(
+            response["Content-Disposition"],
+            "inline; filename*=utf-8''r%C3%A9sum%C3%A9%20%22final%22.txt",
+        )
+
+    def test_download_attachment_validators_and_conditional_get(self):
+        """Test that downloads carry validators and conditional requests get 304"""
+        self.authenticate()
+        attachment = TestStepAttachment.objects.create(
+            step=self.test_step_1,
+            file=SimpleUploadedFile("test_file.txt", b"0123456789"),
+        )
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/{attachment.id}/download/"
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        etag = response["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_download_attachment_byte_ranges(self):
+        """Test that byte-range requests get the requested part of the file"""
+        self.authenticate()
+        attachment = TestStepAttachment.objects.create(
+            step=self.test_step_1,
+            file=SimpleUploadedFile("test_file.txt", b"0123456789"),
+        )
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/{attachment.id}/download/"
+
+        response = self.client.get(url, HTTP_RANGE="bytes=2-5")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(response.streaming_content), b"2345")
+        self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(response["Content-Length"], "4")
+        etag = response["ETag"]
+
+        response = self.client.get(url, HTTP_RANGE="bytes=-3")
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+
+        response = self.client.get(url, HTTP_RANGE="bytes=7-")
+        self.assertEqual(b"".join(response.streaming_content), b"789")
+
+        response = self.client.get(url, HTTP_RANGE="bytes=20-30")
+        self.assertEqual(
+            response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+        # A stale If-Range gets the whole file
+        response = self.client.get(url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+
+    @override_settings(
+        STORAGES={
+            "default": {"BACKEND": "storages.backends.s3.S3Storage"},
+            "staticfiles": {
+                "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+            },
+        },
+        AWS_S3_ACCESS_KEY_ID="minio",
+        AWS_S3_SECRET_ACCESS_KEY="minio123",
+        AWS_STORAGE_BUCKET_NAME="kingyo-storage",
+        AWS_S3_ENDPOINT_URL="http://kingyo-storage:9000",
+        AWS_S3_CUSTOM_DOMAIN="localhost:9000",
+        AWS_S3_URL_PROTOCOL="http:",
+    )
+    def test_issue_direct_upload_policies(self):
+        """Test that presigned POST policies are issued for the public storage endpoint"""
+        self.authenticate()
+
+        response = self.client.post(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/uploads/",
+            [
+                {"step": 1, "filename": "screen shot.png", "content_type": "image/png"},
+                {"step": 2, "filename": "../log.txt"},
+            ],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+        first, second = response.data
+        self.assertEqual(first["url"], "http://localhost:9000/kingyo-storage")
+        self.assertTrue(first["name"].startswith("attachments/"))
+        self.assertTrue(first["name"].endswith("/screen_shot.png"))
+        self.assertTrue(second["name"].endswith("/log.txt"))
+        self.assertEqual(first["fields"]["key"], first["name"])
+        self.assertEqual(first["fields"]["Content-Type"], "image/png")
+        self.assertIn("policy", first["fields"])
+        self.assertIn("x-amz-signature", first["fields"])
+        self.assertEqual(
+            signing.loads(first["token"], salt=UPLOAD_TOKEN_SALT),
+            {
+                "name": first["name"],
+                "case": self.test_case.id,
+                "step": self.test_step_1.id,
+            },
+        )
+        # Nothing is recorded until the uploads are confirmed
+        self.assertFalse(TestStepAttachment.objects.exists())
+
+    def test_issue_direct_upload_policies_validation(self):
+        """Test that direct upload requests are validated"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/uploads/"
+
+        response = self.client.post(
+            url, [{"step": 1, "filename": "virus.exe"}], format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("filename", response.data[0])
+
+        response = self.client.post(
+            url, [{"step": 99, "filename": "screenshot.png"}], format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Test step 99 not found", response.data["error"])
+
+        response = self.client.post(url, [], format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # The local filesystem storage cannot sign upload policies
+        response = self.client.post(
+            url, [{"step": 1, "filename": "screenshot.png"}], format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("direct uploads", response.data["error"])
+
+    def test_confirm_direct_uploads(self):
+        """Test that confirmed direct uploads are recorded once as attachments"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/uploads/confirm/"
+        existing = TestStepAttachment.objects.create(
+            step=self.test_step_2,
+            file=SimpleUploadedFile("existing.txt", b"existing"),
+        )
+
+        # Simulate the browser upload straight to the storage
+        name = default_storage.save(
+            "attachments/0123abcd/direct.txt", ContentFile(b"direct upload")
+        )
+        token = signing.dumps(
+            {"name": name, "case": self.test_case.id, "step": self.test_step_1.id},
+            salt=UPLOAD_TOKEN_SALT,
+        )
+
+        response = self.client.post(url, {"tokens": [token]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["step"], self.test_step_1.id)
+        attachment = TestStepAttachment.objects.get(pk=response.data[0]["id"])
+        self.assertEqual(attachment.file.name, name)
+        self.assertTrue(TestStepAttachment.objects.filter(pk=existing.pk).exists())
+
+        # Confirming again returns the same attachment
+        response = self.client.post(url, {"tokens": [token, token]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([a["id"] for a in response.data], [attachment.id])
+        self.assertEqual(TestStepAttachment.objects.count(), 2)
+
+        download = self.client.get(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/{attachment.id}/download/"
+        )
+        self.assertEqual(b"".join(download.streaming_content), b"direct upload")
+
+    def test_confirm_direct_uploads_rejects_invalid_tokens(self):
+        """Test that forged, foreign and unfinished uploads are not recorded"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/uploads/confirm/"
+        name = default_storage.save(
+            "attachments/4567cdef/direct.txt", ContentFile(b"direct upload")
+        )
+        other_case = TestCaseModel.objects.create(plan=self.test_plan, title="Other")
+        tokens = [
+            "forged",
+            signing.dumps(
+                {"name": name, "case": other_case.id, "step": self.test_step_1.id},
+                salt=UPLOAD_TOKEN_SALT,
+            ),
+            signing.dumps(
+                {
+                    "name": "attachments/missing/file.txt",
+                    "case": self.test_case.id,
+                    "step": self.test_step_1.id,
+                },
+                salt=UPLOAD_TOKEN_SALT,
+            ),
+            signing.dumps(
+                {"name": name, "case": self.test_case.id, "step": self.test_step_1.id},
+                salt=UPLOAD_TOKEN_SALT,
+            ),
+        ]
+
+        response = self.client.post(url, {"tokens": tokens}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Invalid", response.data[0]["token"][0])
+        self.assertIn("another object", response.data[1]["token"][0])
+        self.assertIn("not been uploaded", response.data[2]["token"][0])
+        self.assertEqual(response.data[3], {})
+        self.assertFalse(TestStepAttachment.objects.exists())
+
+        # The step was deleted after the policy was issued
+        self.test_step_1.delete()
+        response = self.client.post(url, {"tokens": tokens[3:]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("no longer exists", response.data[0]["token"][0])
+
+    @override_settings(ATTACHMENT_DOWNLOAD_MODE="redirect")
+    def test_download_attachment_redirect_mode(self):
+        """Test that download endpoint redirects to the storage URL in redirect mode"""
+        self.authenticate()
+        attachment = TestStepAttachment.objects.create(
+            step=self.test_step_1,
+            file=SimpleUploadedFile("test_file.txt", b"test content"),
+        )
+
+        response = self.client.get(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/{attachment.id}/download/"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(response["Location"], attachment.file.url)
+        self.assertEqual(response["Cache-Control"], "no-store")
+
+    @override_settings(
+        ATTACHMENT_DOWNLOAD_MODE="redirect",
+        ATTACHMENT_URL_EXPIRES=30,
+        STORAGES={
+            "default": {"BACKEND": "storages.backends.s3.S3Storage"},
+            "staticfiles": {
+                "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+            },
+        },
+        AWS_S3_ACCESS_KEY_ID="minio",
+        AWS_S3_SECRET_ACCESS_KEY="minio123",
+        AWS_STORAGE_BUCKET_NAME="kingyo-storage",
+        AWS_S3_ENDPOINT_URL="http://kingyo-storage:9000",
+        AWS_S3_CUSTOM_DOMAIN="localhost:9000",
+        AWS_S3_URL_PROTOCOL="http:",
+    )
+    def test_download_attachment_redirect_mode_presigns_s3_url(self):
+        """Test that redirect mode signs the URL for the public storage endpoint"""
+        self.authenticate()
+        # Signing happens offline, so the object doesn't need to exist
+        attachment = TestStepAttachment.objects.create(step=self.test_step_1)
+        attachment.file.name = "attachments/test_file.txt"
+        attachment.save()
+
+        response = self.client.get(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/{attachment.id}/download/"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        location = response["Location"]
+        self.assertTrue(
+            location.startswith(
+                "http://localhost:9000/kingyo-storage/attachments/test_file.txt?"
+            )
+        )
+        self.assertIn("X-Amz-Signature=", location)
+        self.assertIn("X-Amz-Expires=30", location)
+        self.assertIn("response-content-disposition=", location)
+
     def test_download_attachment_no_file_returns_404(self):
         """Test that download endpoint returns 404 when file is not found"""
         self.authenticate()
@@ -656,6 +2106,39 @@ class TestStepAttachmentAPITests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
+    def test_attachment_changes_invalidate_cached_list(self):
+        """Test that added, deleted and previewed attachments drop the cached list"""
+        self.authenticate()
+        url = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/teststepattachments/"
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+
+        image = io.BytesIO()
+        Image.new("RGB", (640, 480)).save(image, format="PNG")
+        response = self.client.post(
+            f"{url}add/",
+            {"step": "1", "file": SimpleUploadedFile("shot.png", image.getvalue())},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        attachment_id = response.data["id"]
+
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.data), 1)
+        self.assertIsNone(response.data[0]["thumbnail"])
+
+        run_pending()
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertTrue(response.data[0]["thumbnail"].endswith("/thumbnail.webp"))
+
+        response = self.client.delete(f"{url}{attachment_id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data, [])
+
 
 @override_settings(
     STORAGES={
@@ -815,6 +2298,24 @@ class TestResultStepAttachmentAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("error", response.data)
 
+    def test_create_test_result_step_attachments_non_integer_attachment_returns_400(
+        self,
+    ):
+        """Test that an attachment reference that is not an integer is rejected"""
+        self.authenticate()
+
+        response = self.client.post(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/testresults/{self.test_result.id}/testresultstepattachments/",
+            {
+                "0_result_step": str(self.test_result_step_1.order),
+                "0_attachment": "abc",
+            },
+            format="multipart",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("0_attachment", response.data)
+
     def test_create_test_result_step_attachments_with_exe_file_returns_400(self):
         """Test that uploading a .exe file returns 400"""
         self.authenticate()
@@ -856,6 +2357,81 @@ class TestResultStepAttachmentAPITests(APITestCase):
         self.assertEqual(response["Content-Type"], "application/octet-stream")
         self.assertIn("Content-Disposition", response.headers)
 
+    def test_add_and_delete_single_result_attachment(self):
+        """Test adding and deleting one result step attachment at a time"""
+        self.authenticate()
+        base = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/testresults/{self.test_result.id}/testresultstepattachments"
+        existing = TestResultStepAttachment.objects.create(
+            result_step=self.test_result_step_1,
+            file=SimpleUploadedFile("first.png", b"first"),
+        )
+
+        response = self.client.post(
+            f"{base}/add/",
+            {"result_step": "2", "file": SimpleUploadedFile("second.png", b"second")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["result_step"], self.test_result_step_2.id)
+        self.assertEqual(TestResultStepAttachment.objects.count(), 2)
+        added_id = response.data["id"]
+
+        response = self.client.delete(f"{base}/{existing.id}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(TestResultStepAttachment.objects.values_list("pk", flat=True)),
+            [added_id],
+        )
+
+    def test_confirm_direct_uploads(self):
+        """Test that confirmed direct uploads are recorded as result step attachments"""
+        self.authenticate()
+        base = f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/testresults/{self.test_result.id}/testresultstepattachments"
+        name = default_storage.save(
+            "result_attachments/0123abcd/direct.txt", ContentFile(b"direct upload")
+        )
+        token = signing.dumps(
+            {
+                "name": name,
+                "result": self.test_result.id,
+                "result_step": self.test_result_step_2.id,
+            },
+            salt=UPLOAD_TOKEN_SALT,
+        )
+
+        response = self.client.post(
+            f"{base}/uploads/confirm/", {"tokens": [token]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data[0]["result_step"], self.test_result_step_2.id)
+        self.assertEqual(
+            TestResultStepAttachment.objects.get(pk=response.data[0]["id"]).file.name,
+            name,
+        )
+
+        response = self.client.post(
+            f"{base}/uploads/", [{"result_step": 9, "filename": "a.png"}], format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Test result step 9 not found", response.data["error"])
+
+    @override_settings(ATTACHMENT_DOWNLOAD_MODE="redirect")
+    def test_download_result_attachment_redirect_mode(self):
+        """Test that download endpoint redirects to the storage URL in redirect mode"""
+        self.authenticate()
+        attachment = TestResultStepAttachment.objects.create(
+            result_step=self.test_result_step_1,
+            file=SimpleUploadedFile("test_file.txt", b"test content"),
+        )
+
+        response = self.client.get(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/testresults/{self.test_result.id}/testresultstepattachments/{attachment.id}/download/"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(response["Location"], attachment.file.url)
+
     def test_download_result_attachment_no_file_returns_404(self):
         """Test that download endpoint returns 404 when file is not found"""
         self.authenticate()
@@ -887,3 +2463,431 @@ class TestResultStepAttachmentAPITests(APITestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SearchAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.refresh = RefreshToken.for_user(self.user)
+        self.access_token = str(self.refresh.access_token)
+
+        self.test_plan = TestPlan.objects.create(
+            title="Checkout Plan", description="Covers the payment flow"
+        )
+        self.test_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Pay with voucher"
+        )
+        self.test_step = TestStep.objects.create(
+            case=self.test_case,
+            order=1,
+            action="Enter the voucher code",
+            expected_result="The discount is applied",
+        )
+        self.test_result = TestResult.objects.create(
+            case=self.test_case,
+            result="fail",
+            browser="chrome",
+            os="windows10",
+            tester=self.user,
+        )
+        self.test_result_step = TestResultStep.objects.create(
+            result=self.test_result,
+            step=self.test_step,
+            order=1,
+            action="Enter the voucher code",
+            status="fail",
+            comment="Discount missing after the voucher was redeemed",
+        )
+
+    def authenticate(self):
+        """Helper method to authenticate requests"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+    def test_search_returns_typed_hits(self):
+        """Test search finds plans, cases, steps and result comments with their parents"""
+        self.authenticate()
+        response = self.client.get("/api/v1/search/", {"q": "voucher"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        hits = {hit["type"]: hit for hit in response.data["results"]}
+        self.assertEqual(set(hits), {"case", "step", "result_step"})
+        self.assertEqual(hits["case"]["id"], self.test_case.id)
+        self.assertEqual(hits["step"]["id"], self.test_step.id)
+        self.assertEqual(hits["step"]["plan"], self.test_plan.id)
+        self.assertEqual(hits["step"]["case"], self.test_case.id)
+        self.assertEqual(hits["result_step"]["id"], self.test_result_step.id)
+        self.assertEqual(hits["result_step"]["result"], self.test_result.id)
+        self.assertIn("<mark>", hits["result_step"]["highlight"])
+
+    def test_search_filtered_by_type(self):
+        """Test search hits can be limited to some types"""
+        self.authenticate()
+        response = self.client.get(
+            "/api/v1/search/", {"q": "discount", "type": ["result_step"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["type"], "result_step")
+
+    def test_search_follows_updates_and_deletes(self):
+        """Test the search index follows edited and deleted objects"""
+        self.authenticate()
+        self.test_plan.description = "Covers the refund flow"
+        self.test_plan.save()
+        self.test_step.delete()
+
+        response = self.client.get("/api/v1/search/", {"q": "refund"})
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["type"], "plan")
+
+        response = self.client.get("/api/v1/search/", {"q": "applied"})
+        self.assertEqual(response.data["count"], 0)
+
+        self.test_plan.delete()
+        response = self.client.get("/api/v1/search/", {"q": "voucher"})
+        self.assertEqual(response.data["count"], 0)
+
+    def test_search_follows_test_case_moved_to_another_plan(self):
+        """Test the hits below a test case follow it to another test plan"""
+        self.authenticate()
+        other_plan = TestPlan.objects.create(title="Other Plan")
+
+        response = self.client.patch(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/",
+            {"plan": other_plan.id},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(
+            "/api/v1/search/", {"q": "voucher", "plan": other_plan.id}
+        )
+        self.assertEqual(
+            {hit["type"] for hit in response.data["results"]},
+            {"case", "step", "result_step"},
+        )
+        self.assertTrue(
+            all(hit["plan"] == other_plan.id for hit in response.data["results"])
+        )
+
+        # The hits outlive the test plan the test case was moved away from
+        self.test_plan.delete()
+        response = self.client.get("/api/v1/search/", {"q": "voucher"})
+        self.assertEqual(response.data["count"], 3)
+
+    def test_search_without_query_returns_nothing(self):
+        """Test an empty search query returns no hits"""
+        self.authenticate()
+        response = self.client.get("/api/v1/search/", {"q": "  "})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 0)
+
+
+class JobAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.refresh = RefreshToken.for_user(self.user)
+        self.access_token = str(self.refresh.access_token)
+
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+        self.job = Job.objects.create(
+            kind="rebuild_plan_stats",
+            status="succeeded",
+            attempts=1,
+            result={"rebuilt": 1},
+            created_by=self.user,
+        )
+        self.failed_job = Job.objects.create(
+            kind="delete_test_plan",
+            status="failed",
+            attempts=5,
+            max_attempts=5,
+            error="Boom",
+        )
+
+    def authenticate(self):
+        """Helper method to authenticate requests"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+    def test_retrieve_job(self):
+        """Test getting the status and result of a job"""
+        self.authenticate()
+        response = self.client.get(f"/api/v1/jobs/{self.job.id}/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "succeeded")
+        self.assertEqual(response.data["result"], {"rebuilt": 1})
+        self.assertEqual(response.data["created_by"], self.user.id)
+        self.assertNotIn("locked_by", response.data)
+
+    def test_list_jobs_filtered_by_status(self):
+        """Test listing jobs newest first, filtered by status"""
+        self.authenticate()
+        response = self.client.get("/api/v1/jobs/")
+        self.assertEqual(
+            [job["id"] for job in response.data["results"]],
+            [self.failed_job.id, self.job.id],
+        )
+
+        response = self.client.get("/api/v1/jobs/?status=failed")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["error"], "Boom")
+
+    def test_jobs_are_read_only(self):
+        """Test jobs cannot be created or changed through the API"""
+        self.authenticate()
+        response = self.client.post("/api/v1/jobs/", {"kind": "delete_test_plan"})
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        response = self.client.delete(f"/api/v1/jobs/{self.job.id}/")
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_unauthorized_access(self):
+        """Test unauthorized access to jobs"""
+        response = self.client.get(f"/api/v1/jobs/{self.job.id}/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AsyncReadAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.refresh = RefreshToken.for_user(self.user)
+        self.access_token = str(self.refresh.access_token)
+
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+        self.test_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Test Case"
+        )
+        self.test_step = TestStep.objects.create(
+            case=self.test_case, order=1, action="Open the page"
+        )
+        self.test_results = [
+            TestResult.objects.create(
+                case=self.test_case, result=result, tester=self.user
+            )
+            for result in ["fail", "pass", "pass"]
+        ]
+        self.base_url = f"/api/v1/testplans/{self.test_plan.id}"
+
+    def authenticate(self):
+        """Helper method to authenticate requests of the ASGI test client"""
+        self.auth_headers = {"Authorization": f"Bearer {self.access_token}"}
+
+    async def aget(self, url, data=None, headers=None):
+        """GET through the ASGI handler with the authentication headers"""
+        return await self.async_client.get(
+            url, data, headers={**getattr(self, "auth_headers", {}), **(headers or {})}
+        )
+
+    def test_read_views_are_async(self):
+        """Test the list and retrieve routes resolve to async views, other routes do not"""
+        for url, expected in [
+            (f"{self.base_url}/", True),
+            (f"{self.base_url}/testcases/", True),
+            (f"{self.base_url}/testcases/{self.test_case.id}/testresults/", True),
+            (f"{self.base_url}/testcases/{self.test_case.id}/teststeps/", True),
+            (f"{self.base_url}/summary/", False),
+        ]:
+            self.assertIs(iscoroutinefunction(resolve(url).func), expected, url)
+
+        self.assertFalse(
+            iscoroutinefunction(
+                TestPlanViewSet.as_view({"get": "list"}, asynchronous=False)
+            )
+        )
+        sync_patterns = sync_urlpatterns(testplan_urls)
+        self.assertFalse(
+            any(
+                iscoroutinefunction(pattern.callback)
+                for pattern in sync_patterns
+                if hasattr(pattern, "callback")
+            )
+        )
+
+    def test_async_list_queries(self):
+        """Test the async list handler reads a page with the same queries as the sync view"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+        # The user lookup, the validators with the row count and the page
+        with self.assertNumQueries(3):
+            response = self.client.get(f"{self.base_url}/testcases/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+
+    async def test_list_and_retrieve_under_asgi(self):
+        """Test the async read handlers serve the same payloads as the sync views"""
+        self.authenticate()
+        case_url = f"{self.base_url}/testcases/{self.test_case.id}/"
+        result_url = f"{case_url}testresults/{self.test_results[0].id}/"
+
+        response = await self.aget("/api/v1/testplans/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["count"], 1)
+        self.assertEqual(response.json()["results"][0]["progress"]["total"], 1)
+
+        for url in [f"{self.base_url}/", case_url, result_url]:
+            response = await self.aget(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            self.assertEqual(
+                response.json(), (await sync_to_async(self.sync_get)(url)).json()
+            )
+
+        response = await self.aget(f"{self.base_url}/testcases/")
+        self.assertEqual(
+            [case["id"] for case in response.json()["results"]], [self.test_case.id]
+        )
+
+        response = await self.aget(
+            f"{case_url}testresults/", {"pagination": "cursor", "page_size": 2}
+        )
+        self.assertEqual(len(response.json()["results"]), 2)
+        response = await self.aget(response.json()["next"])
+        self.assertEqual(
+            [result["id"] for result in response.json()["results"]],
+            [self.test_results[0].id],
+        )
+
+        response = await self.aget(f"{case_url}teststeps/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()[0]["action"], "Open the page")
+        response = await self.aget(f"{case_url}teststeps/")
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    async def test_errors_and_conditional_requests_under_asgi(self):
+        """Test authentication, missing rows, invalid pages and 304 on the async handlers"""
+        response = await self.aget("/api/v1/testplans/")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.authenticate()
+        response = await self.aget(f"{self.base_url}/testcases/999999/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.aget("/api/v1/testplans/", {"page": 9})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = await self.aget(f"{self.base_url}/")
+        response = await self.aget(
+            f"{self.base_url}/", headers={"If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        results_url = f"{self.base_url}/testresults/"
+        response = await self.aget(results_url, {"pagination": "cursor"})
+        response = await self.aget(
+            results_url,
+            {"pagination": "cursor"},
+            headers={"If-None-Match": response["ETag"]},
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def aread(self, response):
+        """The content of a streaming response, as read by the ASGI handler"""
+        self.assertTrue(response.is_async)
+        # A synchronous iterator would warn and be read in full first
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            return b"".join([chunk async for chunk in response])
+
+    async def test_export_streams_under_asgi(self):
+        """Test the export is streamed from an async iterator under ASGI"""
+        self.authenticate()
+        url = f"{self.base_url}/testresults/export/"
+
+        response = await self.aget(url, {"format": "csv"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = (await self.aread(response)).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].startswith(f"{self.test_results[0].id},"))
+
+        response = await self.aget(url, {"format": "ndjson", "result": "pass"})
+        lines = (await self.aread(response)).decode().splitlines()
+        self.assertEqual([json.loads(line)["result"] for line in lines], ["pass"] * 2)
+
+    @override_settings(
+        STORAGES={
+            "default": {
+                "BACKEND": "django.core.files.storage.FileSystemStorage",
+            },
+            "staticfiles": {
+                "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+            },
+        },
+        MEDIA_ROOT=tempfile.mkdtemp(),
+    )
+    async def test_downloads_stream_under_asgi(self):
+        """Test proxied downloads are streamed from async iterators under ASGI"""
+        self.authenticate()
+        attachment = await TestStepAttachment.objects.acreate(
+            step=self.test_step,
+            file=SimpleUploadedFile("test_file.txt", b"0123456789"),
+        )
+        url = f"{self.base_url}/testcases/{self.test_case.id}/teststepattachments/{attachment.id}/download/"
+
+        response = await self.aget(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(await self.aread(response), b"0123456789")
+
+        response = await self.aget(url, headers={"Range": "bytes=2-5"})
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(await self.aread(response), b"2345")
+
+    async def test_writes_run_the_sync_views_under_asgi(self):
+        """Test the other actions of an async view still run the sync DRF handlers"""
+        self.authenticate()
+        response = await self.async_client.post(
+            f"{self.base_url}/testcases/",
+            {"plan": self.test_plan.id, "title": "Created over ASGI"},
+            content_type="application/json",
+            headers=self.auth_headers,
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = await self.aget(f"{self.base_url}/testcases/")
+        self.assertEqual(response.json()["count"], 2)
+
+    def sync_get(self, url):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+        return self.client.get(url)
+
+
+class HealthAPITests(APITestCase):
+    def test_health(self):
+        """Test the liveness probe answers without credentials"""
+        response = self.client.get("/health/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {"status": "ok"})
+        self.assertIn("no-store", response["Cache-Control"])
+
+    def test_ready(self):
+        """Test the readiness probe checks the database and the cache"""
+        with self.assertNumQueries(1):
+            response = self.client.get("/ready/")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json(),
+            {"status": "ok", "checks": {"database": "ok", "cache": "ok"}},
+        )
+
+    def test_not_ready(self):
+        """Test the readiness probe answers 503 when a check fails"""
+
+        def unreachable():
+            raise ConnectionError("Connection refused")
+
+        with (
+            mock.patch.dict(health.CHECKS, {"database": unreachable}),
+            self.assertLogs("testplan.health", "ERROR"),
+        ):
+            response = self.client.get("/ready/")
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(
+            response.json(),
+            {"status": "error", "checks": {"database": "error", "cache": "ok"}},
+        )
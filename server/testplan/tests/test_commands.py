@@ -0,0 +1,545 @@
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from PIL import Image
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import (
+    LiveServerTestCase,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+
+from .. import caching
+from .. import urls as testplan_urls
+from ..ingest import save_results
+from ..loadtest import percentile
+from ..models import (
+    TestPlan,
+    PlanStats,
+    TestCase as TestCaseModel,
+    TestResult,
+    TestStep,
+    TestResultStep,
+    SearchDocument,
+    AttachmentBlob,
+    TestStepAttachment,
+    Job,
+)
+
+
+class RebuildLatestResultsCommandTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+        self.test_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Test Case"
+        )
+        self.test_result = TestResult.objects.create(
+            case=self.test_case,
+            result="fail",
+            browser="chrome",
+            os="windows10",
+            tester=self.user,
+        )
+
+    def test_rebuild_repairs_drifted_columns(self):
+        """Test the command restores latest result columns that drifted"""
+        TestCaseModel.objects.update(
+            last_result=None, latest_result=None, last_executed_at=None
+        )
+
+        call_command("rebuild_latest_results", stdout=StringIO())
+
+        self.test_case.refresh_from_db()
+        self.assertEqual(self.test_case.last_result, self.test_result)
+        self.assertEqual(self.test_case.latest_result, "fail")
+        self.assertEqual(self.test_case.executed_at, self.test_result.executed_at)
+
+    def test_rebuild_limited_to_plan(self):
+        """Test the command only touches the test cases of the given plan"""
+        other_plan = TestPlan.objects.create(title="Other Plan")
+        TestCaseModel.objects.update(latest_result=None)
+
+        call_command("rebuild_latest_results", plan=other_plan.id, stdout=StringIO())
+
+        self.test_case.refresh_from_db()
+        self.assertIsNone(self.test_case.latest_result)
+
+    def test_rebuild_recounts_each_plan_once(self):
+        """Test the command recounts the statistics of each test plan once"""
+        TestCaseModel.objects.create(plan=self.test_plan, title="Second Test Case")
+        TestCaseModel.objects.create(plan=self.test_plan, title="Third Test Case")
+        other_plan = TestPlan.objects.create(title="Other Plan")
+        TestCaseModel.objects.create(plan=other_plan, title="Other Test Case")
+
+        with mock.patch.object(
+            PlanStats, "rebuild", wraps=PlanStats.rebuild
+        ) as rebuild:
+            call_command("rebuild_latest_results", stdout=StringIO())
+
+        rebuild.assert_called_once_with([self.test_plan.id, other_plan.id])
+
+
+class RebuildPlanStatsCommandTests(TestCase):
+    def setUp(self):
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+        TestCaseModel.objects.create(plan=self.test_plan, title="Test Case")
+
+    def test_rebuild_repairs_drifted_stats(self):
+        """Test the command recounts statistics that drifted or went missing"""
+        other_plan = TestPlan.objects.create(title="Other Plan")
+        PlanStats.objects.filter(plan=self.test_plan).update(status_design=5)
+        PlanStats.objects.filter(plan=other_plan).delete()
+
+        call_command("rebuild_plan_stats", stdout=StringIO())
+
+        stats = PlanStats.objects.get(plan=self.test_plan)
+        self.assertEqual(stats.status_design, 1)
+        self.assertEqual(stats.result_untested, 1)
+        self.assertEqual(PlanStats.objects.get(plan=other_plan).total, 0)
+
+    def test_rebuild_limited_to_plan(self):
+        """Test the command only recounts the given test plan"""
+        other_plan = TestPlan.objects.create(title="Other Plan")
+        PlanStats.objects.update(status_design=5)
+
+        call_command("rebuild_plan_stats", plan=other_plan.id, stdout=StringIO())
+
+        self.assertEqual(PlanStats.objects.get(plan=self.test_plan).status_design, 5)
+        self.assertEqual(PlanStats.objects.get(plan=other_plan).status_design, 0)
+
+    def test_rebuild_in_background(self):
+        """Test the command can leave the rebuild to a background job"""
+        PlanStats.objects.update(status_design=5)
+        stdout = StringIO()
+
+        call_command(
+            "rebuild_plan_stats", plan=self.test_plan.id, background=True, stdout=stdout
+        )
+
+        job = Job.objects.get()
+        self.assertIn(f"Queued job {job.pk}.", stdout.getvalue())
+        self.assertEqual(job.payload, {"plan_ids": [self.test_plan.id]})
+        self.assertEqual(PlanStats.objects.get(plan=self.test_plan).status_design, 5)
+
+        call_command("run_worker", once=True, stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual(job.result, {"rebuilt": 1})
+        self.assertEqual(PlanStats.objects.get(plan=self.test_plan).status_design, 1)
+
+
+class RebuildSearchIndexCommandTests(TestCase):
+    def setUp(self):
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+        self.test_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Test Case"
+        )
+        self.test_step = TestStep.objects.create(
+            case=self.test_case, order=1, action="Open the settings page"
+        )
+
+    def test_rebuild_restores_missing_documents(self):
+        """Test the command recreates search documents from the source rows"""
+        SearchDocument.objects.all().delete()
+
+        call_command("rebuild_search_index", stdout=StringIO())
+
+        self.assertEqual(
+            set(SearchDocument.objects.values_list("kind", "object_id")),
+            {
+                ("plan", self.test_plan.id),
+                ("case", self.test_case.id),
+                ("step", self.test_step.id),
+            },
+        )
+
+
+JUNIT_REPORT = b"""<?xml version="1.0" encoding="UTF-8"?>
+<testsuites>
+  <testsuite name="checkout" tests="4">
+    <testcase classname="checkout" name="Pay by card" time="0.4"/>
+    <testcase classname="checkout" name="Apply voucher" time="0.2">
+      <failure message="Voucher was not applied">AssertionError</failure>
+    </testcase>
+    <testcase classname="checkout" name="Pay by invoice">
+      <skipped/>
+    </testcase>
+    <testcase classname="checkout" name="Unknown test"/>
+  </testsuite>
+</testsuites>
+"""
+
+
+class ImportJUnitCommandTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+        self.pay_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Pay by card"
+        )
+        # Matched by "classname.name"
+        self.voucher_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="checkout.Apply voucher"
+        )
+        TestCaseModel.objects.create(plan=self.test_plan, title="Pay by invoice")
+
+    def import_report(self, content, **options):
+        with tempfile.NamedTemporaryFile(suffix=".xml") as report:
+            report.write(content)
+            report.flush()
+            out = StringIO()
+            call_command(
+                "import_junit",
+                report.name,
+                plan=self.test_plan.id,
+                user="testuser",
+                stdout=out,
+                **options,
+            )
+        return out.getvalue()
+
+    def test_import_records_matched_test_cases(self):
+        """Test the command records a test result for each matched test case"""
+        out = self.import_report(JUNIT_REPORT, browser="firefox", batch_size=1)
+
+        self.assertIn("Imported 2 of 4 test cases (1 skipped, 1 unmatched)", out)
+        self.assertIn("No test case titled Unknown test", out)
+
+        self.pay_case.refresh_from_db()
+        self.assertEqual(self.pay_case.latest_result, "pass")
+        self.voucher_case.refresh_from_db()
+        self.assertEqual(self.voucher_case.latest_result, "fail")
+        self.assertEqual(self.voucher_case.last_result.browser, "firefox")
+        self.assertEqual(self.voucher_case.last_result.tester, self.user)
+        self.assertEqual(
+            TestResultStep.objects.get(result__case=self.voucher_case).comment,
+            "Voucher was not applied",
+        )
+        self.assertEqual(TestResult.objects.count(), 2)
+
+    def test_import_malformed_report_tells_progress(self):
+        """Test a truncated report fails once the test cases before the error are recorded"""
+        with self.assertRaisesMessage(
+            CommandError, "2 test results recorded before the error"
+        ):
+            self.import_report(JUNIT_REPORT[:-40], batch_size=10)
+
+        self.assertEqual(TestResult.objects.count(), 2)
+
+    def test_import_commits_each_batch(self):
+        """Test the batches written before a failure are kept"""
+        calls = []
+
+        def save_first_batch(*args):
+            calls.append(args)
+            if len(calls) > 1:
+                raise DatabaseError("Connection lost")
+            return save_results(*args)
+
+        with mock.patch("testplan.junit.save_results", side_effect=save_first_batch):
+            with self.assertRaises(DatabaseError):
+                self.import_report(JUNIT_REPORT, batch_size=1)
+
+        self.assertEqual(TestResult.objects.count(), 1)
+        self.pay_case.refresh_from_db()
+        self.assertEqual(self.pay_case.latest_result, "pass")
+
+
+@override_settings(
+    STORAGES={
+        "default": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+        },
+    },
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class PurgeAttachmentBlobsCommandTests(TestCase):
+    def setUp(self):
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+        self.test_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Test Case"
+        )
+        self.test_step = TestStep.objects.create(
+            case=self.test_case, order=1, action="Test action"
+        )
+        self.attachment = TestStepAttachment.objects.create(
+            step=self.test_step, file=SimpleUploadedFile("kept.txt", b"kept")
+        )
+
+    def test_purge_removes_unreferenced_blobs(self):
+        """Test the command deletes blobs left without references"""
+        orphan = AttachmentBlob.acquire(SimpleUploadedFile("orphan.txt", b"orphan"))
+        AttachmentBlob.objects.filter(pk=orphan.pk).update(ref_count=0)
+
+        call_command("purge_attachment_blobs", stdout=StringIO())
+
+        self.assertFalse(AttachmentBlob.objects.filter(pk=orphan.pk).exists())
+        self.assertFalse(default_storage.exists(orphan.file.name))
+        self.assertTrue(default_storage.exists(self.attachment.file.name))
+
+    def test_purge_with_recount(self):
+        """Test the command recounts drifted references before purging"""
+        AttachmentBlob.objects.update(ref_count=0)
+        orphan = AttachmentBlob.acquire(SimpleUploadedFile("orphan.txt", b"orphan"))
+
+        call_command("purge_attachment_blobs", recount=True, stdout=StringIO())
+
+        self.assertEqual(AttachmentBlob.objects.get().pk, self.attachment.blob_id)
+        self.assertEqual(AttachmentBlob.objects.get().ref_count, 1)
+        self.assertFalse(default_storage.exists(orphan.file.name))
+
+
+@override_settings(
+    STORAGES={
+        "default": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+        },
+    },
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class GeneratePreviewsCommandTests(TestCase):
+    def setUp(self):
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+        self.test_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Test Case"
+        )
+        self.test_step = TestStep.objects.create(
+            case=self.test_case, order=1, action="Test action"
+        )
+
+    def test_generate_missing_previews(self):
+        """Test the command backfills the previews of image attachments only"""
+        output = io.BytesIO()
+        Image.new("RGB", (10, 10)).save(output, format="PNG")
+        image = TestStepAttachment.objects.create(
+            step=self.test_step,
+            file=SimpleUploadedFile("screenshot.png", output.getvalue()),
+        )
+        TestStepAttachment.objects.create(
+            step=self.test_step, file=SimpleUploadedFile("log.txt", b"text")
+        )
+        stdout = StringIO()
+
+        call_command("generate_previews", stdout=stdout)
+
+        self.assertIn("Generated previews for 1 images.", stdout.getvalue())
+        blob = AttachmentBlob.objects.get(pk=image.blob_id)
+        self.assertTrue(default_storage.exists(blob.thumbnail.name))
+        self.assertTrue(default_storage.exists(blob.preview.name))
+
+        # Images that already have previews are skipped unless forced
+        stdout = StringIO()
+        call_command("generate_previews", stdout=stdout)
+        self.assertIn("Generating previews for 0 images", stdout.getvalue())
+        call_command("generate_previews", force=True, stdout=StringIO())
+        regenerated = AttachmentBlob.objects.get(pk=image.blob_id)
+        self.assertTrue(default_storage.exists(regenerated.thumbnail.name))
+        if regenerated.thumbnail.name != blob.thumbnail.name:
+            # The replaced preview is not left behind
+            self.assertFalse(default_storage.exists(blob.thumbnail.name))
+
+
+@override_settings(JOB_RETRY_DELAY=60)
+class RunWorkerCommandTests(TestCase):
+    def setUp(self):
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+
+    def test_run_due_jobs_once(self):
+        """Test the command runs the due jobs and leaves the delayed ones"""
+        other_plan = TestPlan.objects.create(title="Other Plan")
+        Job.objects.create(
+            kind="delete_test_plan", payload={"plan_id": self.test_plan.id}
+        )
+        delayed = Job.objects.create(
+            kind="delete_test_plan",
+            payload={"plan_id": other_plan.id},
+            run_at=timezone.now() + timedelta(minutes=5),
+        )
+        stdout = StringIO()
+
+        call_command("run_worker", once=True, stdout=stdout)
+
+        self.assertIn("Ran 1 jobs.", stdout.getvalue())
+        self.assertEqual(list(TestPlan.objects.all()), [other_plan])
+        delayed.refresh_from_db()
+        self.assertEqual(delayed.status, "queued")
+
+    def test_invalid_concurrency(self):
+        """Test the command refuses an empty pool"""
+        with self.assertRaises(CommandError):
+            call_command("run_worker", concurrency=0, stdout=StringIO())
+
+
+class CacheStatsCommandTests(TestCase):
+    def setUp(self):
+        caching.reset_stats()
+
+    def test_show_and_reset_counters(self):
+        """Test the command shows the hit rate and resets the counters"""
+        for name in ["hits", "hits", "hits", "misses"]:
+            caching.record(name)
+        stdout = StringIO()
+
+        call_command("cache_stats", reset=True, stdout=stdout)
+
+        output = stdout.getvalue()
+        self.assertIn("Hits: 3", output)
+        self.assertIn("Misses: 1", output)
+        self.assertIn("Hit rate: 75.0%", output)
+        self.assertEqual(caching.stats(), {"hits": 0, "misses": 0, "hit_rate": None})
+
+
+class BenchmarkReadsCommandTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="tester", password="secret")
+        test_plan = TestPlan.objects.create(title="Test Plan")
+        test_case = TestCaseModel.objects.create(plan=test_plan, title="Test Case")
+        TestStep.objects.create(case=test_case, order=1, action="Open the page")
+        TestResult.objects.create(case=test_case, result="pass", tester=self.user)
+
+    def test_benchmark_both_modes(self):
+        """Test the command reads every endpoint under WSGI and ASGI and reports latencies"""
+        output = tempfile.mktemp(suffix=".json")
+        self.addCleanup(lambda: os.path.exists(output) and os.remove(output))
+        stdout = StringIO()
+
+        call_command(
+            "benchmark_reads",
+            requests=14,
+            concurrency=2,
+            host="testserver",
+            output=output,
+            stdout=stdout,
+        )
+
+        with open(output) as f:
+            report = json.load(f)
+        for mode in ["wsgi", "asgi"]:
+            self.assertEqual(report[mode]["requests"], 14)
+            self.assertEqual(report[mode]["errors"], 0)
+            self.assertEqual(len(report[mode]["by_endpoint"]), 7)
+            self.assertLessEqual(report[mode]["p50_ms"], report[mode]["p99_ms"])
+        self.assertIn("requests per second", stdout.getvalue())
+
+    def test_benchmark_without_data(self):
+        """Test the command asks for a seeded database"""
+        TestResult.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command("benchmark_reads", stdout=StringIO())
+
+
+class PercentileTests(SimpleTestCase):
+    def test_nearest_rank(self):
+        """Test percentiles pick the nearest rank for odd and even sample sizes"""
+        five = [1, 2, 3, 4, 5]
+        self.assertEqual(percentile(five, 50), 3)
+        self.assertEqual(percentile(five, 95), 5)
+        self.assertEqual(percentile(five, 0), 1)
+        self.assertEqual(percentile(list(range(1, 22)), 50), 11)
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(percentile([1, 2, 3, 4], 99), 4)
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        self.assertIsNone(percentile([], 50))
+
+
+@override_settings(
+    STORAGES={
+        "default": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+        },
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+        },
+    },
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class LoadtestCommandTests(LiveServerTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="tester", password="secret")
+        self.output = tempfile.mktemp(suffix=".json")
+        self.addCleanup(lambda: os.path.exists(self.output) and os.remove(self.output))
+
+    def loadtest(self, **options):
+        # One request at a time: the live server shares the in-memory test database
+        call_command(
+            "loadtest",
+            url=self.live_server_url,
+            requests=50,
+            concurrency=1,
+            plans=1,
+            cases_per_plan=3,
+            steps_per_case=2,
+            results_per_case=2,
+            output=self.output,
+            stdout=StringIO(),
+            **options,
+        )
+        with open(self.output) as f:
+            return json.load(f)
+
+    def test_loadtest_every_route(self):
+        """Test the command requests every route of the API and reports latencies and queries"""
+        report = self.loadtest()
+
+        self.assertEqual(report["total"]["errors"], 0)
+        self.assertEqual(report["total"]["requests"], report["requests"])
+        self.assertLessEqual(report["total"]["p50_ms"], report["total"]["p99_ms"])
+        for name, endpoint in report["endpoints"].items():
+            self.assertGreater(endpoint["requests"], 0, name)
+            self.assertGreater(endpoint["queries"], 0, name)
+
+        # Every method of every route but the direct uploads, which need S3
+        routes = {("api-root", "GET")}
+        for pattern in testplan_urls.urlpatterns:
+            actions = getattr(pattern.callback, "actions", {})
+            # DRF maps HEAD to the GET action once the view has been requested
+            routes |= {
+                (pattern.name, method.upper()) for method in actions if method != "head"
+            }
+        tested = {
+            (endpoint["route"], endpoint["method"])
+            for endpoint in report["endpoints"].values()
+        }
+        self.assertEqual(
+            routes - tested,
+            {
+                ("testcase-teststepattachments-uploads", "POST"),
+                ("testresult-testresultstepattachments-uploads", "POST"),
+            },
+        )
+        self.assertEqual(len(report["skipped"]), 2)
+
+        # The seeded test plans are deleted, with what the requests created
+        self.assertFalse(TestPlan.objects.exists())
+
+    def test_loadtest_query_regression(self):
+        """Test the command fails when an endpoint makes more queries than the baseline"""
+        report = self.loadtest()
+        report["endpoints"]["plan list"]["queries"] -= 1
+        baseline = tempfile.mktemp(suffix=".json")
+        self.addCleanup(lambda: os.path.exists(baseline) and os.remove(baseline))
+        with open(baseline, "w") as f:
+            json.dump(report, f)
+
+        with self.assertRaisesMessage(CommandError, "plan list queries"):
+            self.loadtest(baseline=baseline, max_regression=1000)
@@ -37,6 +37,51 @@ class TestPlanFilterTests(TestCase):
         self.assertEqual(filtered_plans.count(), 1)
         self.assertEqual(filtered_plans.first(), self.test_plan2)
 
+    def test_search_filter(self):
+        """Test full-text search over test plan title and description"""
+        TestPlan.objects.create(
+            title="Payments", description="Checkout with saved credit cards"
+        )
+        filter_set = TestPlanFilter(
+            data={"search": "credit card"}, queryset=TestPlan.objects.all()
+        )
+        self.assertTrue(filter_set.is_valid())
+        filtered_plans = filter_set.qs
+        self.assertEqual(filtered_plans.count(), 1)
+        self.assertEqual(filtered_plans.first().title, "Payments")
+
+    def test_search_filter_ranks_title_matches_first(self):
+        """Test title matches rank above description matches"""
+        description_match = TestPlan.objects.create(
+            title="Smoke Tests", description="Covers the dashboard widgets"
+        )
+        filter_set = TestPlanFilter(
+            data={"search": "dashboard"}, queryset=TestPlan.objects.all()
+        )
+        self.assertTrue(filter_set.is_valid())
+        self.assertEqual(list(filter_set.qs), [self.test_plan3, description_match])
+
+    def test_search_filter_follows_updates(self):
+        """Test the search index follows renamed and deleted test plans"""
+        self.test_plan1.title = "Authentication Plan"
+        self.test_plan1.save()
+
+        filter_set = TestPlanFilter(
+            data={"search": "authentic"}, queryset=TestPlan.objects.all()
+        )
+        self.assertEqual(list(filter_set.qs), [self.test_plan1])
+
+        filter_set = TestPlanFilter(
+            data={"search": "login"}, queryset=TestPlan.objects.all()
+        )
+        self.assertEqual(filter_set.qs.count(), 0)
+
+        self.test_plan1.delete()
+        filter_set = TestPlanFilter(
+            data={"search": "authentic"}, queryset=TestPlan.objects.all()
+        )
+        self.assertEqual(filter_set.qs.count(), 0)
+
     def test_combined_filters(self):
         """Test combining multiple filters"""
         filter_set = TestPlanFilter(
@@ -103,6 +148,25 @@ class TestCaseFilterTests(TestCase):
         self.assertEqual(filtered_cases.count(), 1)
         self.assertEqual(filtered_cases.first(), self.test_case2)
 
+    def test_search_filter(self):
+        """Test full-text search over test case titles with prefix matching"""
+        filter_set = TestCaseFilter(
+            data={"search": "log case"}, queryset=TestCaseModel.objects.all()
+        )
+        self.assertTrue(filter_set.is_valid())
+        filtered_cases = filter_set.qs
+        self.assertEqual(filtered_cases.count(), 2)
+        self.assertIn(self.test_case1, filtered_cases)
+        self.assertIn(self.test_case2, filtered_cases)
+
+    def test_search_filter_ignores_query_syntax(self):
+        """Test search input is not interpreted as query syntax"""
+        filter_set = TestCaseFilter(
+            data={"search": 'dashboard" OR NOT *'}, queryset=TestCaseModel.objects.all()
+        )
+        self.assertTrue(filter_set.is_valid())
+        self.assertEqual(filter_set.qs.count(), 0)
+
     def test_latest_result_filter(self):
         """Test filtering test cases by latest result"""
         filter_set = TestCaseFilter(
@@ -0,0 +1,111 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ..models import TestPlan, TestCase as TestCaseModel, TestResult
+
+
+class ListQueryPlanTests(APITestCase):
+    """
+    Check with EXPLAIN that the page query of every list endpoint is served
+    by an index instead of a full table scan and sort.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.refresh = RefreshToken.for_user(self.user)
+        self.access_token = str(self.refresh.access_token)
+
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+        self.test_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Test Case"
+        )
+        TestResult.objects.create(
+            case=self.test_case,
+            result="pass",
+            browser="chrome",
+            os="windows10",
+            tester=self.user,
+        )
+
+    def authenticate(self):
+        """Helper method to authenticate requests"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.access_token}")
+
+    def explain(self, sql):
+        """Helper method to get the query plan of a captured statement"""
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Tiny test tables would otherwise always be scanned sequentially
+                cursor.execute("SET enable_seqscan = off")
+                cursor.execute(f"EXPLAIN {sql}")
+            else:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return "\n".join(str(row) for row in cursor.fetchall())
+
+    def page_sql(self, queries, model):
+        """Helper method to find the page query, the ordered read of the listed table"""
+        table = connection.ops.quote_name(model._meta.db_table)
+        page_queries = [
+            query["sql"]
+            for query in queries
+            if f"FROM {table}" in query["sql"] and "ORDER BY" in query["sql"]
+        ]
+        self.assertEqual(len(page_queries), 1, page_queries)
+        return page_queries[0]
+
+    def assert_page_uses_index(self, url, model, params=None):
+        """Helper method to assert the page query of a list endpoint uses an index"""
+        self.authenticate()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, params or {})
+
+        plan = self.explain(self.page_sql(queries, model))
+        if connection.vendor == "postgresql":
+            self.assertNotIn("Seq Scan", plan)
+            self.assertIn("Index", plan)
+        else:
+            # A bare "SCAN <table>" is a full table scan
+            self.assertNotRegex(plan, r"SCAN \w+'")
+            self.assertIn("USING", plan)
+
+    def test_test_plan_list_uses_index(self):
+        """Test listing test plans uses an index"""
+        self.assert_page_uses_index("/api/v1/testplans/", TestPlan)
+
+    def test_test_plan_list_by_status_uses_index(self):
+        """Test filtering test plans by status uses an index"""
+        self.assert_page_uses_index(
+            "/api/v1/testplans/", TestPlan, {"status": "not_started"}
+        )
+
+    def test_test_case_list_uses_index(self):
+        """Test listing test cases of a plan uses an index"""
+        self.assert_page_uses_index(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/", TestCaseModel
+        )
+
+    def test_test_case_list_by_latest_result_uses_index(self):
+        """Test filtering test cases by latest result uses an index"""
+        self.assert_page_uses_index(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/",
+            TestCaseModel,
+            {"latest_result": "pass"},
+        )
+
+    def test_test_case_result_list_uses_index(self):
+        """Test listing the results of a test case uses an index"""
+        self.assert_page_uses_index(
+            f"/api/v1/testplans/{self.test_plan.id}/testcases/{self.test_case.id}/testresults/",
+            TestResult,
+        )
+
+    def test_test_plan_result_list_uses_index(self):
+        """Test listing the results of a test plan uses an index"""
+        self.assert_page_uses_index(
+            f"/api/v1/testplans/{self.test_plan.id}/testresults/", TestResult
+        )
@@ -0,0 +1,197 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .. import jobs
+from ..models import Job
+
+
+def flaky(fail_times):
+    """Task failing its first fail_times calls"""
+    calls = []
+
+    def func(**payload):
+        calls.append(payload)
+        if len(calls) <= fail_times:
+            raise RuntimeError("Temporary failure")
+        return {"calls": len(calls)}
+
+    return func
+
+
+def invalid(**payload):
+    raise jobs.JobError("Invalid payload")
+
+
+@override_settings(JOB_MAX_ATTEMPTS=3, JOB_RETRY_DELAY=10, JOB_RETRY_MAX_DELAY=15)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(
+            jobs.TASKS, {"flaky": flaky(fail_times=1), "invalid": invalid}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_enqueue_with_max_attempts_of_task(self):
+        """Test that tasks can be tried fewer times than JOB_MAX_ATTEMPTS"""
+        with mock.patch.dict(jobs.MAX_ATTEMPTS, {"invalid": 1}):
+            self.assertEqual(jobs.enqueue("invalid").max_attempts, 1)
+        self.assertEqual(jobs.enqueue("flaky").max_attempts, 3)
+
+    def test_enqueue_unknown_kind(self):
+        """Test that only registered tasks can be queued"""
+        with self.assertRaises(ValueError):
+            jobs.enqueue("missing")
+        self.assertFalse(Job.objects.exists())
+
+    def test_claim_due_jobs_once(self):
+        """Test that due jobs are claimed oldest first and by one worker only"""
+        first = jobs.enqueue("flaky", {"n": 1})
+        second = jobs.enqueue("flaky", {"n": 2})
+        jobs.enqueue("flaky", {"n": 3}, delay=60)
+
+        self.assertEqual(jobs.claim("worker-1"), [first.pk])
+        self.assertEqual(jobs.claim("worker-2", limit=5), [second.pk])
+        self.assertEqual(jobs.claim("worker-3", limit=5), [])
+
+        first.refresh_from_db()
+        self.assertEqual(first.status, "running")
+        self.assertEqual(first.locked_by, "worker-1")
+        self.assertEqual(first.attempts, 1)
+
+    def test_failed_jobs_are_retried_with_backoff(self):
+        """Test that a failed attempt queues the job again after a delay"""
+        job = jobs.enqueue("flaky", {"n": 1})
+
+        jobs.claim("worker")
+        with self.assertLogs("testplan.jobs", "WARNING"):
+            self.assertEqual(jobs.run(job.pk, "worker"), "queued")
+
+        job.refresh_from_db()
+        self.assertEqual(job.error, "Temporary failure")
+        self.assertEqual(job.locked_by, "")
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertEqual(jobs.claim("worker"), [])
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(jobs.run_pending(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(job.result, {"calls": 2})
+        self.assertEqual(job.error, "")
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retry_delay_doubles_up_to_maximum(self):
+        """Test the exponential backoff between attempts"""
+        self.assertEqual(
+            [jobs.retry_delay(attempts) for attempts in (1, 2, 3)], [10, 15, 15]
+        )
+
+    def test_jobs_fail_after_max_attempts(self):
+        """Test that a job failing every attempt ends up failed"""
+        job = jobs.enqueue("flaky", {"n": 1})
+        Job.objects.update(attempts=2)
+
+        jobs.claim("worker")
+        with self.assertLogs("testplan.jobs", "WARNING"):
+            self.assertEqual(jobs.run(job.pk, "worker"), "failed")
+
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 3)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_job_error_fails_without_retry(self):
+        """Test that JobError and unknown kinds fail the job at the first attempt"""
+        job = jobs.enqueue("invalid")
+        unknown = Job.objects.create(kind="removed", max_attempts=3)
+
+        with self.assertLogs("testplan.jobs", "WARNING"):
+            self.assertEqual(jobs.run_pending(), 2)
+
+        job.refresh_from_db()
+        unknown.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertEqual(job.error, "Invalid payload")
+        self.assertEqual(unknown.status, "failed")
+        self.assertEqual(unknown.attempts, 1)
+
+    def test_outcome_ignored_when_job_was_taken_over(self):
+        """Test a worker does not overwrite a job released and claimed by another one"""
+        job = jobs.enqueue("flaky", {"n": 1})
+        jobs.claim("worker-1")
+        Job.objects.update(locked_by="worker-2")
+
+        with self.assertLogs("testplan.jobs", "WARNING"):
+            jobs.run(job.pk, "worker-1")
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "running")
+        self.assertEqual(job.locked_by, "worker-2")
+
+    @override_settings(JOB_TIMEOUT=60)
+    def test_requeue_stale_jobs(self):
+        """Test that jobs of dead workers are queued again or failed"""
+        stale = jobs.enqueue("flaky", {"n": 1})
+        exhausted = jobs.enqueue("flaky", {"n": 2})
+        running = jobs.enqueue("flaky", {"n": 3})
+        jobs.claim("worker", limit=3)
+        Job.objects.filter(pk=exhausted.pk).update(attempts=3)
+        Job.objects.exclude(pk=running.pk).update(
+            locked_at=timezone.now() - timedelta(minutes=5)
+        )
+
+        self.assertEqual(jobs.requeue_stale(), 2)
+
+        stale.refresh_from_db()
+        exhausted.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(stale.status, "queued")
+        self.assertEqual(stale.locked_by, "")
+        self.assertEqual(exhausted.status, "failed")
+        self.assertEqual(running.status, "running")
+
+
+def outliving(**payload):
+    """Task running for longer than JOB_TIMEOUT, while another worker looks for stale jobs"""
+    time.sleep(1.25)
+    return {"released": jobs.requeue_stale()}
+
+
+# The lock of the job is refreshed from a thread with a connection of its own,
+# which only sees committed rows
+@override_settings(JOB_TIMEOUT=1, JOB_HEARTBEAT=0.5)
+class JobHeartbeatTests(TransactionTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(jobs.TASKS, {"outliving": outliving})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_job_outliving_timeout_is_not_requeued(self):
+        """Test that a job running for longer than JOB_TIMEOUT keeps its lock"""
+        job = jobs.enqueue("outliving")
+        jobs.claim("worker")
+
+        self.assertEqual(jobs.run(job.pk, "worker"), "succeeded")
+
+        job.refresh_from_db()
+        self.assertEqual(job.result, {"released": 0})
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.locked_by, "")
+
+    def test_heartbeat_stops_when_job_was_taken_over(self):
+        """Test that the lock of a job claimed by another worker is left alone"""
+        job = jobs.enqueue("outliving")
+        jobs.claim("worker-1")
+        Job.objects.update(locked_by="worker-2")
+        stop = mock.Mock(**{"wait.return_value": False})
+
+        jobs.heartbeat(job.pk, "worker-1", stop)
+
+        self.assertEqual(stop.wait.call_count, 1)
+        job.refresh_from_db()
+        self.assertEqual(job.locked_by, "worker-2")
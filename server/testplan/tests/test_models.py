@@ -1,18 +1,34 @@
+import hashlib
+import io
+import os
+import tempfile
+from unittest import mock
+
+from PIL import Image
+
 from django.test import TestCase, override_settings
 from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.db import IntegrityError
+from django.db import DatabaseError, IntegrityError
+from django.db.models import Model
 
 from ..models import (
     TestPlan,
+    PlanStats,
     TestCase as TestCaseModel,
     TestStep,
     TestResult,
     TestResultStep,
     TestStepAttachment,
     TestResultStepAttachment,
+    AttachmentBlob,
+    Job,
 )
 from ..constants import TEST_PLAN_STATUS
+from ..jobs import run_pending
+from ..previews import generate_previews
 
 
 class TestPlanModelTests(TestCase):
@@ -123,6 +139,52 @@ class TestCaseModelTests(TestCase):
         )
         self.assertEqual(self.test_case.latest_result, "pass")
 
+    def test_latest_result_follows_result_update(self):
+        """Test the stored latest result is updated when the result changes"""
+        result = TestResult.objects.create(
+            case=self.test_case,
+            result="in_progress",
+            browser="chrome",
+            os="windows10",
+            tester=self.user,
+        )
+        result.result = "fail"
+        result.save()
+
+        self.test_case.refresh_from_db()
+        self.assertEqual(self.test_case.latest_result, "fail")
+        self.assertEqual(self.test_case.last_result, result)
+
+    def test_latest_result_falls_back_on_delete(self):
+        """Test the previous result becomes the latest when the latest is deleted"""
+        result1 = TestResult.objects.create(
+            case=self.test_case,
+            result="pass",
+            browser="chrome",
+            os="windows10",
+            tester=self.user,
+        )
+        result2 = TestResult.objects.create(
+            case=self.test_case,
+            result="fail",
+            browser="firefox",
+            os="macos",
+            tester=self.user,
+        )
+        result2.delete()
+
+        self.test_case.refresh_from_db()
+        self.assertEqual(self.test_case.last_result, result1)
+        self.assertEqual(self.test_case.latest_result, "pass")
+        self.assertEqual(self.test_case.executed_at, result1.executed_at)
+
+        result1.delete()
+
+        self.test_case.refresh_from_db()
+        self.assertIsNone(self.test_case.last_result)
+        self.assertIsNone(self.test_case.latest_result)
+        self.assertIsNone(self.test_case.executed_at)
+
 
 class TestStepModelTests(TestCase):
     def setUp(self):
@@ -341,7 +403,7 @@ class TestResultStepAttachmentModelTests(TestCase):
         # Just check that the file has a name and is in the correct upload path
         self.assertTrue(attachment.file.name)
         self.assertTrue("result_test_file" in attachment.file.name)
-        self.assertTrue("result_attachments/" in attachment.file.name)
+        self.assertEqual(attachment.filename, "result_test_file.txt")
 
     def test_test_result_step_attachment_relationship(self):
         """Test TestResultStepAttachment relationship with TestResultStep"""
@@ -358,7 +420,7 @@ class TestResultStepAttachmentModelTests(TestCase):
         self.assertIn(attachment, self.result_step.attachments.all())
 
     def test_test_result_step_attachment_upload_path(self):
-        """Test TestResultStepAttachment uses correct upload path"""
+        """Test TestResultStepAttachment files are stored under their content hash"""
         # Create a temporary file
         test_file = SimpleUploadedFile(
             "upload_path_test.png", b"fake image content", content_type="image/png"
@@ -368,5 +430,383 @@ class TestResultStepAttachmentModelTests(TestCase):
             result_step=self.result_step, file=test_file
         )
 
-        # Verify the file is uploaded to the result_attachments/ directory
-        self.assertTrue(attachment.file.name.startswith("result_attachments/"))
+        # Verify the file is stored as a blob named after its SHA-256
+        sha256 = hashlib.sha256(b"fake image content").hexdigest()
+        self.assertEqual(attachment.blob.sha256, sha256)
+        self.assertTrue(
+            attachment.file.name.startswith(f"blobs/{sha256[:2]}/{sha256}/")
+        )
+        self.assertEqual(attachment.filename, "upload_path_test.png")
+
+
+class PlanStatsModelTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.test_plan = TestPlan.objects.create(title="Sample Test Plan")
+        self.test_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Sample Test Case"
+        )
+
+    def assert_counters(self, plan, **expected):
+        stats = PlanStats.objects.get(plan=plan)
+        counters = {field: getattr(stats, field) for field in PlanStats.COUNTER_FIELDS}
+        self.assertEqual(
+            counters, {field: 0 for field in PlanStats.COUNTER_FIELDS} | expected
+        )
+
+    def test_new_test_plan_starts_at_zero(self):
+        """Test a new test plan gets a statistics row without counts"""
+        plan = TestPlan.objects.create(title="Empty Plan")
+        self.assert_counters(plan)
+        self.assertEqual(plan.stats.total, 0)
+
+    def test_updated_at_follows_latest_results(self):
+        """Test a new latest result moves updated_at even when no counter changes"""
+        TestResult.objects.create(
+            case=self.test_case,
+            result="pass",
+            browser="chrome",
+            os="windows10",
+            tester=self.user,
+        )
+        before = PlanStats.objects.get(plan=self.test_plan).updated_at
+
+        TestResult.objects.create(
+            case=self.test_case,
+            result="pass",
+            browser="firefox",
+            os="linux",
+            tester=self.user,
+        )
+
+        stats = PlanStats.objects.get(plan=self.test_plan)
+        self.assertGreater(stats.updated_at, before)
+        self.assertEqual(stats.result_pass, 1)
+
+        # Refreshing unchanged latest results leaves it alone
+        TestCaseModel.refresh_latest_results([self.test_case.id])
+        self.assertEqual(
+            PlanStats.objects.get(plan=self.test_plan).updated_at, stats.updated_at
+        )
+
+    def test_stats_follow_test_case_changes(self):
+        """Test the counters follow test case creation, updates and deletion"""
+        self.assert_counters(self.test_plan, status_design=1, result_untested=1)
+
+        self.test_case.status = "ready"
+        self.test_case.save()
+        self.assert_counters(self.test_plan, status_ready=1, result_untested=1)
+
+        other_plan = TestPlan.objects.create(title="Other Plan")
+        self.test_case.plan = other_plan
+        self.test_case.save()
+        self.assert_counters(self.test_plan)
+        self.assert_counters(other_plan, status_ready=1, result_untested=1)
+
+        self.test_case.delete()
+        self.assert_counters(other_plan)
+
+    def test_stats_follow_latest_result(self):
+        """Test the counters follow the latest result of the test case"""
+        result = TestResult.objects.create(
+            case=self.test_case, result="fail", tester=self.user
+        )
+        self.assert_counters(self.test_plan, status_design=1, result_fail=1)
+
+        TestResult.objects.create(case=self.test_case, result="pass", tester=self.user)
+        self.assert_counters(self.test_plan, status_design=1, result_pass=1)
+
+        result.delete()
+        self.assert_counters(self.test_plan, status_design=1, result_pass=1)
+
+        self.test_case.test_results.all().delete()
+        self.assert_counters(self.test_plan, status_design=1, result_untested=1)
+
+    def test_stats_follow_result_moved_to_another_case(self):
+        """Test moving a test result refreshes the test case it was moved away from"""
+        other_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Other Test Case"
+        )
+        result = TestResult.objects.create(
+            case=self.test_case, result="pass", tester=self.user
+        )
+        self.assert_counters(
+            self.test_plan, status_design=2, result_pass=1, result_untested=1
+        )
+
+        result.case = other_case
+        result.save()
+
+        self.test_case.refresh_from_db()
+        other_case.refresh_from_db()
+        self.assertIsNone(self.test_case.last_result)
+        self.assertIsNone(self.test_case.latest_result)
+        self.assertEqual(other_case.last_result, result)
+        self.assert_counters(
+            self.test_plan, status_design=2, result_pass=1, result_untested=1
+        )
+
+    def test_refreshing_twice_moves_counters_once(self):
+        """Test refreshing the same test case again leaves the counters alone"""
+        result = TestResult.objects.create(
+            case=self.test_case, result="pass", tester=self.user
+        )
+        # Changed without signals, as by a write racing with the refresh
+        TestResult.objects.filter(pk=result.pk).update(result="fail")
+
+        TestCaseModel.refresh_latest_results([self.test_case.id])
+        TestCaseModel.refresh_latest_results([self.test_case.id])
+
+        self.assert_counters(self.test_plan, status_design=1, result_fail=1)
+
+    def test_deleting_test_case_with_results(self):
+        """Test deleting a test case uncounts it from its latest result"""
+        TestResult.objects.create(case=self.test_case, result="pass", tester=self.user)
+
+        self.test_case.delete()
+        self.assert_counters(self.test_plan)
+
+    def test_rebuild_recounts_drifted_stats(self):
+        """Test rebuild recounts the counters from the test cases"""
+        PlanStats.objects.update(status_design=7, result_pass=3)
+
+        PlanStats.rebuild([self.test_plan.id])
+        self.assert_counters(self.test_plan, status_design=1, result_untested=1)
+
+
+@override_settings(
+    STORAGES={
+        "default": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+        },
+    },
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class AttachmentBlobModelTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="test@example.com", password="testpass123"
+        )
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+        self.test_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Test Case"
+        )
+        self.test_step = TestStep.objects.create(
+            case=self.test_case, order=1, action="Test action"
+        )
+        self.test_result = TestResult.objects.create(
+            case=self.test_case, result="pass", tester=self.user
+        )
+        self.result_step = TestResultStep.objects.create(
+            result=self.test_result, order=1, status="pass"
+        )
+
+    def attach(self, name, content):
+        return TestStepAttachment.objects.create(
+            step=self.test_step, file=SimpleUploadedFile(name, content)
+        )
+
+    def test_same_content_is_stored_once(self):
+        """Test that attachments with the same content share one stored blob"""
+        first = self.attach("screenshot.png", b"same content")
+        second = self.attach("copy.png", b"same content")
+        result_attachment = TestResultStepAttachment.objects.create(
+            result_step=self.result_step,
+            file=SimpleUploadedFile("result.png", b"same content"),
+        )
+
+        blob = AttachmentBlob.objects.get()
+        self.assertEqual(blob.ref_count, 3)
+        self.assertEqual(blob.size, len(b"same content"))
+        for attachment in (first, second, result_attachment):
+            self.assertEqual(attachment.blob, blob)
+            self.assertEqual(attachment.file.name, blob.file.name)
+        self.assertEqual(first.filename, "screenshot.png")
+        self.assertEqual(second.filename, "copy.png")
+        self.assertEqual(
+            os.listdir(os.path.dirname(default_storage.path(blob.file.name))),
+            ["screenshot.png"],
+        )
+
+    def test_failed_save_releases_blob_reference(self):
+        """Test that an attachment row that cannot be saved takes no reference"""
+        blob = self.attach("screenshot.png", b"content").blob
+        save = Model.save
+
+        def fail_attachment_save(obj, *args, **kwargs):
+            if isinstance(obj, TestStepAttachment):
+                raise DatabaseError("Insert failed")
+            return save(obj, *args, **kwargs)
+
+        with mock.patch.object(
+            Model, "save", autospec=True, side_effect=fail_attachment_save
+        ):
+            for content in (b"content", b"new content"):
+                with self.assertRaises(DatabaseError):
+                    self.attach("copy.png", content)
+
+        self.assertEqual(AttachmentBlob.objects.get(), blob)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+    def test_last_reference_purges_blob(self):
+        """Test that the blob and its file are removed with the last reference"""
+        first = self.attach("screenshot.png", b"content")
+        second = self.attach("screenshot.png", b"content")
+        name = first.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(AttachmentBlob.objects.get().ref_count, 1)
+        self.assertTrue(default_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertFalse(default_storage.exists(name))
+
+    def test_content_attached_again_in_same_transaction_is_kept(self):
+        """Test that replacing an attachment with the same content keeps the blob"""
+        attachment = self.attach("screenshot.png", b"content")
+        blob = attachment.blob
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.delete()
+            replacement = self.attach("screenshot.png", b"content")
+
+        self.assertEqual(replacement.blob, blob)
+        self.assertEqual(AttachmentBlob.objects.get().ref_count, 1)
+        self.assertTrue(default_storage.exists(blob.file.name))
+
+    def test_cascade_releases_blobs(self):
+        """Test that deleting a test step releases the blobs of its attachments"""
+        self.attach("screenshot.png", b"content")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_step.delete()
+
+        self.assertFalse(AttachmentBlob.objects.exists())
+
+    def test_legacy_file_deleted_with_row(self):
+        """Test that files stored before deduplication are deleted with their row"""
+        name = default_storage.save("attachments/legacy.txt", ContentFile(b"legacy"))
+        attachment = TestStepAttachment.objects.create(step=self.test_step, file=name)
+        self.assertIsNone(attachment.blob)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.delete()
+
+        self.assertFalse(default_storage.exists(name))
+
+    def test_recount_repairs_reference_counts(self):
+        """Test that recount restores drifted reference counts"""
+        self.attach("screenshot.png", b"content")
+        self.attach("log.txt", b"other content")
+        self.attach("log.txt", b"other content")
+        AttachmentBlob.objects.update(ref_count=7)
+
+        AttachmentBlob.recount()
+
+        self.assertEqual(
+            sorted(AttachmentBlob.objects.values_list("ref_count", flat=True)), [1, 2]
+        )
+
+
+def image_file(name, size, format="PNG", mode="RGB"):
+    output = io.BytesIO()
+    Image.new(mode, size).save(output, format=format)
+    return SimpleUploadedFile(name, output.getvalue())
+
+
+@override_settings(
+    STORAGES={
+        "default": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+        },
+    },
+    MEDIA_ROOT=tempfile.mkdtemp(),
+)
+class AttachmentPreviewTests(TestCase):
+    def setUp(self):
+        self.test_plan = TestPlan.objects.create(title="Test Plan")
+        self.test_case = TestCaseModel.objects.create(
+            plan=self.test_plan, title="Test Case"
+        )
+        self.test_step = TestStep.objects.create(
+            case=self.test_case, order=1, action="Test action"
+        )
+
+    def attach(self, file):
+        return TestStepAttachment.objects.create(step=self.test_step, file=file)
+
+    def test_generate_previews_scales_images_down(self):
+        """Test that WebP renditions are stored next to the original image"""
+        attachment = self.attach(image_file("screenshot.png", (2000, 1000)))
+
+        self.assertTrue(generate_previews(attachment.blob_id))
+
+        blob = AttachmentBlob.objects.get(pk=attachment.blob_id)
+        directory = os.path.dirname(blob.file.name)
+        self.assertEqual(blob.thumbnail.name, f"{directory}/thumbnail.webp")
+        self.assertEqual(blob.preview.name, f"{directory}/preview.webp")
+        with Image.open(blob.thumbnail.path) as thumbnail:
+            self.assertEqual(thumbnail.format, "WEBP")
+            self.assertEqual(thumbnail.size, (320, 160))
+        with Image.open(blob.preview.path) as preview:
+            self.assertEqual(preview.size, (1280, 640))
+
+    def test_generate_previews_keeps_small_images_and_transparency(self):
+        """Test that small images are not scaled up and keep their alpha channel"""
+        attachment = self.attach(image_file("icon.gif", (40, 20), "GIF", "P"))
+        transparent = self.attach(image_file("logo.png", (40, 20), mode="RGBA"))
+
+        self.assertTrue(generate_previews(attachment.blob_id))
+        self.assertTrue(generate_previews(transparent.blob_id))
+
+        with Image.open(
+            AttachmentBlob.objects.get(pk=attachment.blob_id).thumbnail.path
+        ) as thumbnail:
+            self.assertEqual(thumbnail.size, (40, 20))
+        with Image.open(
+            AttachmentBlob.objects.get(pk=transparent.blob_id).thumbnail.path
+        ) as thumbnail:
+            self.assertEqual(thumbnail.mode, "RGBA")
+
+    def test_generate_previews_skips_other_files(self):
+        """Test that files which are not decodable images get no previews"""
+        text = self.attach(SimpleUploadedFile("log.txt", b"plain text"))
+        broken = self.attach(SimpleUploadedFile("broken.png", b"not an image"))
+
+        self.assertFalse(generate_previews(text.blob_id))
+        with self.assertLogs("testplan.previews", "WARNING"):
+            self.assertFalse(generate_previews(broken.blob_id))
+        self.assertFalse(generate_previews(0))
+        self.assertFalse(AttachmentBlob.objects.exclude(thumbnail="").exists())
+
+    def test_new_image_blobs_queue_preview_jobs(self):
+        """Test that a preview job is queued with each new image blob"""
+        image = self.attach(image_file("screenshot.png", (20, 20)))
+        self.attach(SimpleUploadedFile("log.txt", b"plain text"))
+        # Known content reuses the blob, which already has its previews queued
+        self.attach(image_file("copy.png", (20, 20)))
+
+        job = Job.objects.get()
+        self.assertEqual(job.kind, "generate_previews")
+        self.assertEqual(job.payload, {"blob_id": image.blob_id})
+
+        self.assertEqual(run_pending(), 1)
+        self.assertTrue(AttachmentBlob.objects.get(pk=image.blob_id).thumbnail.name)
+
+    def test_purge_deletes_previews(self):
+        """Test that previews are deleted along with their blob"""
+        attachment = self.attach(image_file("screenshot.png", (20, 20)))
+        generate_previews(attachment.blob_id)
+        blob = AttachmentBlob.objects.get(pk=attachment.blob_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment.delete()
+
+        for file in (blob.file, blob.thumbnail, blob.preview):
+            self.assertFalse(default_storage.exists(file.name))
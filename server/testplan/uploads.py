@@ -0,0 +1,94 @@
+import os
+import uuid
+
+from django.conf import settings
+from django.core import signing
+
+from .storage import presigned_post
+
+# Salt keeping upload tokens apart from other values signed with SECRET_KEY
+UPLOAD_TOKEN_SALT = "testplan.uploads"
+
+# How long a finished upload can wait for its confirmation
+UPLOAD_TOKEN_MAX_AGE = 24 * 60 * 60  # seconds
+
+
+def upload_name(field, filename):
+    """
+    Unique storage name for a file uploaded straight to the storage, under
+    the upload_to directory of the attachment file field and short enough
+    for its max_length.
+    """
+    prefix = f"{field.upload_to}{uuid.uuid4().hex}/"
+    room = field.max_length - len(prefix)
+    if len(filename) > room:
+        stem, ext = os.path.splitext(filename)
+        filename = stem[: room - len(ext)] + ext
+    return prefix + filename
+
+
+def issue_upload(field, filename, scope, content_type=None):
+    """
+    Presigned POST policy for one direct upload, along with a signed token
+    naming the file and the objects it is going to be attached to.
+    Returns None when the storage cannot sign upload policies.
+    """
+    name = upload_name(field, filename)
+    policy = presigned_post(
+        field.storage,
+        name,
+        settings.ATTACHMENT_UPLOAD_MAX_SIZE,
+        settings.ATTACHMENT_UPLOAD_EXPIRES,
+        content_type,
+    )
+    if policy is None:
+        return None
+    return {
+        "name": name,
+        "url": policy["url"],
+        "fields": policy["fields"],
+        "token": signing.dumps({"name": name, **scope}, salt=UPLOAD_TOKEN_SALT),
+    }
+
+
+def confirm_uploads(field, tokens, scope, attachments):
+    """
+    Decode the tokens of finished direct uploads and check that each one was
+    issued for the given scope and that its file exists in the storage,
+    unless one of the attachments (a queryset) was confirmed from it before:
+    its file may have been merged into a blob with the same content since.
+    Returns the decoded tokens, the attachments confirmed before by upload
+    name, and one error dict per token, all empty when every upload is valid.
+    """
+    uploads = []
+    errors = []
+    for token in tokens:
+        try:
+            upload = signing.loads(
+                token, salt=UPLOAD_TOKEN_SALT, max_age=UPLOAD_TOKEN_MAX_AGE
+            )
+        except signing.BadSignature:
+            upload = None
+            error = "Invalid or expired upload token."
+        else:
+            if any(upload.get(key) != value for key, value in scope.items()):
+                error = "Upload token was issued for another object."
+            else:
+                error = None
+        uploads.append(upload)
+        errors.append({"token": [error]} if error else {})
+
+    confirmed = {
+        attachment.upload_name: attachment
+        for attachment in attachments.filter(
+            upload_name__in=[
+                upload["name"] for upload, error in zip(uploads, errors) if not error
+            ]
+        )
+    }
+    for upload, error in zip(uploads, errors):
+        if error or upload["name"] in confirmed:
+            continue
+        if not field.storage.exists(upload["name"]):
+            error["token"] = ["File has not been uploaded."]
+    return uploads, confirmed, errors
@@ -9,17 +9,22 @@ from .views import (
     TestResultStepViewSet,
     TestStepAttachmentViewSet,
     TestResultStepAttachmentViewSet,
+    SearchViewSet,
+    JobViewSet,
 )
 
 # Create router for top-level testplans
 router = routers.DefaultRouter()
 router.register(r"testplans", TestPlanViewSet)
 router.register(r"users", UserViewSet)
+router.register(r"jobs", JobViewSet)
 
 # Define nested URLs manually
 urlpatterns = [
     # Include the router URLs for testplans
     path("", include(router.urls)),
+    # Search across test plans, test cases, test steps and test result comments
+    path("search/", SearchViewSet.as_view({"get": "list"}), name="search"),
     # Nested test cases under test plans
     path(
         "testplans/<int:test_plan_id>/testcases/",
@@ -44,6 +49,24 @@ urlpatterns = [
         TestResultViewSet.as_view({"get": "list"}),
         name="testplan-testresults-list",
     ),
+    # Record many test results of the test plan at once
+    path(
+        "testplans/<int:test_plan_id>/testresults/bulk/",
+        TestResultViewSet.as_view({"post": "bulk"}),
+        name="testplan-testresults-bulk",
+    ),
+    # Export all the test results of the test plan
+    path(
+        "testplans/<int:test_plan_id>/testresults/export/",
+        TestResultViewSet.as_view({"get": "export"}),
+        name="testplan-testresults-export",
+    ),
+    # Import test results of the test plan from a JUnit XML report
+    path(
+        "testplans/<int:test_plan_id>/testresults/junit/",
+        TestResultViewSet.as_view({"post": "junit"}),
+        name="testplan-testresults-junit",
+    ),
     path(
         "testplans/<int:test_plan_id>/testcases/<int:test_case_id>/testresults/",
         TestResultViewSet.as_view({"get": "list", "post": "create"}),
@@ -71,6 +94,26 @@ urlpatterns = [
         TestStepAttachmentViewSet.as_view({"get": "list", "post": "create"}),
         name="testcase-teststepattachments-list",
     ),
+    path(
+        "testplans/<int:test_plan_id>/testcases/<int:test_case_id>/teststepattachments/add/",
+        TestStepAttachmentViewSet.as_view({"post": "add"}),
+        name="testcase-teststepattachments-add",
+    ),
+    path(
+        "testplans/<int:test_plan_id>/testcases/<int:test_case_id>/teststepattachments/<int:pk>/",
+        TestStepAttachmentViewSet.as_view({"delete": "destroy"}),
+        name="testcase-teststepattachments-detail",
+    ),
+    path(
+        "testplans/<int:test_plan_id>/testcases/<int:test_case_id>/teststepattachments/uploads/",
+        TestStepAttachmentViewSet.as_view({"post": "uploads"}),
+        name="testcase-teststepattachments-uploads",
+    ),
+    path(
+        "testplans/<int:test_plan_id>/testcases/<int:test_case_id>/teststepattachments/uploads/confirm/",
+        TestStepAttachmentViewSet.as_view({"post": "confirm"}),
+        name="testcase-teststepattachments-uploads-confirm",
+    ),
     path(
         "testplans/<int:test_plan_id>/testcases/<int:test_case_id>/teststepattachments/<int:pk>/download/",
         TestStepAttachmentViewSet.as_view({"get": "download"}),
@@ -86,6 +129,26 @@ urlpatterns = [
         TestResultStepAttachmentViewSet.as_view({"get": "list", "post": "create"}),
         name="testresult-testresultstepattachments-list",
     ),
+    path(
+        "testplans/<int:test_plan_id>/testcases/<int:test_case_id>/testresults/<int:test_result_id>/testresultstepattachments/add/",
+        TestResultStepAttachmentViewSet.as_view({"post": "add"}),
+        name="testresult-testresultstepattachments-add",
+    ),
+    path(
+        "testplans/<int:test_plan_id>/testcases/<int:test_case_id>/testresults/<int:test_result_id>/testresultstepattachments/<int:pk>/",
+        TestResultStepAttachmentViewSet.as_view({"delete": "destroy"}),
+        name="testresult-testresultstepattachments-detail",
+    ),
+    path(
+        "testplans/<int:test_plan_id>/testcases/<int:test_case_id>/testresults/<int:test_result_id>/testresultstepattachments/uploads/",
+        TestResultStepAttachmentViewSet.as_view({"post": "uploads"}),
+        name="testresult-testresultstepattachments-uploads",
+    ),
+    path(
+        "testplans/<int:test_plan_id>/testcases/<int:test_case_id>/testresults/<int:test_result_id>/testresultstepattachments/uploads/confirm/",
+        TestResultStepAttachmentViewSet.as_view({"post": "confirm"}),
+        name="testresult-testresultstepattachments-uploads-confirm",
+    ),
     path(
         "testplans/<int:test_plan_id>/testcases/<int:test_case_id>/testresults/<int:test_result_id>/testresultstepattachments/<int:pk>/download/",
         TestResultStepAttachmentViewSet.as_view({"get": "download"}),
@@ -1,12 +1,17 @@
 # Create your views here.
 
+import uuid
+
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.reverse import reverse
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
 from django.db import transaction
-from django.http import FileResponse, Http404
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from .models import (
     TestPlan,
     TestCase,
@@ -15,13 +20,20 @@ from .models import (
     TestResultStep,
     TestStepAttachment,
     TestResultStepAttachment,
+    SearchDocument,
+    Job,
 )
 from .serializers import (
     TestPlanSerializer,
     TestPlanCreateSerializer,
+    TestPlanSummarySerializer,
     TestCaseSerializer,
     TestResultSerializer,
     TestResultCreateSerializer,
+    TestResultIngestSerializer,
+    TestResultIngestResponseSerializer,
+    JUnitImportSerializer,
+    JUnitImportSummarySerializer,
     UserSerializer,
     TestStepSerializer,
     TestStepCreateSerializer,
@@ -31,20 +43,59 @@ from .serializers import (
     TestStepAttachmentCreateSerializer,
     TestResultStepAttachmentSerializer,
     TestResultStepAttachmentCreateSerializer,
+    TestStepAttachmentUploadSerializer,
+    TestResultStepAttachmentUploadSerializer,
+    AttachmentUploadSerializer,
+    AttachmentUploadConfirmSerializer,
+    SearchHitSerializer,
+    JobSerializer,
 )
 
 from django_filters.rest_framework import DjangoFilterBackend
-from .filters import TestPlanFilter, TestCaseFilter, TestResultFilter
-from drf_spectacular.utils import extend_schema
+from .constants import TEST_CASE_STATUS, TEST_CASE_RESULTS
+from .filters import (
+    TestPlanFilter,
+    TestCaseFilter,
+    TestResultFilter,
+    SearchDocumentFilter,
+    JobFilter,
+)
+from . import caching, indexing, jobs
+from .ingest import ingest_results
+from .junit import JUnitImportError, import_junit
+from .renderers import CSVRenderer, NDJSONRenderer, csv_rows, ndjson_rows
+from .pagination import StandardResultsSetPagination, SearchResultsSetPagination
+from .asynchronous import AsyncReadMixin, aiterate, is_asgi
+from .conditional import ConditionalGetMixin
+from .attachments import StepAttachmentMixin
+from .downloads import download_response
+from .search import search_tokens, search_queryset, highlight_queryset
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+
+BACKGROUND_PARAMETER = OpenApiParameter(
+    "background",
+    bool,
+    description="Set to true to run the work as a background job and get the job back with a 202 instead of waiting for it.",
+)
 
 
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = "page_size"
-    max_page_size = 100
+def run_in_background(request):
+    """Whether the client asked for the work to be run as a background job"""
+    return request.query_params.get("background", "").lower() in ("1", "true")
+
+
+def job_accepted(request, job):
+    """202 response with the queued job, pointing at its status"""
+    return Response(
+        JobSerializer(job).data,
+        status=status.HTTP_202_ACCEPTED,
+        headers={"Location": reverse("job-detail", args=[job.pk], request=request)},
+    )
 
 
 class TestPlanViewSet(
+    ConditionalGetMixin,
+    AsyncReadMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.CreateModelMixin,
@@ -52,19 +103,89 @@ class TestPlanViewSet(
     mixins.DestroyModelMixin,
     viewsets.GenericViewSet,
 ):
-    queryset = TestPlan.objects.all().order_by("-created_at")
+    # The progress of each test plan is read from its statistics row
+    queryset = TestPlan.objects.select_related("stats").order_by("-created_at")
     serializer_class = TestPlanSerializer
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = TestPlanFilter
+    # Progress changes move the statistics row, not the test plan
+    validator_fields = ["updated_at", "stats__updated_at"]
 
     def get_serializer_class(self):
         if self.action == "create":
             return TestPlanCreateSerializer
+        if self.action == "summary":
+            return TestPlanSummarySerializer
         return super().get_serializer_class()
 
+    @extend_schema(
+        description="Get the progress of the test plan: the number of test cases by status, by latest result and by the browser and OS of the latest result, and the pass rate. Test cases without a result are counted as 'untested'. The pass rate is the share of passed test cases among those with a result, or null when nothing has been executed yet.",
+    )
+    @action(detail=True, methods=["get"])
+    def summary(self, request, *args, **kwargs):
+        """Get the progress of the test plan"""
+        test_plan = self.get_object()
+
+        # One grouped query over the test cases and their latest results
+        rows = (
+            TestCase.objects.filter(plan=test_plan)
+            .values(
+                "status",
+                "latest_result",
+                "last_result__browser",
+                "last_result__os",
+            )
+            .annotate(count=Count("id"))
+            .order_by()
+        )
+
+        by_status = {value: 0 for value, _ in TEST_CASE_STATUS}
+        by_result = {value: 0 for value, _ in TEST_CASE_RESULTS}
+        by_result["untested"] = 0
+        by_environment = {}
+        for row in rows:
+            count = row["count"]
+            by_status[row["status"]] += count
+            by_result[row["latest_result"] or "untested"] += count
+            if row["latest_result"]:
+                environment = (row["last_result__browser"], row["last_result__os"])
+                by_environment[environment] = by_environment.get(environment, 0) + count
+
+        total = sum(by_status.values())
+        executed = total - by_result["untested"]
+        serializer = self.get_serializer(
+            {
+                "total": total,
+                "status": by_status,
+                "latest_result": by_result,
+                "environments": [
+                    {"browser": browser, "os": os, "count": count}
+                    for (browser, os), count in sorted(by_environment.items())
+                ],
+                "pass_rate": by_result["pass"] / executed if executed else None,
+            }
+        )
+        return Response(serializer.data)
+
+    @extend_schema(
+        parameters=[BACKGROUND_PARAMETER],
+        responses={204: None, 202: JobSerializer},
+        description="Delete the test plan along with its test cases, test results and attachments. With background=true the deletion is left to a background job, which is returned with a 202.",
+    )
+    def destroy(self, request, *args, **kwargs):
+        """Delete the test plan, optionally in the background"""
+        if not run_in_background(request):
+            return super().destroy(request, *args, **kwargs)
+
+        test_plan = self.get_object()
+        job = jobs.enqueue("delete_test_plan", {"plan_id": test_plan.pk}, request.user)
+        return job_accepted(request, job)
+
 
 class TestCaseViewSet(
+    ConditionalGetMixin,
+    AsyncReadMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.CreateModelMixin,
@@ -77,15 +198,14 @@ class TestCaseViewSet(
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = TestCaseFilter
+    # Latest results are written to the test cases without moving their updated_at
+    validator_fields = ["updated_at", "plan__stats__updated_at"]
 
     def get_queryset(self):
         test_plan_id = self.kwargs["test_plan_id"]
-        # Optimize queries by prefetching related test results
-        return (
-            TestCase.objects.filter(plan_id=test_plan_id)
-            .prefetch_related("test_results")
-            .order_by("-created_at")
-        )
+        # The latest result is stored on the test case row itself, so a page is
+        # served by the same statements regardless of its size
+        return TestCase.objects.filter(plan_id=test_plan_id).order_by("-created_at")
 
     def perform_create(self, serializer):
         test_plan_id = self.kwargs["test_plan_id"]
@@ -93,6 +213,8 @@ class TestCaseViewSet(
 
 
 class TestResultViewSet(
+    ConditionalGetMixin,
+    AsyncReadMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.CreateModelMixin,
@@ -103,8 +225,11 @@ class TestResultViewSet(
     queryset = TestResult.objects.all().order_by("-executed_at")
     serializer_class = TestResultSerializer
     pagination_class = StandardResultsSetPagination
+    keyset_ordering = ("-executed_at", "-id")
     filter_backends = [DjangoFilterBackend]
     filterset_class = TestResultFilter
+    # Test results show the title of their test case
+    validator_fields = ["updated_at", "case__updated_at"]
 
     def get_queryset(self):
         test_plan_id = self.kwargs["test_plan_id"]
@@ -130,13 +255,172 @@ class TestResultViewSet(
     def get_serializer_class(self):
         if self.action == "create":
             return TestResultCreateSerializer
+        if self.action == "bulk":
+            return TestResultIngestSerializer
+        if self.action == "junit":
+            return JUnitImportSerializer
         return super().get_serializer_class()
 
+    def get_renderers(self):
+        if self.action == "export":
+            return [CSVRenderer(), NDJSONRenderer()]
+        return super().get_renderers()
+
     def perform_create(self, serializer):
         test_case_id = self.kwargs.get("test_case_id")
         if test_case_id:
             serializer.save(case_id=test_case_id, tester=self.request.user)
 
+    @extend_schema(
+        request=TestResultIngestSerializer(many=True),
+        responses={
+            201: TestResultIngestResponseSerializer,
+            207: TestResultIngestResponseSerializer,
+            400: TestResultIngestResponseSerializer,
+        },
+        description="Record many test results with their steps at once, e.g. from an automated run. Expects an array of test results of test cases in the test plan. Valid items are saved even when others are invalid; the response holds the status of every item by its index. Returns 201 when all items were saved, 207 when only some were and 400 when none were.",
+    )
+    def bulk(self, request, *args, **kwargs):
+        """
+        Record many test results with their steps at once.
+        Returns the status of every item by its index.
+        """
+        test_plan_id = self.kwargs["test_plan_id"]
+
+        if not isinstance(request.data, list):
+            return Response(
+                {"error": "Expected an array of test results"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = ingest_results(test_plan_id, request.data, request.user)
+
+        created = sum(1 for result in results if result["status"] == "created")
+        failed = len(results) - created
+        if not failed:
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+
+        return Response(
+            {"created": created, "failed": failed, "results": results},
+            status=response_status,
+        )
+
+    # Columns of the test result export
+    export_columns = [
+        ("id", "id"),
+        ("case", "case_id"),
+        ("case_title", "case__title"),
+        ("result", "result"),
+        ("browser", "browser"),
+        ("os", "os"),
+        ("tester", "tester__username"),
+        ("executed_at", "executed_at"),
+        ("updated_at", "updated_at"),
+    ]
+    export_chunk_size = 2000
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "format",
+                str,
+                enum=["csv", "ndjson"],
+                description="Export format (default: csv)",
+            )
+        ],
+        responses={
+            (200, "text/csv"): {"type": "string"},
+            (200, "application/x-ndjson"): {"type": "string"},
+        },
+        description="Export all the test results of the test plan, oldest first, as CSV or newline-delimited JSON. The response is streamed while the rows are read, so it starts immediately and takes constant memory regardless of the number of test results. Accepts the same filters as the test result list.",
+    )
+    def export(self, request, *args, **kwargs):
+        """Stream all the test results of the test plan as CSV or NDJSON"""
+        test_plan_id = self.kwargs["test_plan_id"]
+
+        columns = [column for column, _ in self.export_columns]
+        # iterator() reads the rows in chunks through a server-side cursor on Postgres
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .order_by("executed_at", "id")
+            .values_list(*[field for _, field in self.export_columns])
+            .iterator(chunk_size=self.export_chunk_size)
+        )
+
+        if request.accepted_renderer.format == "ndjson":
+            content, extension = ndjson_rows(columns, rows), "ndjson"
+        else:
+            content, extension = csv_rows(columns, rows), "csv"
+        if is_asgi(request):
+            # One chunk of rows per trip to the thread reading them
+            content = aiterate(content, self.export_chunk_size)
+
+        return StreamingHttpResponse(
+            content,
+            content_type=request.accepted_renderer.media_type,
+            headers={
+                "Content-Disposition": f'attachment; filename="testplan-{test_plan_id}-results.{extension}"'
+            },
+        )
+
+    @extend_schema(
+        request={"multipart/form-data": JUnitImportSerializer},
+        parameters=[BACKGROUND_PARAMETER],
+        responses={201: JUnitImportSummarySerializer, 202: JobSerializer},
+        description="Record the test cases of a JUnit/xUnit XML report as test results of the test cases with the same title in the test plan, matched by name or by 'classname.name'. The report is parsed incrementally so it can be of any size. Skipped and unmatched test cases are not recorded. A malformed report is rejected with a 400 without recording any of its test cases. Returns a summary of the import, or with background=true a 202 with the background job importing the report, whose result is the summary.",
+    )
+    def junit(self, request, *args, **kwargs):
+        """Import test results from a JUnit XML report"""
+        test_plan_id = self.kwargs["test_plan_id"]
+        get_object_or_404(TestPlan, pk=test_plan_id)
+
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if run_in_background(request):
+            file = serializer.validated_data["file"]
+            name = default_storage.save(f"imports/{uuid.uuid4().hex}.xml", file)
+            job = jobs.enqueue(
+                "import_junit",
+                {
+                    "name": name,
+                    "plan_id": int(test_plan_id),
+                    "tester_id": request.user.pk,
+                    "browser": serializer.validated_data["browser"],
+                    "os": serializer.validated_data["os"],
+                },
+                request.user,
+            )
+            return job_accepted(request, job)
+
+        try:
+            summary = import_junit(
+                serializer.validated_data["file"],
+                test_plan_id,
+                request.user,
+                browser=serializer.validated_data["browser"],
+                os=serializer.validated_data["os"],
+                atomic=True,
+            )
+        except JUnitImportError as e:
+            # Nothing is recorded, so the client can send the report again
+            return Response(
+                {
+                    "error": str(e),
+                    "summary": JUnitImportSummarySerializer(e.summary).data,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            JUnitImportSummarySerializer(summary).data, status=status.HTTP_201_CREATED
+        )
+
 
 class UserViewSet(
     mixins.ListModelMixin,
@@ -154,6 +438,8 @@ class UserViewSet(
 
 
 class TestStepViewSet(
+    caching.CaseCacheMixin,
+    AsyncReadMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     viewsets.GenericViewSet,
@@ -161,6 +447,7 @@ class TestStepViewSet(
     queryset = TestStep.objects.all().order_by("order")
     serializer_class = TestStepSerializer
     pagination_class = None  # Disable pagination
+    cache_name = "steps"
 
     def get_queryset(self):
         test_case_id = self.kwargs["test_case_id"]
@@ -180,6 +467,7 @@ class TestStepViewSet(
                 "items": {
                     "type": "object",
                     "properties": {
+                        "id": {"type": "integer", "nullable": True},
                         "order": {"type": "integer", "minimum": 0, "format": "int64"},
                         "action": {"type": "string"},
                         "expected_result": {"type": "string"},
@@ -194,7 +482,7 @@ class TestStepViewSet(
                 "items": {"$ref": "#/components/schemas/TestStep"},
             }
         },
-        description="Create multiple test steps at once. Replaces all existing test steps for the given test case. Expects an array of test step objects in the request data.",
+        description="Create multiple test steps at once. Replaces all existing test steps for the given test case. Expects an array of test step objects in the request data. A step is matched to the existing step with the given id, or else to the existing step at the same order, and updated in place so it keeps its id. Unmatched existing steps are deleted.",
     )
     def create(self, request, *args, **kwargs):
         """
@@ -204,24 +492,101 @@ class TestStepViewSet(
         """
         test_case_id = self.kwargs["test_case_id"]
 
-        # Replace all steps in a single transaction
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        steps_data = serializer.validated_data
+
+        # Apply the difference with the existing steps in a single transaction,
+        # so unchanged steps keep their IDs and the test result steps recorded
+        # against them keep their link
         with transaction.atomic():
-            # Delete all existing test steps for this test case
-            TestStep.objects.filter(case_id=test_case_id).delete()
-
-            # Create all new steps
-            created_steps = []
-            for step_data in request.data:
-                serializer = self.get_serializer(data=step_data)
-                if not serializer.is_valid():
-                    return Response(
-                        serializer.errors, status=status.HTTP_400_BAD_REQUEST
-                    )
-                step = serializer.save(case_id=test_case_id)
-                created_steps.append(step)
+            existing_steps = {
+                step.pk: step
+                for step in TestStep.objects.select_for_update().filter(
+                    case_id=test_case_id
+                )
+            }
 
-        # Return the created ones
-        response_serializer = TestStepSerializer(created_steps, many=True)
+            errors = [{} for _ in steps_data]
+            orders = set()
+            claimed_ids = set()
+            for index, step_data in enumerate(steps_data):
+                if step_data["order"] in orders:
+                    errors[index]["order"] = ["Duplicate test step order."]
+                orders.add(step_data["order"])
+
+                step_id = step_data.get("id")
+                if step_id is None:
+                    continue
+                if step_id not in existing_steps or step_id in claimed_ids:
+                    errors[index]["id"] = [
+                        f"Test step {step_id} not found or does not belong to test case {test_case_id}"
+                    ]
+                claimed_ids.add(step_id)
+            if any(errors):
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+            # Steps sent without an ID take over the existing step at their order
+            steps_by_order = {
+                step.order: step
+                for step in existing_steps.values()
+                if step.pk not in claimed_ids
+            }
+
+            steps = []
+            changed_steps = []
+            new_steps = []
+            original_orders = {}
+            for step_data in steps_data:
+                step_id = step_data.pop("id", None)
+                if step_id is not None:
+                    step = existing_steps[step_id]
+                else:
+                    step = steps_by_order.pop(step_data["order"], None)
+
+                if step is None:
+                    step = TestStep(case_id=test_case_id, **step_data)
+                    new_steps.append(step)
+                elif any(
+                    getattr(step, field) != value for field, value in step_data.items()
+                ):
+                    original_orders[step.pk] = step.order
+                    for field, value in step_data.items():
+                        setattr(step, field, value)
+                    changed_steps.append(step)
+                steps.append(step)
+
+            kept_ids = {step.pk for step in steps if step.pk is not None}
+            removed_ids = [pk for pk in existing_steps if pk not in kept_ids]
+            if removed_ids:
+                TestStep.objects.filter(pk__in=removed_ids).delete()
+
+            moved_steps = [
+                step for step in changed_steps if step.order != original_orders[step.pk]
+            ]
+            if moved_steps:
+                # Move reordered steps out of the way first, as the unique
+                # (case, order) constraint is checked row by row
+                offset = max([*orders, *original_orders.values()]) + 1
+                for step in moved_steps:
+                    step.order += offset
+                TestStep.objects.bulk_update(moved_steps, ["order"])
+                for step in moved_steps:
+                    step.order -= offset
+
+            TestStep.objects.bulk_update(
+                changed_steps, ["order", "action", "expected_result"]
+            )
+            TestStep.objects.bulk_create(new_steps)
+
+            # Bulk writes skip the post_save signals that keep the search index
+            # and the cached step list up to date
+            indexing.index_steps(changed_steps + new_steps)
+            caching.invalidate_case(test_case_id)
+
+        # Return the saved ones
+        response_serializer = TestStepSerializer(steps, many=True)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
 
@@ -279,21 +644,49 @@ class TestResultStepViewSet(
         """
         test_result_id = self.kwargs["test_result_id"]
 
+        # Validate the whole array before touching the existing steps
+        serializer = self.get_serializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        steps_data = serializer.validated_data
+
+        # Look up every referenced test step with one query
+        step_ids = {data["step_id"] for data in steps_data if data.get("step_id")}
+        existing_step_ids = set(
+            TestStep.objects.filter(pk__in=step_ids).values_list("pk", flat=True)
+        )
+
+        errors = [{} for _ in steps_data]
+        orders = set()
+        for index, step_data in enumerate(steps_data):
+            step_id = step_data.get("step_id")
+            if step_id is not None and step_id not in existing_step_ids:
+                errors[index]["step"] = [
+                    f'Invalid pk "{step_id}" - object does not exist.'
+                ]
+            if step_data["order"] in orders:
+                errors[index]["order"] = ["Duplicate test result step order."]
+            orders.add(step_data["order"])
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
         # Replace all steps in a single transaction
         with transaction.atomic():
             # Delete all existing test result steps for this test result
             TestResultStep.objects.filter(result_id=test_result_id).delete()
 
-            # Create all new steps
-            created_steps = []
-            for step_data in request.data:
-                serializer = self.get_serializer(data=step_data)
-                if not serializer.is_valid():
-                    return Response(
-                        serializer.errors, status=status.HTTP_400_BAD_REQUEST
-                    )
-                step = serializer.save(result_id=test_result_id)
-                created_steps.append(step)
+            # Create all new steps with a single INSERT
+            created_steps = TestResultStep.objects.bulk_create(
+                [
+                    TestResultStep(result_id=test_result_id, **step_data)
+                    for step_data in steps_data
+                ]
+            )
+
+            # Bulk writes skip the post_save signals that keep the search index up to date
+            indexing.index_result_steps(
+                [step for step in created_steps if step.comment]
+            )
 
         # Return the created ones
         response_serializer = TestResultStepSerializer(created_steps, many=True)
@@ -301,26 +694,45 @@ class TestResultStepViewSet(
 
 
 class TestStepAttachmentViewSet(
+    caching.CaseCacheMixin,
+    StepAttachmentMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
+    mixins.DestroyModelMixin,
     viewsets.GenericViewSet,
 ):
     queryset = TestStepAttachment.objects.all()
     serializer_class = TestStepAttachmentSerializer
     pagination_class = None  # Disable pagination
+    cache_name = "step-attachments"
+    step_model = TestStep
+    step_field = "step"
+    parent_field = "case"
+    parent_kwarg = "test_case_id"
+    step_label = "Test step"
+    parent_label = "test case"
+    create_serializer_class = TestStepAttachmentCreateSerializer
+    upload_serializer_class = TestStepAttachmentUploadSerializer
 
     def get_queryset(self):
         test_case_id = self.kwargs["test_case_id"]
         # Get all attachments for steps that belong to the given test case
         return TestStepAttachment.objects.filter(
             step__case_id=test_case_id
-        ).select_related("step")
+        ).select_related("step", "blob")
 
     def get_serializer_class(self):
         if self.action == "create":
             return TestStepAttachmentCreateSerializer
         return super().get_serializer_class()
 
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        self.attachments_changed()
+
+    def attachments_changed(self):
+        caching.invalidate_case(self.kwargs["test_case_id"])
+
     # This schema cannot be used in client because OpenAPI doesn't support array of files in multipart/form-data
     @extend_schema(
         request={
@@ -338,8 +750,12 @@ class TestStepAttachmentViewSet(
                             "format": "binary",
                             "description": "File to attach",
                         },
+                        "attachment": {
+                            "type": "integer",
+                            "description": "ID of an existing attachment to keep instead of uploading its file again",
+                        },
                     },
-                    "required": ["step", "file"],
+                    "required": ["step"],
                 },
             }
         },
@@ -349,81 +765,61 @@ class TestStepAttachmentViewSet(
                 "items": {"$ref": "#/components/schemas/TestStepAttachment"},
             }
         },
-        description="Create multiple test step attachments at once. Replaces all existing attachments for the given test case. Expects an array of test step attachment objects in the request data.",
+        description="Create multiple test step attachments at once. Replaces all existing attachments for the given test case. Expects an array of test step attachment objects in the request data, each with either a file to upload or the id of an existing attachment to keep.",
     )
     def create(self, request, *args, **kwargs):
         """
         Create multiple test step attachments at once.
         Replaces all existing attachments for the given test case.
+        Existing attachments referenced by id are kept without uploading their file again.
         """
-        test_case_id = self.kwargs["test_case_id"]
-
-        # Parse multipart form data
-        attachments_data = []
-        index = 0
-        while True:
-            step_key = f"{index}_step"
-            file_key = f"{index}_file"
-
-            if step_key not in request.data or file_key not in request.data:
-                break
+        return self.replace_attachments(request)
 
-            attachments_data.append(
-                {"step": int(request.data[step_key]), "file": request.data[file_key]}
-            )
-            index += 1
-
-        if not attachments_data:
-            return Response(
-                {"error": "No attachment data provided"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    @extend_schema(
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {
+                    "step": {
+                        "type": "integer",
+                        "description": "Order of the test step",
+                    },
+                    "file": {
+                        "type": "string",
+                        "format": "binary",
+                        "description": "File to attach",
+                    },
+                },
+                "required": ["step", "file"],
+            }
+        },
+        responses={201: TestStepAttachmentSerializer},
+        description="Add a single attachment to a test step of the given test case, keeping the existing attachments.",
+    )
+    @action(detail=False, methods=["post"])
+    def add(self, request, *args, **kwargs):
+        """Add a single attachment without replacing the existing ones"""
+        return self.add_attachment(request)
 
-        # Replace all attachments in a single transaction
-        with transaction.atomic():
-            # Delete all existing test step attachments for this test case
-            TestStepAttachment.objects.filter(step__case_id=test_case_id).delete()
-
-            # Create all new attachments
-            created_attachments = []
-            for attachment_data in attachments_data:
-                # Validate the file type
-                file_obj = attachment_data.get("file")
-                if file_obj and file_obj.name.lower().endswith(".exe"):
-                    return Response(
-                        {"error": "Executable files (.exe) are not allowed."},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-                # Check if TestStep associated with the test case and the order exists
-                step_order = attachment_data.get("step")
-                if step_order is not None:
-                    try:
-                        step = TestStep.objects.get(
-                            order=step_order, case_id=test_case_id
-                        )
-                        attachment_data["step"] = step.pk
-                    except TestStep.DoesNotExist:
-                        return Response(
-                            {
-                                "error": f"Test step {step_order} not found or does not belong to test case {test_case_id}"
-                            },
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-
-                serializer = self.get_serializer(data=attachment_data)
-                if not serializer.is_valid():
-                    return Response(
-                        serializer.errors, status=status.HTTP_400_BAD_REQUEST
-                    )
-                attachment = serializer.save()
-                created_attachments.append(attachment)
+    @extend_schema(
+        request=TestStepAttachmentUploadSerializer(many=True),
+        responses={201: AttachmentUploadSerializer(many=True)},
+        description="Issue presigned POST policies to upload attachment files straight to the storage instead of through the API. POST each file to the returned URL along with the returned form fields, then confirm the uploads with their tokens.",
+    )
+    @action(detail=False, methods=["post"])
+    def uploads(self, request, *args, **kwargs):
+        """Issue presigned POST policies for direct attachment uploads"""
+        return self.issue_uploads(request)
 
-        # Return the created ones
-        response_serializer = TestStepAttachmentSerializer(
-            created_attachments, many=True
-        )
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+    @extend_schema(
+        request=AttachmentUploadConfirmSerializer,
+        responses={201: TestStepAttachmentSerializer(many=True)},
+        description="Record the attachments of files uploaded straight to the storage. Each token must have been issued for this test case and its file must exist in the storage. Existing attachments are kept, and confirming an upload again returns its attachment.",
+    )
+    @action(detail=False, methods=["post"], url_path="uploads/confirm")
+    def confirm(self, request, *args, **kwargs):
+        """Record the attachments of direct uploads"""
+        return self.confirm_direct_uploads(request)
 
     @extend_schema(
         responses={
@@ -432,52 +828,49 @@ class TestStepAttachmentViewSet(
                 "format": "binary",
                 "description": "The file content",
             },
+            206: {
+                "type": "string",
+                "format": "binary",
+                "description": "The requested byte range of the file",
+            },
+            302: {"description": "Redirect to a short-lived presigned storage URL"},
+            304: {"description": "The cached file is still valid"},
             404: {"type": "object", "properties": {"detail": {"type": "string"}}},
         },
-        description="Download the attachment file through Django proxy",
+        description="Download the attachment file through Django proxy, or get redirected to a short-lived presigned storage URL when ATTACHMENT_DOWNLOAD_MODE is 'redirect'. Proxied downloads support byte-range requests and conditional requests with If-None-Match or If-Modified-Since.",
     )
     @action(detail=True, methods=["get"])
     def download(self, request, *args, **kwargs):
-        """Download the attachment file through Django proxy"""
+        """Download the attachment file"""
         attachment = self.get_object()
-
-        if not attachment.file:
-            raise Http404("File not found")
-
-        try:
-            # Get file name for the response
-            file_name = (
-                attachment.file.name.split("/")[-1]
-                if attachment.file.name
-                else "attachment"
-            )
-
-            # Stream the file through Django
-            response = FileResponse(
-                attachment.file.open("rb"),
-                content_type="application/octet-stream",
-                headers={"Content-Disposition": f'inline; filename="{file_name}"'},
-            )
-            return response
-        except (FileNotFoundError, OSError) as e:
-            raise Http404("File not accessible") from e
+        return download_response(request, attachment.file, attachment.filename)
 
 
 class TestResultStepAttachmentViewSet(
+    StepAttachmentMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
+    mixins.DestroyModelMixin,
     viewsets.GenericViewSet,
 ):
     queryset = TestResultStepAttachment.objects.all()
     serializer_class = TestResultStepAttachmentSerializer
     pagination_class = None  # Disable pagination
+    step_model = TestResultStep
+    step_field = "result_step"
+    parent_field = "result"
+    parent_kwarg = "test_result_id"
+    step_label = "Test result step"
+    parent_label = "test result"
+    create_serializer_class = TestResultStepAttachmentCreateSerializer
+    upload_serializer_class = TestResultStepAttachmentUploadSerializer
 
     def get_queryset(self):
         test_result_id = self.kwargs["test_result_id"]
         # Get all attachments for result steps that belong to the given test result
         return TestResultStepAttachment.objects.filter(
             result_step__result_id=test_result_id
-        ).select_related("result_step")
+        ).select_related("result_step", "blob")
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -501,8 +894,12 @@ class TestResultStepAttachmentViewSet(
                             "format": "binary",
                             "description": "File to attach",
                         },
+                        "attachment": {
+                            "type": "integer",
+                            "description": "ID of an existing attachment to keep instead of uploading its file again",
+                        },
                     },
-                    "required": ["result_step", "file"],
+                    "required": ["result_step"],
                 },
             }
         },
@@ -512,86 +909,61 @@ class TestResultStepAttachmentViewSet(
                 "items": {"$ref": "#/components/schemas/TestResultStepAttachment"},
             }
         },
-        description="Create multiple test result step attachments at once. Replaces all existing attachments for the given test result. Expects an array of test result step attachment objects in the request data.",
+        description="Create multiple test result step attachments at once. Replaces all existing attachments for the given test result. Expects an array of test result step attachment objects in the request data, each with either a file to upload or the id of an existing attachment to keep.",
     )
     def create(self, request, *args, **kwargs):
         """
         Create multiple test result step attachments at once.
         Replaces all existing attachments for the given test result.
+        Existing attachments referenced by id are kept without uploading their file again.
         """
-        test_result_id = self.kwargs["test_result_id"]
-
-        # Parse multipart form data
-        attachments_data = []
-        index = 0
-        while True:
-            result_step_key = f"{index}_result_step"
-            file_key = f"{index}_file"
-
-            if result_step_key not in request.data or file_key not in request.data:
-                break
-
-            attachments_data.append(
-                {
-                    "result_step": int(request.data[result_step_key]),
-                    "file": request.data[file_key],
-                }
-            )
-            index += 1
+        return self.replace_attachments(request)
 
-        if not attachments_data:
-            return Response(
-                {"error": "No attachment data provided"},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    @extend_schema(
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {
+                    "result_step": {
+                        "type": "integer",
+                        "description": "Order of the test result step",
+                    },
+                    "file": {
+                        "type": "string",
+                        "format": "binary",
+                        "description": "File to attach",
+                    },
+                },
+                "required": ["result_step", "file"],
+            }
+        },
+        responses={201: TestResultStepAttachmentSerializer},
+        description="Add a single attachment to a test result step of the given test result, keeping the existing attachments.",
+    )
+    @action(detail=False, methods=["post"])
+    def add(self, request, *args, **kwargs):
+        """Add a single attachment without replacing the existing ones"""
+        return self.add_attachment(request)
 
-        # Replace all attachments in a single transaction
-        with transaction.atomic():
-            # Delete all existing test result step attachments for this test result
-            TestResultStepAttachment.objects.filter(
-                result_step__result_id=test_result_id
-            ).delete()
-
-            # Create all new attachments
-            created_attachments = []
-            for attachment_data in attachments_data:
-                # Validate the file type
-                file_obj = attachment_data.get("file")
-                if file_obj and file_obj.name.lower().endswith(".exe"):
-                    return Response(
-                        {"error": "Executable files (.exe) are not allowed."},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-                # Check if TestResultStep associated with the test result and the order exists
-                result_step_order = attachment_data.get("result_step")
-                if result_step_order is not None:
-                    try:
-                        result_step = TestResultStep.objects.get(
-                            order=result_step_order, result_id=test_result_id
-                        )
-                        attachment_data["result_step"] = result_step.pk
-                    except TestResultStep.DoesNotExist:
-                        return Response(
-                            {
-                                "error": f"Test result step {result_step_order} not found or does not belong to test result {test_result_id}"
-                            },
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-
-                serializer = self.get_serializer(data=attachment_data)
-                if not serializer.is_valid():
-                    return Response(
-                        serializer.errors, status=status.HTTP_400_BAD_REQUEST
-                    )
-                attachment = serializer.save()
-                created_attachments.append(attachment)
+    @extend_schema(
+        request=TestResultStepAttachmentUploadSerializer(many=True),
+        responses={201: AttachmentUploadSerializer(many=True)},
+        description="Issue presigned POST policies to upload attachment files straight to the storage instead of through the API. POST each file to the returned URL along with the returned form fields, then confirm the uploads with their tokens.",
+    )
+    @action(detail=False, methods=["post"])
+    def uploads(self, request, *args, **kwargs):
+        """Issue presigned POST policies for direct attachment uploads"""
+        return self.issue_uploads(request)
 
-        # Return the created ones
-        response_serializer = TestResultStepAttachmentSerializer(
-            created_attachments, many=True
-        )
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+    @extend_schema(
+        request=AttachmentUploadConfirmSerializer,
+        responses={201: TestResultStepAttachmentSerializer(many=True)},
+        description="Record the attachments of files uploaded straight to the storage. Each token must have been issued for this test result and its file must exist in the storage. Existing attachments are kept, and confirming an upload again returns its attachment.",
+    )
+    @action(detail=False, methods=["post"], url_path="uploads/confirm")
+    def confirm(self, request, *args, **kwargs):
+        """Record the attachments of direct uploads"""
+        return self.confirm_direct_uploads(request)
 
     @extend_schema(
         responses={
@@ -600,32 +972,69 @@ class TestResultStepAttachmentViewSet(
                 "format": "binary",
                 "description": "The file content",
             },
+            206: {
+                "type": "string",
+                "format": "binary",
+                "description": "The requested byte range of the file",
+            },
+            302: {"description": "Redirect to a short-lived presigned storage URL"},
+            304: {"description": "The cached file is still valid"},
             404: {"type": "object", "properties": {"detail": {"type": "string"}}},
         },
-        description="Download the attachment file through Django proxy",
+        description="Download the attachment file through Django proxy, or get redirected to a short-lived presigned storage URL when ATTACHMENT_DOWNLOAD_MODE is 'redirect'. Proxied downloads support byte-range requests and conditional requests with If-None-Match or If-Modified-Since.",
     )
     @action(detail=True, methods=["get"])
     def download(self, request, *args, **kwargs):
-        """Download the attachment file through Django proxy"""
+        """Download the attachment file"""
         attachment = self.get_object()
+        return download_response(request, attachment.file, attachment.filename)
 
-        if not attachment.file:
-            raise Http404("File not found")
 
-        try:
-            # Get file name for the response
-            file_name = (
-                attachment.file.name.split("/")[-1]
-                if attachment.file.name
-                else "attachment"
-            )
+class SearchViewSet(
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    queryset = SearchDocument.objects.all()
+    serializer_class = SearchHitSerializer
+    pagination_class = SearchResultsSetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = SearchDocumentFilter
 
-            # Stream the file through Django
-            response = FileResponse(
-                attachment.file.open("rb"),
-                content_type="application/octet-stream",
-                headers={"Content-Disposition": f'inline; filename="{file_name}"'},
+    def get_queryset(self):
+        query = self.request.query_params.get("q", "")
+        if not search_tokens(query):
+            return SearchDocument.objects.none()
+
+        queryset = search_queryset(SearchDocument.objects.all(), query)
+        return highlight_queryset(queryset, query)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                str,
+                description="Words to search for. Every word is matched as a prefix.",
             )
-            return response
-        except (FileNotFoundError, OSError) as e:
-            raise Http404("File not accessible") from e
+        ],
+        description="Search test plans, test cases, test step text and test result comments at once. Hits are ranked by relevance and link to their parent test plan and test case.",
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class JobViewSet(
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    queryset = Job.objects.order_by("-created_at")
+    serializer_class = JobSerializer
+    pagination_class = StandardResultsSetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = JobFilter
+
+    @extend_schema(
+        description="Get the status of a background job. Queued jobs run once a worker claims them; failed attempts are retried with a growing delay until max_attempts. The result of the job is set once it has succeeded and the error of its last attempt once one has failed.",
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)